@@ -0,0 +1,86 @@
+__description__ = \
+"""
+bench_binding_polynomial.py
+
+Time BindingPolynomial.dQ as the number of sites grows.  For each number of
+sites, times the heat calculation for moderate stepwise binding constants
+and for very tight binding (overall betas up to ~1e300, which exercises the
+rescaled sums in bp_ext).  Also reports the mean root-finding iterations per
+shot and the number of shots that fell back to Brent's method.
+
+Usage: python bench_binding_polynomial.py [max_num_sites] [num_repeats]
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import sys, timeit
+import numpy as np
+
+from pytc.indiv_models import BindingPolynomial
+
+def time_dQ(num_sites,log_K,num_repeats=200):
+    """
+    Time dQ for a binding polynomial with num_sites sites, each with a
+    stepwise binding constant of 10**log_K.  Returns the time per call (s)
+    and the solver statistics.
+    """
+
+    model = BindingPolynomial(num_sites=num_sites,
+                              S_cell=25e-6,T_syringe=500e-6,
+                              shot_volumes=[2.5 for i in range(40)])
+
+    # overall betas are products of the stepwise constants
+    values = {}
+    for i in range(num_sites):
+        values["beta{}".format(i+1)] = 10**(log_K*(i+1))
+        values["dH{}".format(i+1)] = -4000.0 + 500*i
+    model.update_values(values)
+
+    # Perturb a beta on every call so each call solves for the free titrant
+    # from its previous solution, like the calls made during a fit.
+    beta_index = model._param_index["beta1"]
+    all_params = np.arange(len(model.param_names))
+    values = np.array(model.param_vector)
+    scale = np.exp(1e-4*np.sin(np.arange(num_repeats)))
+
+    def run():
+        for s in scale:
+            values[beta_index] *= s
+            model.update_values_by_index(all_params,values)
+            model.dQ
+
+    t = min(timeit.repeat(run,number=1,repeat=3))/num_repeats
+
+    return t, model.solver_stats
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        max_num_sites = int(argv[0])
+    except IndexError:
+        max_num_sites = 12
+
+    try:
+        num_repeats = int(argv[1])
+    except IndexError:
+        num_repeats = 200
+
+    print("{:>9s} {:>6s} {:>12s} {:>12s} {:>10s}".format("num_sites","log_K",
+          "us/dQ","iter/shot","fallbacks"))
+
+    for num_sites in range(1,max_num_sites + 1):
+        for log_K in (6,24):
+
+            # keep the overall betas finite
+            if log_K*num_sites > 300:
+                continue
+
+            t, stats = time_dQ(num_sites,log_K,num_repeats)
+            print("{:9d} {:6d} {:12.2f} {:12.3f} {:10d}".format(num_sites,log_K,
+                  t*1e6,stats["mean iterations per shot"],stats["fallbacks"]))
+
+if __name__ == "__main__":
+    main()
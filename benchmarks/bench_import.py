@@ -0,0 +1,82 @@
+__description__ = \
+"""
+bench_import.py
+
+Time "import pytc" in fresh interpreters and check that it does not load the
+slow, optional dependencies (plotting, corner plots, MCMC, scipy), which
+should only be imported when they are first used.  Exits with status 1 if
+any of them is loaded by "import pytc", or if the median import time exceeds
+max_seconds (when given).
+
+Usage: python bench_import.py [num_repeats] [max_seconds]
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import sys, subprocess, json
+
+# Modules that "import pytc" should not load
+LAZY_MODULES = ["matplotlib","matplotlib.pyplot","corner","emcee",
+                "scipy.optimize","scipy.stats","scipy.sparse","scipy.linalg"]
+
+SCRIPT = """
+import sys, time, json
+t = time.perf_counter()
+import pytc
+t = time.perf_counter() - t
+print(json.dumps({"time":t,"loaded":[m for m in MODULES if m in sys.modules]}))
+"""
+
+def time_import(num_repeats=10):
+    """
+    Import pytc in num_repeats fresh interpreters.  Returns a list of import
+    times (s) and the lazy modules that were loaded by the import.
+    """
+
+    script = SCRIPT.replace("MODULES",repr(LAZY_MODULES))
+
+    times = []
+    loaded = set()
+    for i in range(num_repeats):
+        out = subprocess.check_output([sys.executable,"-c",script])
+        result = json.loads(out.decode().strip().split("\n")[-1])
+        times.append(result["time"])
+        loaded.update(result["loaded"])
+
+    return times, sorted(loaded)
+
+def main(argv=None):
+
+    if argv is None:
+        argv = sys.argv[1:]
+
+    try:
+        num_repeats = int(argv[0])
+    except IndexError:
+        num_repeats = 10
+
+    try:
+        max_seconds = float(argv[1])
+    except IndexError:
+        max_seconds = None
+
+    times, loaded = time_import(num_repeats)
+    times.sort()
+    median = times[len(times)//2]
+
+    print("import pytc: median {:.1f} ms, min {:.1f} ms, max {:.1f} ms ({} runs)".format(
+          median*1e3,times[0]*1e3,times[-1]*1e3,len(times)))
+
+    status = 0
+    if len(loaded) > 0:
+        print("loaded by import pytc: {}".format(", ".join(loaded)))
+        status = 1
+
+    if max_seconds is not None and median > max_seconds:
+        print("median import time exceeds {:.1f} ms".format(max_seconds*1e3))
+        status = 1
+
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
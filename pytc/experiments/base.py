@@ -101,10 +101,54 @@ class BaseITCExperiment:
         dictionary.
         """
 
-        if len(self._model.dQ) == 0:
+        dQ = self._model.dQ
+        if len(dQ) == 0:
             return np.array(())
 
-        return self._model.dQ[self._shot_start:]
+        return dQ[self._shot_start:]
+
+    def evaluate(self,param_vector):
+        """
+        Return heats calculated by the model for param_vector (ordered like 
+        model.param_names) for the shots used, without changing the model.
+        """
+
+        return self._model.evaluate(param_vector)[self._shot_start:]
+
+    def write_dQ(self,out):
+        """
+        Write heats calculated by the model into out, a preallocated array
+        (usually a view into a larger buffer) with one entry per shot used.
+        """
+
+        self._model.write_dQ(out,self._shot_start)
+
+    def dQ_batch(self,param_array):
+        """
+        Return heats calculated by the model for a batch of parameter sets.
+        param_array is (num_sets,num_param), with columns ordered like
+        model.param_names.  Returns a (num_sets,num_shots_used) array.
+        """
+
+        return self._model.dQ_batch(param_array)[:,self._shot_start:]
+
+    def dQ_jacobian(self):
+        """
+        Return heats and their derivatives with respect to each model 
+        parameter for the shots used (see ITCModel.dQ_jacobian).
+        """
+
+        dQ, jac = self._model.dQ_jacobian()
+
+        return dQ[self._shot_start:], jac[self._shot_start:,:]
+
+    def dilution_heats_batch(self,param_array):
+        """
+        Return dilution heats calculated by the model for a batch of parameter
+        sets (see dQ_batch).
+        """
+
+        return self._model.dilution_heats_batch(param_array)[:,self._shot_start:]
 
     @property
     def dilution_heats(self):
@@ -113,10 +157,11 @@ class BaseITCExperiment:
         in params dictionary.
         """
 
-        if len(self._model.dilution_heats) == 0:
+        dilution_heats = self._model.dilution_heats
+        if len(dilution_heats) == 0:
             return np.array(())
 
-        return self._model.dilution_heats[self._shot_start:]
+        return dilution_heats[self._shot_start:]
 
     @property
     def param_values(self):
@@ -5,16 +5,65 @@ Main class for holding fit parameters, including guesses, values, ranges, etc.
 __date__ = "2016-09-02"
 __author__ = "Michael J. Harms"
 
-import copy
 import numpy as np
 
+class ParameterStore:
+    """
+    Contiguous arrays holding the values, guesses, bounds, etc. of a set of
+    fit parameters.  FitParameter instances are views into one row of a
+    store, so a model can read or write all of its parameters at once.
+
+    version is incremented whenever values are set through a FitParameter or
+    a model, so calculations from the values can be cached against it.
+    """
+
+    def __init__(self,num_param):
+        """
+        Initialize arrays for num_param parameters.
+        """
+
+        self.values = np.zeros(num_param,dtype=float)
+        self.version = 0
+        self.guesses = np.zeros(num_param,dtype=float)
+        self.guess_ranges = np.zeros((num_param,2),dtype=float)
+        self.fixed = np.zeros(num_param,dtype=bool)
+        self.bounds = np.zeros((num_param,2),dtype=float)
+        self.stdevs = np.zeros(num_param,dtype=float)
+        self.ninetyfives = np.zeros((num_param,2),dtype=float)
+        self.aliases = [None for i in range(num_param)]
+
+        self.bounds[:,0] = -np.inf
+        self.bounds[:,1] = np.inf
+        self.stdevs[:] = np.inf
+        self.ninetyfives[:,0] = -np.inf
+        self.ninetyfives[:,1] = np.inf
+
+    def copy(self):
+        """
+        Return a copy of the store with its own arrays.
+        """
+
+        new = ParameterStore.__new__(ParameterStore)
+
+        new.values = self.values.copy()
+        new.version = 0
+        new.guesses = self.guesses.copy()
+        new.guess_ranges = self.guess_ranges.copy()
+        new.fixed = self.fixed.copy()
+        new.bounds = self.bounds.copy()
+        new.stdevs = self.stdevs.copy()
+        new.ninetyfives = self.ninetyfives.copy()
+        new.aliases = self.aliases[:]
+
+        return new
+
 class FitParameter:
     """
     Class for storing and manipulating generic fit parameters.
     """
 
     def __init__(self,name,guess=None,guess_range=None,fixed=False,bounds=None,
-                 alias=None):
+                 alias=None,store=None,index=0):
         """
         Initialize class.  Parameters:
 
@@ -31,8 +80,18 @@ class FitParameter:
                 bound, upper bound of 5.
         alias: alias for parameter name, for linking to global paramter names. (str)
                If None, no alias is made.
+        store: ParameterStore holding the data for this parameter.  If None,
+               the parameter gets a store of its own.
+        index: row of store used by this parameter.
         """
 
+        if store is None:
+            store = ParameterStore(1)
+            index = 0
+
+        self._store = store
+        self._index = index
+
         self.name = name
         self.guess = guess
         self.guess_range = guess_range
@@ -42,14 +101,55 @@ class FitParameter:
        
         self._initialize_fit_results() 
 
+    @classmethod
+    def from_store(cls,name,store,index):
+        """
+        Create a parameter viewing row index of store, which already holds
+        the parameter's guess, range, bounds, etc.  Unlike __init__, this does
+        not initialize the row, so many parameters can be made quickly from a
+        filled-in store (see ParameterStore.copy).
+        """
+
+        new = cls.__new__(cls)
+
+        new._store = store
+        new._index = index
+        new._name = str(name)
+
+        return new
+
+    def __copy__(self):
+        """
+        Copy the parameter into a new, standalone parameter with its own store
+        (rather than another view of the same store).
+        """
+
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+
+        new._store = ParameterStore(1)
+        new._index = 0
+
+        i = self._index
+        new._store.values[0] = self._store.values[i]
+        new._store.guesses[0] = self._store.guesses[i]
+        new._store.guess_ranges[0] = self._store.guess_ranges[i]
+        new._store.fixed[0] = self._store.fixed[i]
+        new._store.bounds[0] = self._store.bounds[i]
+        new._store.stdevs[0] = self._store.stdevs[i]
+        new._store.ninetyfives[0] = self._store.ninetyfives[i]
+        new._store.aliases[0] = self._store.aliases[i]
+
+        return new
+
     def _initialize_fit_results(self):
         """
         Set fit results to start (stdev, ninetyfive, value to guess).
         """
     
         self.value = self.guess
-        self._stdev = np.inf
-        self._ninetyfive = [-np.inf,np.inf]
+        self._store.stdevs[self._index] = np.inf
+        self._store.ninetyfives[self._index] = (-np.inf,np.inf)
 
     #--------------------------------------------------------------------------
     # parameter name
@@ -76,7 +176,7 @@ class FitParameter:
         Value of the parameter.
         """
 
-        return self._value
+        return float(self._store.values[self._index])
 
     @value.setter
     def value(self,v):
@@ -84,10 +184,12 @@ class FitParameter:
         If value is set to None, set value to self.guess value.
         """
 
-        if v != None:
-            self._value = v
+        if v is not None:
+            self._store.values[self._index] = v
         else:
-            self._value = self.guess
+            self._store.values[self._index] = self.guess
+
+        self._store.version += 1
 
     #--------------------------------------------------------------------------
     # parameter stdev
@@ -98,7 +200,7 @@ class FitParameter:
         Standard deviation on the parameter.
         """
 
-        return self._stdev
+        return float(self._store.stdevs[self._index])
 
     @stdev.setter
     def stdev(self,s):
@@ -106,7 +208,7 @@ class FitParameter:
         Set the standard deviation of the parameter.
         """
 
-        self._stdev = s
+        self._store.stdevs[self._index] = s
 
     #--------------------------------------------------------------------------
     # parameter 95% confidence
@@ -117,7 +219,7 @@ class FitParameter:
         95% confidence interval on the parameter.
         """
 
-        return self._ninetyfive
+        return [float(v) for v in self._store.ninetyfives[self._index]]
 
     @ninetyfive.setter
     def ninetyfive(self,value):
@@ -129,8 +231,8 @@ class FitParameter:
             err = "ninetyfive requires a list-like with length 2.\n"
             raise ValueError(err)
 
-        self._ninetyfive[0] = value[0]
-        self._ninetyfive[1] = value[1]
+        self._store.ninetyfives[self._index,0] = value[0]
+        self._store.ninetyfives[self._index,1] = value[1]
 
     #--------------------------------------------------------------------------
     # parameter guess
@@ -141,7 +243,7 @@ class FitParameter:
         Guess for the parameter.
         """
 
-        return self._guess
+        return float(self._store.guesses[self._index])
 
     @guess.setter
     def guess(self,g):
@@ -150,19 +252,17 @@ class FitParameter:
         parameter. 
         """
 
-        if g != None:
-            self._guess = g
-        else:
+        if g is None:
             if self.name.startswith("dH"):
-                self._guess = 1000.0
+                g = 1000.0
             elif self.name.startswith("beta") or self.name.startswith("K"):
-                self._guess = 1e6
+                g = 1e6
             elif self.name.startswith("fx"):
-                self._guess = 1.0
+                g = 1.0
             else:
-                self._guess = 1.0
+                g = 1.0
 
-        self._value = self._guess
+        self._store.guesses[self._index] = g
         self._initialize_fit_results()
 
     #--------------------------------------------------------------------------
@@ -174,7 +274,7 @@ class FitParameter:
         Range of reasonable guesses for the parameter. 
         """
 
-        return self._guess_range
+        return [float(v) for v in self._store.guess_ranges[self._index]]
 
     @guess_range.setter
     def guess_range(self,g):
@@ -183,24 +283,24 @@ class FitParameter:
         based on parameter name.
         """
 
-        if g != None:
+        if g is not None:
             try:
                 if len(g) != 2:
                     raise TypeError
             except TypeError:
                 err = "Guess range must be list-like object of length 2.\n"
                 raise ValueError(err)
-
-            self._guess_range = copy.deepcopy(g)
         else:
             if self.name.startswith("dH"):
-                self._guess_range = [-10000.0,10000.0]
+                g = [-10000.0,10000.0]
             elif self.name.startswith("beta") or self.name.startswith("K"):
-                self._guess_range = [1.0,1e8]
+                g = [1.0,1e8]
             elif self.name.startswith("fx"):
-                self._guess_range = [0.0,2.0]
+                g = [0.0,2.0]
             else:
-                self._guess_range = [-10000.0,10000.0]
+                g = [-10000.0,10000.0]
+
+        self._store.guess_ranges[self._index] = g
 
         self._initialize_fit_results()
 
@@ -213,7 +313,7 @@ class FitParameter:
         Whether or not the parameter if fixed.
         """
 
-        return self._fixed
+        return bool(self._store.fixed[self._index])
 
     @fixed.setter
     def fixed(self,bool_value):
@@ -221,7 +321,7 @@ class FitParameter:
         Fix or unfix the parameter.
         """
         
-        self._fixed = bool(bool_value)
+        self._store.fixed[self._index] = bool(bool_value)
         self._initialize_fit_results()
 
     #--------------------------------------------------------------------------
@@ -233,7 +333,7 @@ class FitParameter:
         Fit bounds.  Either list of bounds or None.
         """
 
-        return self._bounds
+        return tuple(float(v) for v in self._store.bounds[self._index])
 
     @bounds.setter
     def bounds(self,b):
@@ -241,7 +341,7 @@ class FitParameter:
         Set fit bounds. 
         """
 
-        if b != None:
+        if b is not None:
             try:
                 if len(b) != 2:
                     raise TypeError
@@ -249,10 +349,10 @@ class FitParameter:
                 err = "Bounds must be list-like object of length 2\n"
                 raise ValueError(err)
         
-            self._bounds = tuple(copy.deepcopy(b))
+            self._store.bounds[self._index] = tuple(b)
             
         else:
-            self._bounds = (-np.inf,np.inf)
+            self._store.bounds[self._index] = (-np.inf,np.inf)
 
         self._initialize_fit_results()
 
@@ -265,7 +365,7 @@ class FitParameter:
         Parameter alias.  Either string or None.
         """
 
-        return self._alias
+        return self._store.aliases[self._index]
     
     @alias.setter
     def alias(self,a):
@@ -273,13 +373,11 @@ class FitParameter:
         Set alias.
         """
 
-        try:
-            if self._alias != None and self._alias != a and a != None:
-                err = "Could not set alias to {:} because it is already set to {:}".format(a,self._alias)
-                raise ValueError(err)
-        except AttributeError:
-            pass
+        current = self._store.aliases[self._index]
+        if current != None and current != a and a != None:
+            err = "Could not set alias to {:} because it is already set to {:}".format(a,current)
+            raise ValueError(err)
 
-        self._alias = a
+        self._store.aliases[self._index] = a
 
         self._initialize_fit_results()
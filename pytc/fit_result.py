@@ -0,0 +1,226 @@
+__description__ = \
+"""
+Class holding a snapshot of the results of a global fit.
+"""
+__date__ = "2016-09-02"
+__author__ = "Michael J. Harms"
+
+import numpy as np
+
+class FitResult:
+    """
+    Immutable snapshot of the results of a global fit: estimates, standard
+    deviations, confidence intervals, calculated heats, residuals and fit
+    statistics.  Everything is calculated once, when the snapshot is made,
+    so repeated access (e.g. when exporting results) does not re-run the
+    model.  GlobalFit makes a new snapshot whenever the fit changes.
+    """
+
+    def __init__(self,global_fit):
+        """
+        Take a snapshot of a GlobalFit instance that has been fit.
+
+        Parameters
+        ----------
+
+        global_fit : GlobalFit instance
+            fit to take the snapshot of
+        """
+
+        fitter = global_fit._fitter
+        global_param = global_fit.global_param
+        models = [global_fit._expt_dict[k].model
+                  for k in global_fit._expt_list_stable_order]
+
+        # Flat parameter arrays
+        self._param_names = tuple(global_fit._flat_param_name)
+        self._estimate = self._read_only(fitter.estimate)
+        self._stdev = self._read_only(fitter.stdev)
+        self._ninetyfive = self._read_only(fitter.ninetyfive)
+
+        # Parameters, keyed by name
+        self._fit_param = ({g:global_param[g].value for g in global_param.keys()},
+                           [m.param_values for m in models])
+        self._fit_stdev = ({g:global_param[g].stdev for g in global_param.keys()},
+                           [m.param_stdevs for m in models])
+        self._fit_ninetyfive = ({g:global_param[g].ninetyfive for g in global_param.keys()},
+                                [m.param_ninetyfives for m in models])
+
+        # Observed and calculated heats
+        y_obs = []
+        y_calc = []
+        for k in global_fit._expt_dict:
+            y_obs.extend(global_fit._expt_dict[k].heats)
+            y_calc.extend(global_fit._expt_dict[k].dQ)
+        self._y_obs = self._read_only(y_obs)
+        self._y_calc = self._read_only(y_calc)
+        self._residuals = self._read_only(self._y_obs - self._y_calc)
+
+        self._stats = self._calc_stats(global_fit)
+
+    def _read_only(self,values):
+        """
+        Copy values into an array that cannot be modified.
+        """
+
+        a = np.array(values,dtype=float)
+        a.flags.writeable = False
+
+        return a
+
+    def _calc_stats(self,global_fit):
+        """
+        Calculate statistics about the fit.
+        """
+
+        fitter = global_fit._fitter
+
+        output = {}
+
+        P = global_fit.fit_num_param
+        N = global_fit.fit_num_obs
+
+        output["num_obs"] = N
+        output["num_param"] = P
+        output["df"] = N - P
+
+        y_obs = self._y_obs
+        y_estimate = self._y_calc
+
+        sse = np.sum((y_obs -          y_estimate)**2)
+        sst = np.sum((y_obs -      np.mean(y_obs))**2)
+        ssm = np.sum((y_estimate - np.mean(y_obs))**2)
+
+        output["Fit type"] = fitter.fit_type
+
+        fit_info = fitter.fit_info
+        for x in fit_info.keys():
+            output["  {}: {}".format(fitter.fit_type,x)] = fit_info[x]
+
+        output.update(global_fit._warm_start_stats)
+
+        # Calcluate R**2 and adjusted R**2
+        if sst == 0.0:
+            output["Rsq"] = np.inf
+            output["Rsq_adjusted"] = np.inf
+        else:
+            Rsq = 1 - (sse/sst)
+            Rsq_adjusted = Rsq - (1 - Rsq)*P/(N - P - 1)
+
+            output["Rsq"] = Rsq
+            output["Rsq_adjusted"] = Rsq_adjusted
+
+        # calculate F-statistic
+        msm = (1/P)*ssm
+        mse = 1/(N - P - 1)*sse
+        if mse == 0.0:
+            output["F"] = np.inf
+        else:
+            output["F"] = msm/mse
+
+        # Calcluate log-likelihood
+        lnL = fitter.ln_like(fitter.estimate)
+        output["ln(L)"] = lnL
+
+        # AIC and BIC
+        P_all = P + 1 # add parameter to account for implicit residual
+        output["AIC"] = 2*P_all  - 2*lnL
+        output["BIC"] = P_all*np.log(N) - 2*lnL
+        output["AICc"] = output["AIC"] + 2*(P_all + 1)*(P_all + 2)/(N - P_all - 2)
+
+        return output
+
+    @property
+    def param_names(self):
+        """
+        Names of the fit parameters (in the order of estimate, stdev, etc.)
+        """
+
+        return self._param_names
+
+    @property
+    def estimate(self):
+        """
+        Estimates of the fit parameters.
+        """
+
+        return self._estimate
+
+    @property
+    def stdev(self):
+        """
+        Standard deviations on the estimates of the fit parameters.
+        """
+
+        return self._stdev
+
+    @property
+    def ninetyfive(self):
+        """
+        Ninety-five percent confidence intervals on the estimates.
+        """
+
+        return self._ninetyfive
+
+    @property
+    def y_obs(self):
+        """
+        Observed heats for all experiments.
+        """
+
+        return self._y_obs
+
+    @property
+    def y_calc(self):
+        """
+        Heats calculated with the estimated parameters for all experiments.
+        """
+
+        return self._y_calc
+
+    @property
+    def residuals(self):
+        """
+        Observed minus calculated heats.
+        """
+
+        return self._residuals
+
+    @property
+    def stats(self):
+        """
+        Statistics about the fit (a copy).
+        """
+
+        return dict(self._stats)
+
+    @property
+    def fit_param(self):
+        """
+        Fit values, as in GlobalFit.fit_param (a copy).
+        """
+
+        return self._copy_param(self._fit_param)
+
+    @property
+    def fit_stdev(self):
+        """
+        Fit standard deviations, as in GlobalFit.fit_stdev (a copy).
+        """
+
+        return self._copy_param(self._fit_stdev)
+
+    @property
+    def fit_ninetyfive(self):
+        """
+        Fit 95% confidence intervals, as in GlobalFit.fit_ninetyfive (a copy).
+        """
+
+        return self._copy_param(self._fit_ninetyfive)
+
+    def _copy_param(self,param):
+        """
+        Copy a (global dict, list of local dicts) tuple.
+        """
+
+        return dict(param[0]), [dict(p) for p in param[1]]
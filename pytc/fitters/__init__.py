@@ -9,3 +9,5 @@ __all__ = []
 from .ml import MLFitter 
 from .bootstrap import BootstrapFitter 
 from .bayesian import BayesianFitter
+from .merged import MergedFitter
+from .schur import SchurFitter
@@ -6,9 +6,9 @@ __author__ = "Michael J. Harms"
 __date__ = "2017-05-10"
 
 import numpy as np
-import scipy.stats
-import scipy.optimize as optimize
-import corner
+
+# scipy and corner are slow to import, so they are loaded by the methods that
+# use them
 
 import re
 
@@ -27,6 +27,10 @@ class Fitter:
         self._ninetyfive = None
         self._fit_result = None
         self._success = False
+        self._jac_sparsity = None
+        self._model_batch = None
+        self._x_scale = None
+        self._model_jac = None
 
         self.fit_type = ""
 
@@ -58,7 +62,25 @@ class Fitter:
 
         return -0.5*(np.sum((self._y_obs - y_calc)**2/sigma2 + np.log(sigma2)))
 
-    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None):
+    def ln_like_batch(self,param_array):
+        """
+        Log likelihood for each row of a (num_sets,num_param) array of fit 
+        parameters.  Uses the batched model if one was given to fit; otherwise
+        evaluates the parameter sets one at a time.
+        """
+
+        param_array = np.atleast_2d(param_array)
+
+        if self._model_batch is None:
+            return np.array([self.ln_like(p) for p in param_array])
+
+        y_calc = self._model_batch(param_array)
+        sigma2 = self._y_err**2
+
+        return -0.5*(np.sum((self._y_obs - y_calc)**2/sigma2 + np.log(sigma2),axis=1))
+
+    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None,
+            jac_sparsity=None,model_batch=None,x_scale=None):
         """
         Fit the parameters.       
         Should be redefined in subclasses.
@@ -80,10 +102,160 @@ class Fitter:
             is assigned an error of 1/num_obs
         param_names : array of str
             names of parameters.  If None, parameters assigned names p0,p1,..pN
+        jac_sparsity : array or sparse matrix of shape (num_obs,num_param)
+            which observations each parameter can change.  If None, the 
+            Jacobian is treated as dense.  Usually constructed by 
+            GlobalFit._prep_fit.
+        model_batch : callable or None
+            batched version of model.  model_batch should take a 
+            (num_sets,num_param) array and return a (num_sets,num_obs) array.
+            this should (usually) be GlobalFit._y_calc_batch
+        x_scale : array of floats or None
+            characteristic scale of each parameter, passed to least_squares.
+            If None, the least_squares default is used.
         """
 
         pass
 
+    def _least_squares_kwargs(self,fn,bounds,sparse_solver=False):
+        """
+        Residual function and keyword arguments shared by calls to 
+        scipy.optimize.least_squares.
+
+        If the Jacobian sparsity pattern lets parameters that change disjoint
+        sets of observations be perturbed together, the finite difference 
+        Jacobian is built that way.  By default the grouped Jacobian is
+        handed back to least_squares as a dense array, so the trust region 
+        problem is solved exactly as for a dense fit.  The residuals 
+        least_squares already calculated at each point are reused as the base
+        of the finite differences.  If sparse_solver is True, the pattern is
+        passed directly and least_squares uses its sparse (lsmr) trust region 
+        solver instead.  If the fit was given x_scale, it is passed on as well.
+
+        Parameters
+        ----------
+
+        fn : callable
+            residual function that will be passed to least_squares
+        bounds : list
+            list of two lists containing lower and upper bounds
+        sparse_solver : bool
+            use the sparse trust region solver
+
+        Returns
+        -------
+
+        fn : callable
+            residual function to pass to least_squares in place of fn
+        kwargs : dict
+            keyword arguments for least_squares
+        """
+
+        import scipy.sparse
+
+        kwargs = {}
+
+        if self._x_scale is not None:
+            kwargs["x_scale"] = self._x_scale
+
+        s = self._jac_sparsity
+        if s is None:
+            return fn, kwargs
+
+        s = scipy.sparse.csc_matrix(s)
+        if s.nnz == s.shape[0]*s.shape[1]:
+            return fn, kwargs
+
+        if sparse_solver:
+            kwargs["jac_sparsity"] = s
+            kwargs["tr_solver"] = "lsmr"
+            return fn, kwargs
+
+        # If grouping does not save any function evaluations, use the 
+        # least_squares finite differences
+        groups = self._group_columns(s)
+        if np.max(groups,initial=-1) + 1 == s.shape[1]:
+            return fn, kwargs
+
+        fd_bounds = (np.asarray(bounds[0],dtype=float),
+                     np.asarray(bounds[1],dtype=float))
+
+        last = {}
+        def cached_fn(param):
+            f = fn(param)
+            last["param"] = np.copy(param)
+            last["f"] = f
+            return f
+
+        def jac(param):
+            try:
+                if not np.array_equal(param,last["param"]):
+                    raise KeyError
+                f0 = last["f"]
+            except KeyError:
+                f0 = fn(param)
+
+            return self._fd_jacobian(fn,param,f0,fd_bounds,s,groups).toarray()
+
+        kwargs["jac"] = jac
+
+        return cached_fn, kwargs
+
+    def _group_columns(self,s):
+        """
+        Greedily assign the columns of the sparsity pattern s (csc) to groups
+        in which no two columns share a row.  Returns the group of each column.
+        """
+
+        num_obs, num_param = s.shape
+
+        groups = np.zeros(num_param,dtype=int)
+        group_rows = []
+        for j in range(num_param):
+            rows = s.indices[s.indptr[j]:s.indptr[j+1]]
+            for k, taken in enumerate(group_rows):
+                if not np.any(taken[rows]):
+                    break
+            else:
+                k = len(group_rows)
+                group_rows.append(np.zeros(num_obs,dtype=bool))
+
+            group_rows[k][rows] = True
+            groups[j] = k
+
+        return groups
+
+    def _fd_jacobian(self,fn,param,f0,bounds,s,groups):
+        """
+        Forward difference Jacobian of fn at param, perturbing the columns in
+        each group together.  f0 is fn(param).  Steps that would leave the
+        bounds are taken in the other direction.  Returns a csc matrix with
+        the sparsity pattern s (csc).
+        """
+
+        import scipy.sparse
+
+        lower, upper = bounds
+
+        h = np.sqrt(np.finfo(float).eps)*np.where(param >= 0,1.0,-1.0)*np.maximum(1.0,np.abs(param))
+        h = np.where(np.logical_or(param + h > upper,param + h < lower),-h,h)
+        h = (param + h) - param
+
+        col = np.repeat(np.arange(s.shape[1]),np.diff(s.indptr))
+        nonzero_group = groups[col]
+
+        data = np.zeros(len(s.indices),dtype=float)
+        for k in range(np.max(groups,initial=-1) + 1):
+            in_group = groups == k
+            x = np.array(param,dtype=float)
+            x[in_group] += h[in_group]
+            df = fn(x) - f0
+
+            mask = nonzero_group == k
+            data[mask] = df[s.indices[mask]]/h[col[mask]]
+
+        return scipy.sparse.csc_matrix((data,s.indices,s.indptr),shape=s.shape)
+
     @property
     def estimate(self):
         """
@@ -167,6 +339,8 @@ class Fitter:
         to_plot = np.array(to_plot)
         to_plot = np.swapaxes(to_plot,0,1)
 
+        import corner
+
         fig = corner.corner(to_plot,labels=param_names,range=corner_range,
                             truths=est_values,*args,**kwargs)
 
@@ -7,10 +7,7 @@ __date__ = "2017-05-10"
 
 from .base import Fitter
 
-import emcee, corner
-
 import numpy as np
-import scipy.optimize as optimize
 
 import multiprocessing
 
@@ -121,7 +118,44 @@ class BayesianFitter(Fitter):
         # log posterior is log prior plus log likelihood 
         return ln_prior + ln_like
 
-    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None):
+    def ln_prob_batch(self,param_array):
+        """
+        Posterior probability for each walker position in a 
+        (num_walkers,num_param) array.  All positions inside the bounds are
+        evaluated in one call to the batched model.
+
+        Parameters
+        ----------
+
+        param_array : array of floats
+            parameter sets to evaluate
+
+        Returns
+        -------
+
+        array of log posterior probabilities
+        """
+
+        param_array = np.atleast_2d(param_array)
+        ln_prob = np.zeros(param_array.shape[0],dtype=float)
+        ln_prob[:] = -np.inf
+
+        # Uniform prior: only parameter sets inside the bounds are evaluated
+        in_bounds = np.logical_and(np.all(param_array >= self._bounds[0,:],axis=1),
+                                   np.all(param_array <= self._bounds[1,:],axis=1))
+        if np.sum(in_bounds) == 0:
+            return ln_prob
+
+        with np.errstate(all="ignore"):
+            ln_like = self.ln_like_batch(param_array[in_bounds,:])
+        ln_like[np.logical_not(np.isfinite(ln_like))] = -np.inf
+
+        ln_prob[in_bounds] = ln_like
+
+        return ln_prob
+
+    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None,
+            jac_sparsity=None,model_batch=None,x_scale=None):
         """
         Fit the parameters.       
  
@@ -142,10 +176,22 @@ class BayesianFitter(Fitter):
             is assigned an error of 1/num_obs 
         param_names : array of str
             names of parameters.  If None, parameters assigned names p0,p1,..pN
+        jac_sparsity : array or sparse matrix of shape (num_obs,num_param)
+            which observations each parameter can change.  If None, the 
+            Jacobian is treated as dense.
+        model_batch : callable or None
+            batched version of model, taking a (num_sets,num_param) array and
+            returning a (num_sets,num_obs) array.
+        x_scale : array of floats or None
+            characteristic scale of each parameter, passed to least_squares.
+            If None, the least_squares default is used.
         """
 
         self._model = model
         self._y_obs = y_obs
+        self._jac_sparsity = jac_sparsity
+        self._model_batch = model_batch
+        self._x_scale = x_scale
 
         # Convert the bounds (list of lower and upper lists) into a 2d numpy array
         self._bounds = np.array(bounds)
@@ -161,10 +207,16 @@ class BayesianFitter(Fitter):
         else:
             self._param_names = param_names[:] 
 
+        # emcee and scipy.optimize are slow to import, so load them when needed
+        import emcee
+        import scipy.optimize as optimize
+
         # Make initial guess (ML or just whatever the paramters sent in were)
         if self._ml_guess:
             fn = lambda *args: -self.weighted_residuals(*args)
-            ml_fit = optimize.least_squares(fn,x0=parameters,bounds=self._bounds)
+            fn, kwargs = self._least_squares_kwargs(fn,self._bounds)
+            ml_fit = optimize.least_squares(fn,x0=parameters,bounds=self._bounds,
+                                            **kwargs)
             self._initial_guess = np.copy(ml_fit.x)
         else:
             self._initial_guess = np.copy(parameters)
@@ -178,9 +230,14 @@ class BayesianFitter(Fitter):
         pos = [self._initial_guess + np.random.randn(ndim)*perturb_size
                for i in range(self._num_walkers)]
 
-        # Sample using walkers
-        self._fit_result = emcee.EnsembleSampler(self._num_walkers, ndim, self.ln_prob,
-                                                 threads=self._num_threads)
+        # Sample using walkers.  If a batched model is available, all walkers
+        # are evaluated together at each step.
+        if self._model_batch is None:
+            self._fit_result = emcee.EnsembleSampler(self._num_walkers, ndim, self.ln_prob,
+                                                     threads=self._num_threads)
+        else:
+            self._fit_result = emcee.EnsembleSampler(self._num_walkers, ndim, self.ln_prob_batch,
+                                                     vectorize=True)
         self._fit_result.run_mcmc(pos, self._num_steps)
 
         # Create list of samples
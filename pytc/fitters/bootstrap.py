@@ -8,7 +8,6 @@ __date__ = "2017-05-11"
 from .base import Fitter
 
 import numpy as np
-import scipy.optimize
 
 import sys
 
@@ -46,7 +45,8 @@ class BootstrapFitter(Fitter):
 
         self.fit_type = "bootstrap"
 
-    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None):
+    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None,
+            jac_sparsity=None,model_batch=None,x_scale=None):
         """
         Fit the parameters.       
  
@@ -67,12 +67,24 @@ class BootstrapFitter(Fitter):
             is assigned an error of 1/num_obs 
         param_names : array of str
             names of parameters.  If None, parameters assigned names p0,p1,..pN
+        jac_sparsity : array or sparse matrix of shape (num_obs,num_param)
+            which observations each parameter can change.  If None, the 
+            Jacobian is treated as dense.
+        model_batch : callable or None
+            batched version of model, taking a (num_sets,num_param) array and
+            returning a (num_sets,num_obs) array.
+        x_scale : array of floats or None
+            characteristic scale of each parameter, passed to least_squares.
+            If None, the least_squares default is used.
         """
    
         self._model = model
         self._bounds= bounds
         self._y_obs = y_obs
         self._y_err = y_err
+        self._jac_sparsity = jac_sparsity
+        self._model_batch = model_batch
+        self._x_scale = x_scale
 
         self._success = None 
     
@@ -91,6 +103,9 @@ class BootstrapFitter(Fitter):
 
         original_y_obs = np.copy(self._y_obs)
 
+        # scipy is slow to import, so load it when first needed
+        import scipy.optimize
+
         # Go through bootstrap reps
         for i in range(self._num_bootstrap):
 
@@ -102,9 +117,11 @@ class BootstrapFitter(Fitter):
             self._y_obs = original_y_obs + np.random.normal(0.0,y_err)
             
             # Do the fit
-            fit = scipy.optimize.least_squares(self.unweighted_residuals,
+            fn, kwargs = self._least_squares_kwargs(self.unweighted_residuals,bounds)
+            fit = scipy.optimize.least_squares(fn,
                                                x0=parameters,
-                                               bounds=bounds)
+                                               bounds=bounds,
+                                               **kwargs)
     
             # record the fit results
             self._samples[i,:] = fit.x
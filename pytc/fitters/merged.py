@@ -0,0 +1,132 @@
+__description__ = \
+"""
+Fitter subclass that combines the results of independent fits.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2017-05-10"
+
+from .base import Fitter
+
+import numpy as np
+
+class MergedFitter(Fitter):
+    """
+    Combine fitters that were run on independent blocks of a model into a
+    single result.  GlobalFit uses this when a fit decomposes into groups of
+    experiments that share no fit parameters; each group is fit on its own and
+    the estimates are placed back into the full parameter vector.
+
+    This class does not do any fitting itself; it is created from fitters that
+    have already been run.
+    """
+
+    def __init__(self,fitters,param_indices,model,y_obs,y_err,param_names):
+        """
+        Initialize the merged fitter.
+
+        Parameters
+        ----------
+
+        fitters : list of Fitter instances
+            fitters that have already been run, one per block
+        param_indices : list of arrays of int
+            indices of each fitter's parameters in the full parameter vector
+        model : callable
+            full model.  model should take the full parameter vector as its
+            only argument.  this should (usually) be GlobalFit._y_calc
+        y_obs : array of floats
+            all observations in a concatenated array
+        y_err : array of floats
+            standard deviation of each observation
+        param_names : array of str
+            names of all parameters
+        """
+
+        Fitter.__init__(self)
+
+        self._fitters = list(fitters)
+        self._param_indices = [np.asarray(idx,dtype=int) for idx in param_indices]
+
+        self._model = model
+        self._y_obs = y_obs
+        self._y_err = y_err
+        self._param_names = param_names[:]
+
+        num_param = len(self._param_names)
+        self._estimate = np.zeros(num_param,dtype=float)
+        self._stdev = np.zeros(num_param,dtype=float)
+        self._ninetyfive = np.zeros((num_param,2),dtype=float)
+
+        for f, idx in zip(self._fitters,self._param_indices):
+            self._estimate[idx] = f.estimate
+            self._stdev[idx] = f.stdev
+            self._ninetyfive[idx,:] = f.ninetyfive
+
+        # Stitch samples together if every block has the same number of them
+        samples = [np.asarray(f.samples) for f in self._fitters]
+        if len(samples[0]) > 0 and len(set([len(s) for s in samples])) == 1:
+            self._samples = np.zeros((len(samples[0]),num_param),dtype=float)
+            for s, idx in zip(samples,self._param_indices):
+                self._samples[:,idx] = s
+
+        self._fit_result = [f.fit_result for f in self._fitters]
+        self._success = all([f.success for f in self._fitters])
+
+        self.fit_type = self._fitters[0].fit_type
+
+    @property
+    def fitters(self):
+        """
+        Fitters for each independent block.
+        """
+
+        return self._fitters
+
+    @property
+    def fit_info(self):
+        """
+        Return information about the fit.
+        """
+
+        output = {"Num independent fits":len(self._fitters)}
+        output.update(self._fitters[0].fit_info)
+
+        return output
+
+    def corner_plot(self,filter_params=(),num_samples=100000,*args,**kwargs):
+        """
+        Create a "corner plot" that shows distributions of values for each
+        parameter, as well as cross-correlations between parameters.
+
+        Parameters
+        ----------
+        filter_params : list-like
+            strings used to search parameter names.  if the string matches,
+            the parameter is *excluded* from the plot.
+        num_samples : int
+            how many samples to generate if the blocks were fit without
+            sampling (maximum likelihood)
+
+        If the blocks were fit by maximum likelihood, samples are generated
+        from a block-diagonal covariance matrix built from the covariance of
+        each block (see MLFitter.corner_plot).
+        """
+
+        if len(self.samples) > 0:
+            return Fitter.corner_plot(self,filter_params,*args,**kwargs)
+
+        num_param = len(self._param_names)
+        cov = np.zeros((num_param,num_param),dtype=float)
+        for f, idx in zip(self._fitters,self._param_indices):
+            cov[np.ix_(idx,idx)] = f._covariance()
+
+        chol_cov = np.linalg.cholesky(cov).T
+
+        self._samples = np.dot(np.random.normal(size=(num_samples,chol_cov.shape[0])),chol_cov)
+        self._samples = self._samples + self.estimate
+
+        fig = Fitter.corner_plot(self,filter_params,*args,**kwargs)
+
+        del self._samples
+
+        return fig
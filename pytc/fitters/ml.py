@@ -8,8 +8,6 @@ __date__ = "2017-05-10"
 from .base import Fitter
 
 import numpy as np
-import scipy.stats
-import scipy.optimize as optimize
 
 class MLFitter(Fitter):
     """
@@ -21,16 +19,28 @@ class MLFitter(Fitter):
     # http://stackoverflow.com/questions/14854339/in-scipy-how-and-why-does-curve-fit-calculate-the-covariance-of-the-parameter-es
     # http://stackoverflow.com/questions/14581358/getting-standard-errors-on-fitted-parameters-using-the-optimize-leastsq-method-i
     """
-    def __init__(self):
+    def __init__(self,sparse_solver=False):
         """
         Initialize the fitter.
+
+        Parameters
+        ----------
+
+        sparse_solver : bool
+            if the Jacobian is sparse (e.g. a global fit with many local
+            parameters), solve the trust region problem with a sparse solver
+            rather than an exact dense solve.  Grouped finite differences are
+            used either way.
         """
 
         Fitter.__init__(self)
+
+        self._sparse_solver = sparse_solver
        
         self.fit_type = "maximum likelihood"    
 
-    def fit(self,model,parameters,bounds,y_obs,y_err,param_names=None):
+    def fit(self,model,parameters,bounds,y_obs,y_err,param_names=None,
+            jac_sparsity=None,model_batch=None,x_scale=None,model_jac=None):
         """
         Fit the parameters.       
  
@@ -51,12 +61,29 @@ class MLFitter(Fitter):
             is assigned an error of 1/num_obs 
         param_names : array of str
             names of parameters.  If None, parameters assigned names p0,p1,..pN
+        jac_sparsity : array or sparse matrix of shape (num_obs,num_param)
+            which observations each parameter can change.  If None, the 
+            Jacobian is treated as dense.
+        model_batch : callable or None
+            batched version of model, taking a (num_sets,num_param) array and
+            returning a (num_sets,num_obs) array.
+        x_scale : array of floats or None
+            characteristic scale of each parameter, passed to least_squares.
+            If None, the least_squares default is used.
+        model_jac : callable or None
+            Jacobian of model, taking "parameters" and returning a 
+            (num_obs,num_param) array.  If given, it is used instead of finite
+            differences.
         """
 
         self._model = model
         self._bounds = bounds
         self._y_obs = y_obs
         self._y_err = y_err
+        self._jac_sparsity = jac_sparsity
+        self._model_batch = model_batch
+        self._x_scale = x_scale
+        self._model_jac = model_jac
 
         self._success = None
 
@@ -73,17 +100,27 @@ class MLFitter(Fitter):
 
         # Do the actual fit 
         fn = lambda *args: -self.weighted_residuals(*args)
+        fn, kwargs = self._least_squares_kwargs(fn,self._bounds,self._sparse_solver)
+        if self._model_jac is not None:
+            kwargs.pop("jac_sparsity",None)
+            kwargs.pop("tr_solver",None)
+            kwargs["jac"] = lambda p: self._model_jac(p)/self._y_err[:,np.newaxis]
+
+        # scipy is slow to import, so load it when first needed
+        import scipy.optimize as optimize
+        import scipy.stats
+
         self._fit_result = optimize.least_squares(fn,
                                                   x0=parameters,
-                                                  bounds=self._bounds)
+                                                  bounds=self._bounds,
+                                                  **kwargs)
         self._estimate = self._fit_result.x
 
         # Extract standard error on the fit parameter from the covariance
         N = len(self._y_obs)
         P = len(self._fit_result.x)
 
-        J = self._fit_result.jac
-        cov = np.linalg.inv(2*np.dot(J.T,J))
+        cov = self._covariance()
 
         self._stdev = np.sqrt(np.diagonal(cov)) #variance)
 
@@ -99,6 +136,21 @@ class MLFitter(Fitter):
 
         self._success = self._fit_result.success
 
+    def _covariance(self):
+        r"""
+        Approximate the covariance matrix as $(2*J^{T} \dot J)^{-1}$ using the
+        Jacobian from least_squares.  If the fit used a sparse Jacobian, it is
+        converted to a dense array first.
+        """
+
+        import scipy.sparse
+
+        J = self._fit_result.jac
+        if scipy.sparse.issparse(J):
+            J = J.toarray()
+
+        return np.linalg.inv(2*np.dot(J.T,J))
+
     @property
     def fit_info(self):
         """
@@ -108,7 +160,7 @@ class MLFitter(Fitter):
         return {}
 
     def corner_plot(self,filter_params=(),num_samples=100000,*args,**kwargs):
-        """
+        r"""
         Create a "corner plot" that shows distributions of values for each
         parameter, as well as cross-correlations between parameters.
 
@@ -135,9 +187,7 @@ class MLFitter(Fitter):
         https://stats.stackexchange.com/questions/120179/generating-data-with-a-given-sample-covariance-matrix
         """
 
-        J = self._fit_result.jac
-      
-        cov = np.linalg.inv(2*np.dot(J.T,J))
+        cov = self._covariance()
         chol_cov = np.linalg.cholesky(cov).T
 
         self._samples = np.dot(np.random.normal(size=(num_samples,chol_cov.shape[0])),chol_cov)
@@ -0,0 +1,545 @@
+__description__ = \
+"""
+Fitter subclass for global fits with many local and few global parameters.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2017-05-10"
+
+from .base import Fitter
+
+import numpy as np
+
+import warnings
+
+# scipy is slow to import, so it is loaded by the methods that use it
+
+class SchurFitter(Fitter):
+    """
+    Fit the model to the data using nonlinear least squares, exploiting the
+    block structure of a global fit.
+
+    Observations are split into blocks (usually experiments) that share the
+    same set of parameters.  Parameters that only change one block are local;
+    parameters that change more than one are global.  Each damped Gauss-Newton
+    (Levenberg-Marquardt) step eliminates the local parameters block by block
+    (Schur complement) and solves a small linear system in the global
+    parameters only, so the cost of a step grows linearly with the number of
+    experiments rather than cubically with the total number of parameters.
+
+    This gives the same maximum-likelihood estimate and standard deviations as
+    MLFitter.  The block structure comes from the Jacobian sparsity pattern
+    constructed by GlobalFit; without one, every parameter is treated as
+    global.
+    """
+
+    def __init__(self,max_nfev=None,ftol=1e-8,xtol=1e-8,gtol=1e-8):
+        """
+        Initialize the fitter.
+
+        Parameters
+        ----------
+
+        max_nfev : int or None
+            maximum number of function evaluations.  If None, use 100 times the
+            number of parameters (the scipy.optimize.least_squares default).
+        ftol : float
+            stop when the relative reduction in cost is below ftol
+        xtol : float
+            stop when the relative size of the step is below xtol
+        gtol : float
+            stop when the largest component of the scaled gradient is below
+            gtol
+        """
+
+        Fitter.__init__(self)
+
+        self._max_nfev = max_nfev
+        self._ftol = ftol
+        self._xtol = xtol
+        self._gtol = gtol
+
+        self.fit_type = "maximum likelihood"
+
+    def fit(self,model,parameters,bounds,y_obs,y_err=None,param_names=None,
+            jac_sparsity=None,model_batch=None,x_scale=None):
+        """
+        Fit the parameters.
+
+        Parameters
+        ----------
+
+        model : callable
+            model to fit.  model should take "parameters" as its only argument.
+            this should (usually) be GlobalFit._y_calc
+        parameters : array of floats
+            parameters to be optimized.  usually constructed by GlobalFit._prep_fit
+        bounds : list
+            list of two lists containing lower and upper bounds
+        y_obs : array of floats
+            observations in an concatenated array
+        y_err : array of floats or None
+            standard deviation of each observation.  if None, each observation
+            is assigned an error of 1/num_obs
+        param_names : array of str
+            names of parameters.  If None, parameters assigned names p0,p1,..pN
+        jac_sparsity : array or sparse matrix of shape (num_obs,num_param)
+            which observations each parameter can change.  Used to find the
+            local and global parameters.  If None, all parameters are global.
+        model_batch : callable or None
+            batched version of model, taking a (num_sets,num_param) array and
+            returning a (num_sets,num_obs) array.
+        x_scale : array of floats or None
+            characteristic scale of each parameter.  If given, the damping
+            term of each step is scaled by x_scale**-2 (as in the least_squares
+            trust region methods).  If None, the damping is scaled by the 
+            diagonal of J^T J, which is invariant to parameter scale.
+        """
+
+        self._model = model
+        self._bounds = bounds
+        self._y_obs = y_obs
+        self._y_err = y_err
+        self._jac_sparsity = jac_sparsity
+        self._model_batch = model_batch
+
+        self._x_scale = None
+        if x_scale is not None:
+            self._x_scale = np.ones(len(parameters),dtype=float)*np.asarray(x_scale,dtype=float)
+            if np.any(np.logical_not(self._x_scale > 0)) or np.any(np.isinf(self._x_scale)):
+                err = "x_scale must be positive and finite\n"
+                raise ValueError(err)
+
+        self._success = None
+
+        # If no error is specified, assign the error as 1/N, identical for all
+        # points
+        if y_err is None:
+            self._y_err = np.array([1/len(self._y_obs) for i in range(len(self._y_obs))])
+
+        if param_names is None:
+            self._param_names = ["p{}".format(i) for i in range(len(parameters))]
+        else:
+            self._param_names = param_names[:]
+
+        self._find_blocks(len(self._y_obs),len(parameters))
+
+        self._fit_result = self._minimize(np.array(parameters,dtype=float))
+        self._estimate = self._fit_result.x
+
+        # Extract standard error on the fit parameter from the covariance
+        N = len(self._y_obs)
+        P = len(self._estimate)
+
+        self._stdev = np.sqrt(self._covariance_diagonal())
+
+        # 95% confidence intervals from standard error
+        import scipy.stats
+        z = scipy.stats.t(N-P-1).ppf(0.975)
+        c1 = self._estimate - z*self._stdev
+        c2 = self._estimate + z*self._stdev
+
+        self._ninetyfive = []
+        for i in range(P):
+            self._ninetyfive.append([c1[i],c2[i]])
+        self._ninetyfive = np.array(self._ninetyfive)
+
+        self._success = self._fit_result.success
+
+        if self._fit_result.stalled:
+            warnings.warn("SchurFitter did not converge: {}".format(self._fit_result.message),
+                          RuntimeWarning)
+
+    def _find_blocks(self,num_obs,num_param):
+        """
+        Split observations into blocks that depend on the same parameters and
+        classify parameters as global (change more than one block) or local
+        (change exactly one block).
+        """
+
+        import scipy.sparse
+
+        s = self._jac_sparsity
+        if s is None:
+            s = np.ones((num_obs,num_param),dtype=int)
+        s = scipy.sparse.csr_matrix(s)
+        s.sort_indices()
+
+        # Group rows with identical sparsity patterns
+        patterns = {}
+        row_block = np.zeros(num_obs,dtype=int)
+        for i in range(num_obs):
+            key = tuple(s.indices[s.indptr[i]:s.indptr[i+1]])
+            try:
+                row_block[i] = patterns[key]
+            except KeyError:
+                patterns[key] = len(patterns)
+                row_block[i] = patterns[key]
+
+        num_blocks = len(patterns)
+
+        # Number of blocks each parameter touches
+        coo = s.tocoo()
+        touches = scipy.sparse.csr_matrix((np.ones(len(coo.row),dtype=int),
+                                           (coo.col,row_block[coo.row])),
+                                          shape=(num_param,num_blocks))
+        touches = (touches > 0).astype(int)
+        num_touched = np.asarray(touches.sum(axis=1)).ravel()
+
+        # Parameters that touch no observations are treated as global so they
+        # do not disappear from the fit
+        is_global = num_touched != 1
+        self._global_idx = np.arange(num_param)[is_global]
+
+        param_block = np.asarray(touches.argmax(axis=1)).ravel()
+
+        self._blocks = []
+        for b in range(num_blocks):
+            rows = np.arange(num_obs)[row_block == b]
+            local_idx = np.arange(num_param)[np.logical_and(np.logical_not(is_global),
+                                                            param_block == b)]
+            self._blocks.append((rows,local_idx))
+
+        # Columns of the finite difference Jacobian, grouped so parameters in
+        # a group change disjoint sets of observations.  Without a sparsity 
+        # pattern, each parameter is perturbed on its own.
+        s = s.tocsc()
+        if self._jac_sparsity is None:
+            self._groups = np.arange(num_param)
+        else:
+            self._groups = self._group_columns(s)
+        self._fd_sparsity = s
+
+    def _residuals(self,param):
+        """
+        Weighted residuals (calculated minus observed).
+        """
+
+        self._nfev += 1
+
+        return -self.weighted_residuals(param)
+
+    def _jacobian(self,param,residuals):
+        """
+        Finite difference Jacobian of the weighted residuals, perturbing
+        parameters that change disjoint sets of observations together.
+        """
+
+        J = self._fd_jacobian(self._residuals,param,residuals,self._fd_bounds,
+                              self._fd_sparsity,self._groups)
+
+        if self._jac_sparsity is None:
+            return J.toarray()
+
+        return J.tocsr()
+
+    def _normal_blocks(self,J,r):
+        """
+        Blocks of the normal equations, J^T J and J^T r, for the global
+        parameters, each local block and their cross terms.
+        """
+
+        import scipy.sparse
+
+        g = self._global_idx
+
+        A_gg = np.zeros((len(g),len(g)),dtype=float)
+        b_g = np.zeros(len(g),dtype=float)
+
+        blocks = []
+        for rows, local_idx in self._blocks:
+
+            J_rows = J[rows]
+            if scipy.sparse.issparse(J_rows):
+                J_g = J_rows[:,g].toarray()
+                J_l = J_rows[:,local_idx].toarray()
+            else:
+                J_g = J_rows[:,g]
+                J_l = J_rows[:,local_idx]
+
+            r_k = r[rows]
+
+            A_gg += np.dot(J_g.T,J_g)
+            b_g += np.dot(J_g.T,r_k)
+
+            blocks.append((local_idx,np.dot(J_l.T,J_l),np.dot(J_l.T,J_g),np.dot(J_l.T,r_k)))
+
+        return A_gg, b_g, blocks
+
+    def _solve(self,A,b):
+        """
+        Solve a small symmetric positive (semi)definite system.  Uses a
+        Cholesky factorization, falling back to least squares if A is not
+        numerically positive definite.  The factorization does not estimate
+        the condition number, so ill-conditioned (but factorable) systems are
+        solved without a LinAlgWarning; the damping keeps those steps
+        bounded.
+        """
+
+        if len(b) == 0:
+            return np.zeros(0,dtype=float)
+
+        import scipy.linalg
+
+        try:
+            x = scipy.linalg.cho_solve(scipy.linalg.cho_factor(A),b)
+            if np.all(np.isfinite(x)):
+                return x
+        except (np.linalg.LinAlgError,scipy.linalg.LinAlgError,ValueError):
+            pass
+
+        return np.linalg.lstsq(A,b,rcond=None)[0]
+
+    def _step(self,A_gg,b_g,blocks,damping,num_param):
+        """
+        Damped Gauss-Newton step using the Schur complement of the local
+        blocks.  Solves (J^T J + damping*D) dx = -J^T r, where D is
+        x_scale**-2 if x_scale was given and the diagonal of J^T J otherwise.
+        """
+
+        def damp(A,idx):
+            if self._x_scale is None:
+                d = np.maximum(np.diagonal(A),1e-300)
+            else:
+                d = self._x_scale[idx]**-2
+            return A + np.diag(damping*d)
+
+        S = damp(A_gg,self._global_idx)
+        rhs = -b_g
+
+        solved = []
+        for local_idx, A_ll, A_lg, b_l in blocks:
+            if len(local_idx) == 0:
+                continue
+            A_ll = damp(A_ll,local_idx)
+            W = self._solve(A_ll,np.column_stack((A_lg,b_l)))
+            S -= np.dot(A_lg.T,W[:,:-1])
+            rhs += np.dot(A_lg.T,W[:,-1])
+            solved.append((local_idx,W))
+
+        dg = self._solve(S,rhs)
+
+        dx = np.zeros(num_param,dtype=float)
+        dx[self._global_idx] = dg
+        for local_idx, W in solved:
+            dx[local_idx] = -W[:,-1] - np.dot(W[:,:-1],dg)
+
+        return dx
+
+    def _minimize(self,x):
+        """
+        Levenberg-Marquardt minimization of the sum of squared weighted
+        residuals.  Steps that leave the bounds are projected back onto them.
+        """
+
+        lower = np.asarray(self._bounds[0],dtype=float)
+        upper = np.asarray(self._bounds[1],dtype=float)
+        self._fd_bounds = (lower,upper)
+
+        num_param = len(x)
+        max_nfev = self._max_nfev
+        if max_nfev is None:
+            max_nfev = 100*num_param
+
+        self._nfev = 0
+        njev = 0
+
+        x = np.clip(x,lower,upper)
+        r = self._residuals(x)
+        cost = 0.5*np.dot(r,r)
+
+        damping = 1e-3
+        damping_factor = 2
+        status = 0
+        message = "The maximum number of function evaluations is exceeded."
+        stalled = False
+
+        while self._nfev < max_nfev:
+
+            J = self._jacobian(x,r)
+            njev += 1
+
+            A_gg, b_g, blocks = self._normal_blocks(J,r)
+
+            # Gradient, scaled by parameter magnitude
+            grad = np.zeros(num_param,dtype=float)
+            grad[self._global_idx] = b_g
+            for local_idx, A_ll, A_lg, b_l in blocks:
+                grad[local_idx] = b_l
+            if np.max(np.abs(grad*np.maximum(np.abs(x),1.0)),initial=0) < self._gtol*max(cost,1e-300):
+                status = 1
+                message = "`gtol` termination condition is satisfied."
+                break
+
+            # Try steps until one lowers the cost.  Damping is updated from the
+            # ratio of actual to predicted reduction (Nielsen's rule).
+            num_tries = 0
+            accepted = False
+            while self._nfev < max_nfev:
+
+                dx = self._step(A_gg,b_g,blocks,damping,num_param)
+                x_new = np.clip(x + dx,lower,upper)
+                r_new = self._residuals(x_new)
+                cost_new = 0.5*np.dot(r_new,r_new)
+                num_tries += 1
+
+                r_pred = r + J.dot(x_new - x)
+                predicted = cost - 0.5*np.dot(r_pred,r_pred)
+
+                if np.isfinite(cost_new) and cost_new < cost and predicted > 0:
+                    rho = (cost - cost_new)/predicted
+                    damping = max(damping*max(1/3,1 - (2*rho - 1)**3),1e-12)
+                    damping_factor = 2
+                    accepted = True
+                    break
+
+                damping *= damping_factor
+                damping_factor *= 2
+                if damping > 1e16:
+                    break
+
+            # The Jacobian used up the last function evaluations
+            if num_tries == 0:
+                break
+
+            # The damping grew without bound (or the function evaluations ran
+            # out) before any step lowered the cost.  This is a failure, not
+            # convergence.
+            if not accepted:
+                status = 0
+                message = "The step search failed to find a step that lowers the cost."
+                stalled = True
+                break
+
+            step = x_new - x
+            reduction = cost - cost_new
+
+            x, r, cost = x_new, r_new, cost_new
+
+            if reduction < self._ftol*cost:
+                status = 2
+                message = "`ftol` termination condition is satisfied."
+                break
+
+            if np.linalg.norm(step) < self._xtol*(self._xtol + np.linalg.norm(x)):
+                status = 3
+                message = "`xtol` termination condition is satisfied."
+                break
+
+        # Jacobian at the solution for the covariance
+        J = self._jacobian(x,r)
+        njev += 1
+
+        import scipy.optimize as optimize
+
+        return optimize.OptimizeResult(x=x,
+                                       cost=cost,
+                                       fun=r,
+                                       jac=J,
+                                       grad=J.T.dot(r),
+                                       nfev=self._nfev,
+                                       njev=njev,
+                                       status=status,
+                                       message=message,
+                                       success=status > 0,
+                                       stalled=stalled)
+
+    def _inverse_blocks(self):
+        """
+        Blocks of (J^T J)^-1 at the solution: the global block (inverse of the
+        Schur complement) and, for each local block, A_ll^-1 and
+        W = A_ll^-1 A_lg.
+        """
+
+        A_gg, b_g, blocks = self._normal_blocks(self._fit_result.jac,self._fit_result.fun)
+
+        S = A_gg.copy()
+        local = []
+        for local_idx, A_ll, A_lg, b_l in blocks:
+            if len(local_idx) == 0:
+                continue
+            A_ll_inv = np.linalg.pinv(A_ll)
+            W = np.dot(A_ll_inv,A_lg)
+            S -= np.dot(A_lg.T,W)
+            local.append((local_idx,A_ll_inv,W))
+
+        S_inv = np.linalg.pinv(S)
+
+        return S_inv, local
+
+    def _covariance_diagonal(self):
+        r"""
+        Diagonal of the covariance matrix $(2*J^{T} \dot J)^{-1}$, calculated
+        block by block.
+        """
+
+        S_inv, local = self._inverse_blocks()
+
+        diag = np.zeros(len(self._estimate),dtype=float)
+        diag[self._global_idx] = np.diagonal(S_inv)
+        for local_idx, A_ll_inv, W in local:
+            diag[local_idx] = np.diagonal(A_ll_inv) + np.sum(np.dot(W,S_inv)*W,axis=1)
+
+        return diag/2
+
+    def _covariance(self):
+        r"""
+        Full covariance matrix $(2*J^{T} \dot J)^{-1}$ assembled from the
+        block inverse.  Used for corner plots.
+        """
+
+        S_inv, local = self._inverse_blocks()
+
+        g = self._global_idx
+
+        cov = np.zeros((len(self._estimate),len(self._estimate)),dtype=float)
+        cov[np.ix_(g,g)] = S_inv
+        for i, (local_idx, A_ll_inv, W) in enumerate(local):
+            cross = -np.dot(W,S_inv)
+            cov[np.ix_(local_idx,g)] = cross
+            cov[np.ix_(g,local_idx)] = cross.T
+            for other_idx, other_inv, other_W in local[i:]:
+                block = np.dot(np.dot(W,S_inv),other_W.T)
+                if other_idx is local_idx:
+                    block = block + A_ll_inv
+                cov[np.ix_(local_idx,other_idx)] = block
+                cov[np.ix_(other_idx,local_idx)] = block.T
+
+        return cov/2
+
+    @property
+    def fit_info(self):
+        """
+        Return information about the fit.
+        """
+
+        return {"Num global params":len(self._global_idx),
+                "Num local blocks":len([b for b in self._blocks if len(b[1]) > 0])}
+
+    def corner_plot(self,filter_params=(),num_samples=100000,*args,**kwargs):
+        """
+        Create a "corner plot" that shows distributions of values for each
+        parameter, as well as cross-correlations between parameters.
+
+        Parameters
+        ----------
+        filter_params : list-like
+            strings used to search parameter names.  if the string matches,
+            the parameter is *excluded* from the plot.
+        num_samples : int
+            how many samples to generate
+
+        Samples are generated from the covariance matrix, as in
+        MLFitter.corner_plot.
+        """
+
+        cov = self._covariance()
+        chol_cov = np.linalg.cholesky(cov).T
+
+        self._samples = np.dot(np.random.normal(size=(num_samples,chol_cov.shape[0])),chol_cov)
+        self._samples = self._samples + self.estimate
+
+        fig = Fitter.corner_plot(self,filter_params,*args,**kwargs)
+
+        del self._samples
+
+        return fig
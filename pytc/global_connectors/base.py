@@ -6,7 +6,7 @@ function of experimental properties and global parameters.
 __author__ = "Michael J. Harms"
 __date__ = "2017-01-15"
 
-import inspect
+import inspect, types
 from .. import fit_param
 
 class GlobalConnector:
@@ -106,6 +106,26 @@ class GlobalConnector:
             self._param_dict[ext_name].value = param_dict[ext_name]
             self.__dict__[int_name] = self._param_dict[ext_name].value
 
+    def evaluate(self,function_name,experiment,param_values=None):
+        """
+        Calculate a connector function (e.g. "dH") for experiment, using
+        param_values (a dictionary keyed by parameter names, like the one
+        taken by update_values) in place of the current parameter values.
+        Parameters missing from param_values keep their current values.  The
+        connector is not changed, so several threads can evaluate it at once.
+        Calling the function directly (self.dH(experiment)) is the stateful
+        equivalent.
+        """
+
+        values = dict([(p,self.__dict__[p]) for p in self._param_names])
+        if param_values is not None:
+            for ext_name in param_values.keys():
+                values[self._ext_to_int_name[ext_name]] = param_values[ext_name]
+
+        connector = _ConnectorValues(self,values)
+
+        return getattr(type(self),function_name)(connector,experiment)
+
     @property
     def local_methods(self):
         """
@@ -131,3 +151,25 @@ class GlobalConnector:
 
 
         return output 
+
+
+class _ConnectorValues:
+    """
+    Stand-in for a connector with different parameter values, used by
+    GlobalConnector.evaluate.  Parameters are read from values; everything
+    else comes from the connector, with its methods bound to the stand-in so
+    they see the same values.
+    """
+
+    def __init__(self,connector,values):
+
+        self._connector = connector
+        self.__dict__.update(values)
+
+    def __getattr__(self,name):
+
+        attr = getattr(type(self._connector),name,None)
+        if inspect.isfunction(attr):
+            return types.MethodType(attr,self)
+
+        return getattr(self._connector,name)
@@ -10,14 +10,15 @@ __date__ = "2016-06-22"
 
 from . import fitters
 from . global_connectors import GlobalConnector
+from .fit_result import FitResult
 
 import numpy as np
-import scipy
-import scipy.optimize as optimize
-from matplotlib import pyplot as plt
-from matplotlib import gridspec
+
+# scipy and matplotlib are slow to import, so they are loaded by the methods
+# that use them
 
 import copy, inspect, warnings, sys, datetime
+import multiprocessing, concurrent.futures, threading
 
 class FitNotRunError(Exception):
     """
@@ -33,9 +34,17 @@ class GlobalFit:
     Class for regressing models against an arbitrary number of ITC experiments.
     """
 
-    def __init__(self):
+    def __init__(self,num_threads=1):
         """
         Set up the main binding model to fit.
+
+        Parameters
+        ----------
+
+        num_threads : int or `"max"`
+            number of threads used to calculate the heats of different 
+            experiments at the same time.  if `"max"`, use the total number of
+            cpus.  Experiments are calculated serially if 1 (default).
         """
 
         # Objects for holding global parameters
@@ -47,6 +56,32 @@ class GlobalFit:
         self._expt_dict = {}
         self._expt_list_stable_order = []
 
+        # Parameters (and parameter store version) used for the heats
+        # currently held for each experiment
+        self._expt_dQ_cache = {}
+
+        # The flattened description of the fit is built on demand
+        self._prep_stale = True
+        self._prep_signature = None
+
+        # Snapshot of the fit results, made on demand after each fit
+        self._fit_snapshot = None
+
+        # Last converged estimates (used to warm-start later fits) and the
+        # fit description and number of model evaluations of the last 
+        # cold-started fit
+        self._last_estimates = {}
+        self._cold_start = None
+        self._warm_start_stats = {}
+
+        # Number of model evaluations since the start of the current fit.
+        # Decomposed fits evaluate models from several threads.
+        self._num_model_evals = 0
+        self._num_model_evals_lock = threading.Lock()
+
+        self._executor = None
+        self.num_threads = num_threads
+
     def add_experiment(self,experiment):
         """
         Add an experiment to the fit
@@ -221,7 +256,7 @@ class GlobalFit:
 
         self.delete_current_fit()
 
-    def fit(self,fitter=fitters.MLFitter):
+    def fit(self,fitter=fitters.MLFitter,decompose=False,warm_start=False):
         """
         Public function that performs the fit. 
         
@@ -233,30 +268,184 @@ class GlobalFit:
             maximum-likelihood method.  If the subclass is passed, it is
             initialized with default parameters.  If an instance of the 
             subclass is passed, it will be used as-is. 
+        decompose : bool
+            if True, find groups of experiments that share no floating
+            parameters (global parameters or connectors) and fit each group
+            independently, in parallel if num_threads > 1.  The results are
+            merged back into the usual outputs.  Each group gets its own 
+            fitter, so statistics like confidence intervals are calculated
+            per group.
+        warm_start : bool
+            if True, start every parameter that was in the last successful fit
+            from its estimate (rather than its guess) and use the Jacobian of
+            that fit to scale the parameters.  This makes refitting after
+            adding experiments or editing the model much cheaper.  The number 
+            of model evaluations (for residuals and Jacobians) is reported in
+            fit_stats, along with the number saved relative to the last 
+            cold-started fit if that fit had the same description (the same 
+            experiments, links, guesses, bounds and fixed parameters).
         """
 
         # Prep the fit (creating arrays that properly map between the the
-        # Mapper instance and numpy arrays for regression).
-        self._prep_fit()
-       
-        # If the fitter is not intialized, initialize it 
-        if inspect.isclass(fitter):
-            self._fitter = fitter()
-        else:
-            self._fitter = fitter
+        # Mapper instance and numpy arrays for regression), if anything 
+        # changed since it was last prepped.
+        self._update_prep()
+
+        self._num_model_evals = 0
+
+        param = np.array(self._flat_param,dtype=float)
+        x_scale = None
+        if warm_start:
+            param, x_scale = self._warm_start_param()
 
-        # Perform the fit.
-        self._fitter.fit(self._y_calc,
-                         self._flat_param,
-                         self._flat_param_bounds,
-                         self._y_obs,
-                         self._y_err,
-                         self._flat_param_name)
+        components = []
+        if decompose:
+            components = self._fit_components()
+
+        if len(components) > 1:
+            self._fitter = self._fit_decomposed(fitter,components,param,x_scale)
+
+        else:
+       
+            # If the fitter is not intialized, initialize it 
+            if inspect.isclass(fitter):
+                self._fitter = fitter()
+            else:
+                self._fitter = fitter
+
+            # If every model has analytic derivatives, give maximum likelihood
+            # fits the exact Jacobian
+            kwargs = {}
+            if isinstance(self._fitter,fitters.MLFitter) and self._analytic_jacobian:
+                kwargs["model_jac"] = self._y_calc_jac
+
+            # Perform the fit.
+            self._fitter.fit(self._y_calc_shared,
+                             param,
+                             self._flat_param_bounds,
+                             self._y_obs,
+                             self._y_err,
+                             self._flat_param_name,
+                             jac_sparsity=self._jac_sparsity,
+                             model_batch=self._y_calc_batch,
+                             x_scale=x_scale,
+                             **kwargs)
 
         # Take the output of the fit (numpy arrays) and map it back to specific
         # parameters using Mapper.
         self._parse_fit()
 
+        self._record_fit(warm_start,self._num_model_evals)
+
+    def _flat_param_key(self,i):
+        """
+        Key identifying flat parameter i that does not depend on the order of
+        the flat parameters: (experiment, parameter) for local parameters, 
+        (global name, global name) for global parameters and (connector,
+        parameter) for connector parameters.
+        """
+
+        if self._flat_param_type[i] == 2:
+            return (self._flat_param_mapping[i][0].__self__,self._flat_param_mapping[i][1])
+
+        return tuple(self._flat_param_mapping[i])
+
+    def _warm_start_param(self):
+        """
+        Starting parameters and parameter scales for a warm-started fit.
+
+        Parameters in the last successful fit start from their estimates;
+        new parameters start from their guesses.  The scale of each parameter
+        is the inverse norm of its column in the last Jacobian (as in the
+        least_squares "jac" scaling).  New parameters take the scale of 
+        parameters with the same name, if there are any.  Returns the 
+        parameter array and the scales (None if no scales are known).
+        """
+
+        param = np.array(self._flat_param,dtype=float)
+        scale = np.ones(len(param),dtype=float)
+
+        scales_by_name = {}
+        for key in self._last_estimates.keys():
+            value, s = self._last_estimates[key]
+            if s is not None:
+                try:
+                    scales_by_name[key[1]].append(s)
+                except KeyError:
+                    scales_by_name[key[1]] = [s]
+
+        have_scale = False
+        for i in range(len(param)):
+
+            try:
+                value, s = self._last_estimates[self._flat_param_key(i)]
+                param[i] = value
+            except KeyError:
+                try:
+                    s = np.median(scales_by_name[self._flat_param_name[i]])
+                except KeyError:
+                    s = None
+
+            if s is not None:
+                scale[i] = s
+                have_scale = True
+
+        param = np.clip(param,self._flat_param_bounds[0],self._flat_param_bounds[1])
+
+        if not have_scale:
+            scale = None
+
+        return param, scale
+
+    def _record_fit(self,warm_start,num_model_evals=None):
+        """
+        Record the result of a fit: store the estimates (and Jacobian column
+        scales) of a successful fit for warm-starting later fits, and record
+        how many model evaluations (num_model_evals, None if not known) the
+        fit took.
+        """
+
+        import scipy.sparse
+
+        self._warm_start_stats = {}
+        if warm_start:
+            self._warm_start_stats["Warm start: model evaluations"] = num_model_evals
+
+            # Only compare against a cold start of the same fit
+            if num_model_evals is not None and self._cold_start is not None:
+                signature, cold_evals = self._cold_start
+                if signature == self._prep_signature:
+                    saved = cold_evals - num_model_evals
+                    self._warm_start_stats["Warm start: model evaluations saved"] = saved
+        else:
+            self._cold_start = None
+            if num_model_evals is not None:
+                self._cold_start = (self._prep_signature,num_model_evals)
+
+        if not self._fitter.success:
+            return
+
+        # Scale of each parameter from the Jacobian at the solution
+        scale = [None for i in range(len(self._fitter.estimate))]
+        results = self._fitter.fit_result
+        if type(results) != list:
+            results = [results]
+        J = None
+        if len(results) == 1:
+            J = getattr(results[0],"jac",None)
+        if J is not None:
+            if scipy.sparse.issparse(J):
+                col_norm = np.sqrt(np.asarray(J.multiply(J).sum(axis=0)).ravel())
+            else:
+                col_norm = np.sqrt(np.sum(np.asarray(J)**2,axis=0))
+            for i in range(len(col_norm)):
+                if col_norm[i] > 0 and np.isfinite(col_norm[i]):
+                    scale[i] = 1/col_norm[i]
+
+        self._last_estimates = {}
+        for i in range(len(self._fitter.estimate)):
+            self._last_estimates[self._flat_param_key(i)] = (self._fitter.estimate[i],scale[i])
+
     def _prep_fit(self):
         """
         Prep the fit, creating all appropriate parameter mappings etc.
@@ -355,73 +544,695 @@ class GlobalFit:
 
                 flat_param_counter += 1
 
+        self._compile_scatter_plan()
+
+        # Lay out the observations: each experiment owns a contiguous slice of
+        # the observed, error and calculated heat arrays
+        self._expt_obs_slices = {}
+        num_obs = 0
+        for k in self._expt_dict.keys():
+            n = len(self._expt_dict[k].heats)
+            self._expt_obs_slices[k] = slice(num_obs,num_obs + n)
+            num_obs += n
+
         # Create observed y and y err arrays for the likelihood function
-        y_obs = []
-        y_err = []
+        self._y_obs = np.zeros(num_obs,dtype=float)
+        self._y_err = np.zeros(num_obs,dtype=float)
         for k in self._expt_dict.keys():                                       
-            y_obs.extend(self._expt_dict[k].heats)
-            y_err.extend(self._expt_dict[k].heats_stdev)
+            self._y_obs[self._expt_obs_slices[k]] = self._expt_dict[k].heats
+            self._y_err[self._expt_obs_slices[k]] = self._expt_dict[k].heats_stdev
 
-        self._y_obs = np.array(y_obs)
-        self._y_err = np.array(y_err)
+        # Buffer that experiments write their calculated heats into
+        self._y_calc_buffer = np.zeros(num_obs,dtype=float)
+        self._expt_dQ_cache = {}
 
-    def _y_calc(self,param=None):
+        self._build_jac_sparsity()
+
+        self._prep_stale = False
+        self._prep_signature = self._get_prep_signature()
+
+    def _update_prep(self):
         """
-        Calculate heats using the model given parameters.
+        Rebuild the flattened description of the fit if something changed
+        since it was last built: either through the GlobalFit API (which
+        marks it stale) or directly on the models or global parameters.
         """
-        
-        # Update parameters
-        for i in range(len(param)):
+
+        if self._prep_stale or self._get_prep_signature() != self._prep_signature:
+            self._prep_fit()
+
+    def _get_prep_signature(self):
+        """
+        Summary of the inputs to _prep_fit that can be changed without going
+        through GlobalFit: the guesses, bounds, fixed flags (and fixed values)
+        of global parameters and the guesses, bounds, fixed flags and aliases
+        of each model, as well as the observed heats.
+        """
+
+        signature = []
+        for k in self._global_param_mapping.keys():
+            if type(k) == str:
+                params = [self._global_params[k]]
+            else:
+                params = self._global_params[k].params.values()
+
+            for p in params:
+                fixed_value = None
+                if p.fixed:
+                    fixed_value = p.value
+                signature.append((p.guess,p.fixed,p.bounds,fixed_value))
+
+        for k in self._expt_dict.keys():
+            e = self._expt_dict[k]
+            store = e.model._param_store
+            signature.append((k,e.model,e.heats.tobytes(),e.heats_stdev.tobytes(),
+                              store.guesses.tobytes(),store.fixed.tobytes(),
+                              store.bounds.tobytes(),tuple(store.aliases)))
+
+        return signature
+
+    def _compile_scatter_plan(self):
+        """
+        Compile the flat parameter mapping into a "scatter plan": index arrays
+        that take the flat parameter vector (extended with the outputs of any
+        global connector functions) to the parameter vector of each
+        experiment.  This is done once in _prep_fit so _y_calc does not have to
+        walk the parameters and parameter types on every call.
+        """
+
+        num_flat = len(self._flat_param)
+
+        # Global connector parameters, grouped by connector
+        connector_params = {}
+        for i in range(num_flat):
+            if self._flat_param_type[i] != 2:
+                continue
+
+            connector = self._flat_param_mapping[i][0].__self__
+            try:
+                connector_params[connector][0].append(self._flat_param_mapping[i][1])
+                connector_params[connector][1].append(i)
+            except KeyError:
+                connector_params[connector] = ([self._flat_param_mapping[i][1]],[i])
+
+        self._plan_connector_params = [(c,names,np.array(idx,dtype=int))
+                                       for c, (names,idx) in connector_params.items()]
+
+        # (experiment, param) -> index into the extended parameter vector
+        sources = {}
+        for i in range(num_flat):
 
             # local variable
             if self._flat_param_type[i] == 0:
-                experiment = self._flat_param_mapping[i][0]
-                parameter_name = self._flat_param_mapping[i][1]
-                self._expt_dict[experiment].model.update_values({parameter_name:param[i]})    
+                sources[self._flat_param_mapping[i]] = i
 
             # Vanilla global variable
             elif self._flat_param_type[i] == 1:
                 param_key = self._flat_param_mapping[i][0]
                 for experiment, parameter_name in self._global_param_mapping[param_key]:
-                    self._expt_dict[experiment].model.update_values({parameter_name:param[i]}) 
+                    sources[(experiment,parameter_name)] = i
 
-            # Global connector global variable
-            elif self._flat_param_type[i] == 2:
-                connector = self._flat_param_mapping[i][0].__self__
-                param_name = self._flat_param_mapping[i][1]
-                connector.update_values({param_name:param[i]})
+        # Outputs of connector functions are placed after the fit parameters
+        self._plan_connector_outputs = []
+        slot = num_flat
+        for connector_function in self._global_param_keys:
 
-            else:
-                err = "Paramter type {} not recongized.\n".format(self._flat_param_type[i])
-                raise ValueError(err) 
+            if type(connector_function) == str:
+                continue
 
-        # Look for connector functions
-        for connector_function in self._global_param_keys:            
+            for experiment, parameter_name in self._global_param_mapping[connector_function]:
+                self._plan_connector_outputs.append((slot,connector_function,experiment))
+                sources[(experiment,parameter_name)] = slot
+                slot += 1
 
-            if type(connector_function) == str:
+        self._num_plan_values = slot
+
+        # Per-experiment index arrays: positions in model.param_names and the
+        # matching positions in the extended parameter vector
+        self._scatter_plan = {}
+        for k in self._expt_dict.keys():
+
+            param_names = self._expt_dict[k].model.param_names
+
+            dest = []
+            src = []
+            for j, p in enumerate(param_names):
+                try:
+                    src.append(sources[(k,p)])
+                    dest.append(j)
+                except KeyError:
+                    pass
+
+            self._scatter_plan[k] = (np.array(dest,dtype=int),np.array(src,dtype=int))
+
+        self._plan = (self._plan_connector_params,
+                      self._plan_connector_outputs,
+                      list(self._expt_dict.keys()))
+
+    def _build_jac_sparsity(self):
+        """
+        Build the sparsity pattern of the Jacobian (num_obs x num_param).  A
+        local parameter only changes the heats of its own experiment; a global
+        parameter changes the heats of every experiment linked to it.  For a
+        global connector, this is every experiment linked to any of the
+        connector's functions.
+        """
+
+        import scipy.sparse
+
+        # Rows of the observation vector that belong to each experiment
+        expt_rows = {}
+        for k, obs_slice in self._expt_obs_slices.items():
+            expt_rows[k] = np.arange(obs_slice.start,obs_slice.stop)
+
+        # Experiments linked to each global connector
+        connector_expts = {}
+        for g in self._global_param_mapping.keys():
+            if type(g) == str:
                 continue
+            expts = connector_expts.setdefault(g.__self__,[])
+            expts.extend([e for e, p in self._global_param_mapping[g]])
+
+        rows = []
+        cols = []
+        for i in range(len(self._flat_param)):
+
+            # local variable
+            if self._flat_param_type[i] == 0:
+                expts = [self._flat_param_mapping[i][0]]
+
+            # Vanilla global variable
+            elif self._flat_param_type[i] == 1:
+                param_key = self._flat_param_mapping[i][0]
+                expts = [e for e, p in self._global_param_mapping[param_key]]
 
-            # If this is a method of GlobalConnector...
-            if issubclass(connector_function.__self__.__class__,GlobalConnector):
+            # Global connector global variable
+            else:
+                expts = connector_expts[self._flat_param_mapping[i][0].__self__]
+
+            for e in set(expts):
+                rows.append(expt_rows[e])
+                cols.append(np.repeat(i,len(expt_rows[e])))
 
-                # Update experiments with the value spit out by the connector function
-                for expt, param in self._global_param_mapping[connector_function]: 
-                    e = self._expt_dict[expt]                                                 
-                    value = connector_function(e)
-                    self._expt_dict[expt].model.update_values({param:value})                  
+        if len(rows) > 0:
+            rows = np.concatenate(rows)
+            cols = np.concatenate(cols)
         
-        # Calculate using the model         
-        y_calc = []
-        for k in self._expt_dict.keys(): 
-            y_calc.extend(self._expt_dict[k].dQ)
+        self._jac_sparsity = scipy.sparse.csr_matrix((np.ones(len(rows),dtype=int),(rows,cols)),
+                                                     shape=(len(self._y_obs),len(self._flat_param)))
+
+    def evaluate(self,param):
+        """
+        Calculate heats for a flat parameter vector without changing the 
+        experiments, models or global connectors, so several threads can 
+        evaluate one GlobalFit at once.  Returns a new array of calculated 
+        heats ordered like the observations.  _y_calc is the stateful 
+        equivalent used while fitting.
+
+        evaluate does not rebuild the flattened description of the fit, as 
+        that would change state other threads are reading.  If the fit has
+        changed since it was last built (experiments, links, guesses, bounds
+        or fixed parameters), access fit_num_param or call fit() first.
+
+        Parameters
+        ----------
+
+        param : array of floats
+            flat parameter vector (ordered like the fit parameters)
+        """
+
+        if self._prep_stale or self._get_prep_signature() != self._prep_signature:
+            err = "The fit has changed since it was last prepared. Access fit_num_param\n"
+            err += "or call fit() to prepare it before calling evaluate.\n"
+            raise ValueError(err)
+
+        param = np.asarray(param,dtype=float)
+        expt_params = self._expt_param_batch(param)
+
+        y_calc = np.zeros(len(self._y_obs),dtype=float)
+        for k in expt_params.keys():
+            y_calc[self._expt_obs_slices[k]] = self._expt_dict[k].evaluate(expt_params[k][0])
+
+        return y_calc
+
+    def _y_calc(self,param=None):
+        """
+        Calculate heats using the model given parameters.  Returns a new array
+        that can be kept (see _y_calc_shared for the version used by fitters).
+        """
+
+        return np.copy(self._y_calc_shared(param))
+
+    def _y_calc_shared(self,param):
+        """
+        Calculate heats using the model given parameters without copying them.
+
+        The heats are written into a buffer owned by GlobalFit and a read-only
+        view of the buffer is returned.  It is overwritten by the next call, 
+        so this is only handed to fitters, which use each result before 
+        asking for the next.
+        """
+
+        self._calc_plan(param,self._plan,self._executor)
+
+        y_calc = self._y_calc_buffer.view()
+        y_calc.flags.writeable = False
+
+        return y_calc
+
+    def _calc_plan(self,param,plan,executor=None):
+        """
+        Calculate the heats for the experiments in a plan (the whole fit, or 
+        one independent component of it), writing them into their slices of
+        the _y_calc buffer.  Only connectors used by those experiments are
+        touched, so plans for different components can be calculated on 
+        different threads.
+
+        Parameters
+        ----------
+
+        param : array of floats
+            flat parameter vector
+        plan : tuple
+            (connector parameters, connector outputs, experiment names) as
+            built by _compile_scatter_plan or _component_plan
+        executor : concurrent.futures.Executor or None
+            if not None, calculate experiments using this executor
+        """
+
+        connector_params, connector_outputs, expts = plan
+
+        with self._num_model_evals_lock:
+            self._num_model_evals += 1
+
+        param = np.asarray(param,dtype=float)
+
+        # Extended parameter vector: fit parameters, then connector outputs
+        values = np.zeros(self._num_plan_values,dtype=float)
+        values[:len(param)] = param
+
+        # Update global connector parameters
+        for connector, names, idx in connector_params:
+            connector.update_values(dict(zip(names,param[idx])))
+
+        # Evaluate connector functions for each experiment that uses them
+        for slot, connector_function, expt in connector_outputs:
+            values[slot] = connector_function(self._expt_dict[expt])
+
+        # Only experiments whose parameters changed since the last call are
+        # recalculated; the rest already have their heats in the buffer.
+        to_calc = []
+        for k in expts:
+
+            dest, src = self._scatter_plan[k]
+            expt_values = values[src]
+
+            # Parameters outside the plan (fixed parameters, for example) can
+            # be changed on the model directly, so the version of the model's
+            # parameter store has to match as well
+            try:
+                cached_values, cached_version = self._expt_dQ_cache[k]
+                if cached_version == self._expt_dict[k].model._param_store.version and \
+                   np.array_equal(cached_values,expt_values):
+                    continue
+            except KeyError:
+                pass
+
+            to_calc.append((k,expt_values))
+
+        # Scatter the parameters into each experiment and have the model write
+        # its heats into its slice of the buffer.  Experiments are independent,
+        # so they can be calculated on different threads.
+        if executor is not None and len(to_calc) > 1:
+            list(executor.map(self._calc_expt,to_calc))
+        else:
+            for x in to_calc:
+                self._calc_expt(x)
+
+    def _calc_expt(self,expt_and_values):
+        """
+        Update the parameters of a single experiment and write its heats into
+        its slice of the _y_calc buffer.  Takes a tuple of experiment name and
+        parameter values (ordered by the scatter plan).
+        """
+
+        k, expt_values = expt_and_values
+
+        dest, src = self._scatter_plan[k]
+        model = self._expt_dict[k].model
+        model.update_values_by_index(dest,expt_values)
+        self._expt_dict[k].write_dQ(self._y_calc_buffer[self._expt_obs_slices[k]])
+        self._expt_dQ_cache[k] = (expt_values,model._param_store.version)
+
+    @property
+    def _analytic_jacobian(self):
+        """
+        Whether every experiment's model calculates analytic derivatives.
+        """
+
+        if len(self._expt_dict) == 0:
+            return False
+
+        return all([e.model.analytic_jacobian for e in self._expt_dict.values()])
+
+    def _y_calc_jac(self,param):
+        """
+        Calculate the Jacobian of the heats with respect to the flat parameter
+        vector (num_obs x num_param) from the models' analytic derivatives.
+        Fit parameters reach the models through the scatter plan, so their
+        derivatives are gathered through it; for connector outputs, the chain
+        rule uses derivatives of each connector function with respect to the
+        connector parameters (see _connector_derivs).
+        """
+
+        param = np.asarray(param,dtype=float)
+        num_param = len(param)
+
+        # Bring the models and connectors to param
+        self._calc_plan(param,self._plan)
+
+        connector_derivs = self._connector_derivs(param)
+
+        J = np.zeros((len(self._y_obs),num_param),dtype=float)
+        for k in self._plan[2]:
+
+            dest, src = self._scatter_plan[k]
+            rows = self._expt_obs_slices[k]
+            dQ, model_jac = self._expt_dict[k].dQ_jacobian()
+
+            for d, s in zip(dest,src):
+                if s < num_param:
+                    J[rows,s] += model_jac[:,d]
+                else:
+                    for i, deriv in connector_derivs.get(s,[]):
+                        J[rows,i] += model_jac[:,d]*deriv
+
+        return J
+
+    def _connector_derivs(self,param):
+        """
+        Differentiate the connector outputs in the plan with respect to the
+        connector parameters by central differences.  Returns a dictionary 
+        keying each output slot (see _compile_scatter_plan) to a list of 
+        (flat parameter index, derivative) tuples.  Connector values are left
+        at param.
+        """
+
+        connector_params, connector_outputs, expts = self._plan
+
+        derivs = {}
+        for connector, names, idx in connector_params:
+
+            outputs = [x for x in connector_outputs if x[1].__self__ is connector]
+            if len(outputs) == 0:
+                continue
+
+            for name, i in zip(names,idx):
+
+                h = np.sqrt(np.finfo(float).eps)*max(1.0,abs(param[i]))
+
+                values = []
+                for step in (h,-h):
+                    connector.update_values({name:param[i] + step})
+                    values.append([f(self._expt_dict[e]) for slot, f, e in outputs])
+                connector.update_values({name:param[i]})
+
+                for j, (slot, f, e) in enumerate(outputs):
+                    deriv = (values[0][j] - values[1][j])/(2*h)
+                    derivs.setdefault(slot,[]).append((i,deriv))
+
+        return derivs
+
+    def _expt_param_batch(self,param_array,plan=None):
+        """
+        Apply the scatter plan to a batch of flat parameter vectors. Returns a
+        dictionary keying each experiment in the plan (default: all 
+        experiments) to a (num_sets,num_model_param) array of model parameters.
+        Model and connector values are left unchanged, so this can be called
+        from several threads at once.
+        """
+
+        if plan is None:
+            plan = self._plan
+        connector_params, connector_outputs, expts = plan
+
+        param_array = np.atleast_2d(np.asarray(param_array,dtype=float))
+        num_sets = param_array.shape[0]
+
+        # Extended parameter vectors: fit parameters, then connector outputs
+        values = np.zeros((num_sets,self._num_plan_values),dtype=float)
+        values[:,:param_array.shape[1]] = param_array
+
+        # Connector functions work on scalar parameters, so evaluate them one
+        # parameter set at a time
+        if len(connector_outputs) > 0:
+
+            connector_values = dict([(c,(names,idx)) for c, names, idx in connector_params])
+
+            for i in range(num_sets):
+                for slot, connector_function, expt in connector_outputs:
+
+                    connector = connector_function.__self__
+                    try:
+                        names, idx = connector_values[connector]
+                        param_values = dict(zip(names,param_array[i,idx]))
+                    except KeyError:
+                        param_values = None
+
+                    values[i,slot] = connector.evaluate(connector_function.__name__,
+                                                        self._expt_dict[expt],
+                                                        param_values)
+
+        # Start from the current model values (so fixed parameters are kept),
+        # then scatter in the batch
+        expt_params = {}
+        for k in expts:
+            dest, src = self._scatter_plan[k]
+            p = np.tile(self._expt_dict[k].model.param_vector,(num_sets,1))
+            p[:,dest] = values[:,src]
+            expt_params[k] = p
+
+        return expt_params
+
+    def _y_calc_batch(self,param_array):
+        """
+        Calculate heats for a batch of parameter vectors.
+
+        Parameters
+        ----------
+
+        param_array : array of floats
+            (num_sets,num_param) array of flat parameter vectors.
+
+        Returns a (num_sets,num_obs) array of calculated heats.  Models that
+        have a vectorized heat calculation evaluate every parameter set at
+        once; others fall back to a loop.  Unlike _y_calc, this does not change
+        the parameter values held by the experiments.
+        """
+
+        param_array = np.atleast_2d(np.asarray(param_array,dtype=float))
+
+        heats = self._calc_plan_batch(param_array,self._plan,self._executor)
+
+        y_calc = np.zeros((param_array.shape[0],len(self._y_obs)),dtype=float)
+        for k in heats.keys():
+            y_calc[:,self._expt_obs_slices[k]] = heats[k]
+
+        return y_calc
+
+    def _calc_plan_batch(self,param_array,plan,executor=None):
+        """
+        Calculate heats for a batch of parameter vectors for the experiments
+        in a plan (see _calc_plan).  Returns a dictionary keying each
+        experiment to a (num_sets,num_shots_used) array.
+        """
+
+        expt_params = self._expt_param_batch(param_array,plan)
+
+        with self._num_model_evals_lock:
+            self._num_model_evals += len(param_array)
+
+        def calc_batch(k):
+            return self._expt_dict[k].dQ_batch(expt_params[k])
+
+        expts = plan[2]
+        if executor is not None and len(expts) > 1:
+            heats = list(executor.map(calc_batch,expts))
+        else:
+            heats = [calc_batch(k) for k in expts]
+
+        return dict(zip(expts,heats))
+
+    # -------------------------------------------------------------------------
+    # Independent components of the fit
+
+    def _fit_components(self):
+        """
+        Find groups of experiments that share no floating fit parameters.
+        Experiments and parameters form a graph (edges from the Jacobian
+        sparsity pattern); each connected component of that graph can be fit
+        independently of the others.
+
+        Returns a list of (experiment names, flat parameter indices) tuples. 
+        Experiments without floating parameters are left out.
+        """
+
+        import scipy.sparse.csgraph
+
+        expt_names = list(self._expt_dict.keys())
+        num_expt = len(expt_names)
+        num_param = len(self._flat_param)
+
+        # Experiment x parameter incidence matrix
+        row_to_expt = np.zeros(len(self._y_obs),dtype=int)
+        for i, k in enumerate(expt_names):
+            row_to_expt[self._expt_obs_slices[k]] = i
+
+        S = self._jac_sparsity.tocoo()
+        incidence = scipy.sparse.csr_matrix((np.ones(len(S.row),dtype=int),
+                                             (row_to_expt[S.row],S.col)),
+                                            shape=(num_expt,num_param))
+
+        graph = scipy.sparse.bmat([[None,incidence],[incidence.T,None]])
+        num_components, labels = scipy.sparse.csgraph.connected_components(graph,directed=False)
+
+        expt_labels = labels[:num_expt]
+        param_labels = labels[num_expt:]
+
+        components = []
+        seen = []
+        for i, k in enumerate(expt_names):
+
+            label = expt_labels[i]
+            if label in seen:
+                continue
+            seen.append(label)
+
+            param_idx = np.arange(num_param)[param_labels == label]
+            if len(param_idx) == 0:
+                continue
+
+            expts = [expt_names[j] for j in range(num_expt) if expt_labels[j] == label]
+            components.append((expts,param_idx))
+
+        return components
+
+    def _component_plan(self,expts):
+        """
+        Restrict the scatter plan to a subset of experiments and the global
+        connectors they use.
+        """
+
+        connector_params, connector_outputs, all_expts = self._plan
+
+        expts_set = set(expts)
+
+        outputs = [x for x in connector_outputs if x[2] in expts_set]
+        connectors = set([x[1].__self__ for x in outputs])
+        params = [x for x in connector_params if x[0] in connectors]
+
+        return params, outputs, list(expts)
+
+    def _fit_decomposed(self,fitter,components,param,x_scale=None):
+        """
+        Fit each independent component of the fit separately (on the thread
+        pool if num_threads > 1) and merge the results.
+
+        Parameters
+        ----------
+
+        fitter : subclass or instance of fitters.Fitter
+            a new fitter is created (or the instance copied) for each 
+            component.
+        components : list
+            output of _fit_components
+        param : array of floats
+            starting values of all flat parameters
+        x_scale : array of floats or None
+            characteristic scale of all flat parameters
+        """
+
+        lower = np.array(self._flat_param_bounds[0],dtype=float)
+        upper = np.array(self._flat_param_bounds[1],dtype=float)
+
+        jobs = []
+        for expts, param_idx in components:
 
-        return np.array(y_calc)
+            plan = self._component_plan(expts)
+            obs_idx = np.concatenate([np.arange(self._expt_obs_slices[k].start,
+                                                self._expt_obs_slices[k].stop)
+                                      for k in expts])
+
+            if inspect.isclass(fitter):
+                f = fitter()
+            else:
+                f = copy.copy(fitter)
+
+            model, model_batch = self._component_model(param,plan,param_idx,obs_idx)
+
+            component_scale = None
+            if x_scale is not None:
+                component_scale = x_scale[param_idx]
+
+            jobs.append((f,(model,
+                            param[param_idx],
+                            [lower[param_idx],upper[param_idx]],
+                            self._y_obs[obs_idx],
+                            self._y_err[obs_idx],
+                            [self._flat_param_name[i] for i in param_idx]),
+                         {"jac_sparsity":self._jac_sparsity[obs_idx,:][:,param_idx],
+                          "model_batch":model_batch,
+                          "x_scale":component_scale}))
+
+        def run(job):
+            f, args, kwargs = job
+            f.fit(*args,**kwargs)
+
+        if self._executor is not None and len(jobs) > 1:
+            list(self._executor.map(run,jobs))
+        else:
+            for job in jobs:
+                run(job)
+
+        return fitters.MergedFitter([job[0] for job in jobs],
+                                    [c[1] for c in components],
+                                    self._y_calc_shared,
+                                    self._y_obs,
+                                    self._y_err,
+                                    self._flat_param_name)
+
+    def _component_model(self,param,plan,param_idx,obs_idx):
+        """
+        Build model and batched-model callables for one component.  Both take
+        only that component's parameters; all other parameters are held at
+        param.
+        """
+
+        def model(p):
+            full = np.copy(param)
+            full[param_idx] = p
+            self._calc_plan(full,plan)
+            return self._y_calc_buffer[obs_idx]
+
+        def model_batch(p):
+            p = np.atleast_2d(p)
+            full = np.tile(param,(p.shape[0],1))
+            full[:,param_idx] = p
+            heats = self._calc_plan_batch(full,plan)
+            return np.hstack([heats[k] for k in plan[2]])
+
+        return model, model_batch
 
     def _parse_fit(self):
         """
         Parse the fit results.
         """
 
+        # Parameter values are about to be written directly, so cached heats
+        # no longer describe the state of the experiments
+        self._expt_dQ_cache = {}
+        self._fit_snapshot = None
+
         # Store the result
         for i in range(len(self._fitter.estimate)):
                 
@@ -465,7 +1276,9 @@ class GlobalFit:
 
     def delete_current_fit(self):
         """
-        Delete the current experiment (if it exists).
+        Delete the current experiment (if it exists).  The flattened 
+        description of the fit is marked stale and rebuilt the next time it is
+        needed, so building up a fit one change at a time stays cheap.
         """
 
         try:
@@ -473,11 +1286,13 @@ class GlobalFit:
         except AttributeError:
             pass
 
-        self._prep_fit()
+        self._fit_snapshot = None
+        self._prep_stale = True
 
     def plot(self,correct_molar_ratio=False,subtract_dilution=False,
              normalize_heat_to_shot=False,color_list=None,
-             data_symbol="o",linewidth=1.5,num_samples=100):
+             data_symbol="o",linewidth=1.5,num_samples=100,band=False,
+             quantiles=(2.5,50,97.5)):
         """
         Plot the experimental data and fit results.
 
@@ -498,11 +1313,21 @@ class GlobalFit:
         num_samples : int 
             number of samples to draw when drawing fits like Bayesian fits with
             multiple fits. 
+        band : bool
+            if True and the fit has samples, draw the fit for each experiment
+            as a shaded envelope between the lower and upper quantiles of the
+            sampled curves, with a line at the middle quantile, rather than
+            drawing one line per sample.
+        quantiles : list-like of three floats
+            lower, middle and upper percentiles (0-100) used for band plots.
 
         Returns matplotlib Figure and AxesSubplot instances that can be further
         manipulated by the user of the API.
         """
 
+        from matplotlib import pyplot as plt
+        from matplotlib import gridspec
+
         # Make graph of appropraite size
         fig = plt.figure(figsize=(5.5,6)) 
 
@@ -561,7 +1386,7 @@ class GlobalFit:
         except AttributeError:
 
             # If fit has not been done, create dummy version
-            self._prep_fit()
+            self._update_prep()
             these_samples = [np.array(self._flat_param)]
 
         # If there are multiple samples, assign them partial transparency
@@ -570,38 +1395,55 @@ class GlobalFit:
         else:
             alpha = 0.1
 
-        for i, s in enumerate(these_samples):
+        # Bands only make sense with multiple samples
+        band = band and len(these_samples) > 1
+        if band and len(quantiles) != 3:
+            err = "quantiles must have three values (lower, middle, upper).\n"
+            raise ValueError(err)
 
-            # Update calculation for this sample
-            self._y_calc(s)
-            for j, expt_name in enumerate(self._expt_list_stable_order):
+        # Calculate all samples for each experiment in one batch
+        expt_params = self._expt_param_batch(these_samples)
 
-                # Extract fit info for this experiment
-                e = self._expt_dict[expt_name]
-                mr = e.mole_ratio
-                heats = e.heats
-                calc = self._expt_dict[expt_name].dQ
+        for j, expt_name in enumerate(self._expt_list_stable_order):
 
-                if len(calc) > 0:
+            # Extract fit info for this experiment
+            e = self._expt_dict[expt_name]
+            heats = e.heats
+            calc_batch = e.dQ_batch(expt_params[expt_name])
 
-                    # Try to correct molar ratio for competent fraction
-                    if correct_molar_ratio:
-                        try:
-                            mr = mr/e.param_values["fx_competent"]
-                        except KeyError:
-                            pass
+            if subtract_dilution and calc_batch.shape[1] > 0:
+                dilution_batch = e.dilution_heats_batch(expt_params[expt_name])
+                heats_batch = heats - dilution_batch
+                calc_batch = calc_batch - dilution_batch
+            else:
+                heats_batch = np.tile(heats,(len(these_samples),1))
 
-                    # Subtract dilution is requested
-                    if subtract_dilution:
-                        heats = heats - e.dilution_heats
-                        calc = calc - e.dilution_heats
+            if normalize_heat_to_shot and calc_batch.shape[1] > 0:
+                heats_batch = heats_batch/e.mol_injected
+                calc_batch = calc_batch/e.mol_injected
+
+            if band:
+                self._plot_band(ax,e,expt_params[expt_name],heats_batch,calc_batch,
+                                quantiles,correct_molar_ratio,color_list[j],
+                                data_symbol,linewidth)
+                continue
+
+            for i in range(len(these_samples)):
+
+                mr = e.mole_ratio
+                heats = heats_batch[i]
+                calc = calc_batch[i]
 
-                    if normalize_heat_to_shot:
-                        heats = heats/e.mol_injected
-                        calc = calc/e.mol_injected
+                # Try to correct molar ratio for competent fraction
+                if correct_molar_ratio and len(calc) > 0:
+                    try:
+                        fx = expt_params[expt_name][i,e.model.param_names.index("fx_competent")]
+                        mr = mr/fx
+                    except ValueError:
+                        pass
 
                 # Draw fit lines and residuals
-                if len(e.dQ) > 0:
+                if len(calc) > 0:
                     ax[0].plot(mr,calc,color=color_list[j],linewidth=linewidth,alpha=alpha)
                     ax[1].plot(mr,(calc-heats),data_symbol,color=color_list[j],alpha=alpha,markersize=8)     
 
@@ -613,6 +1455,40 @@ class GlobalFit:
 
         return fig, ax
 
+    def _plot_band(self,ax,e,expt_params,heats_batch,calc_batch,quantiles,
+                   correct_molar_ratio,color,data_symbol,linewidth):
+        """
+        Draw one experiment as quantile bands over sampled fits (see plot).
+        Per-shot quantiles of all sampled curves are calculated at once, so
+        each experiment adds a handful of artists regardless of the number of
+        samples.
+        """
+
+        mr = e.mole_ratio
+
+        # Correct molar ratio using the median sampled competent fraction
+        if correct_molar_ratio and calc_batch.shape[1] > 0:
+            try:
+                fx = expt_params[:,e.model.param_names.index("fx_competent")]
+                mr = mr/np.median(fx)
+            except ValueError:
+                pass
+
+        heats = np.median(heats_batch,axis=0)
+
+        if calc_batch.shape[1] > 0:
+
+            lower, middle, upper = np.percentile(calc_batch,quantiles,axis=0)
+            ax[0].fill_between(mr,lower,upper,color=color,alpha=0.3,linewidth=0)
+            ax[0].plot(mr,middle,color=color,linewidth=linewidth)
+
+            resid_lower, resid_middle, resid_upper = np.percentile(calc_batch - heats_batch,
+                                                                   quantiles,axis=0)
+            ax[1].fill_between(mr,resid_lower,resid_upper,color=color,alpha=0.3,linewidth=0)
+            ax[1].plot(mr,resid_middle,data_symbol,color=color,markersize=8)
+
+        ax[0].errorbar(mr,heats,e.heats_stdev,fmt=data_symbol,color=color,markersize=8)
+
     def corner_plot(self,filter_params=("competent","dilution","intercept","heat")):
         """
         Create a "corner plot" that shows distributions of values for each
@@ -628,9 +1504,80 @@ class GlobalFit:
             return self._fitter.corner_plot(filter_params)
         except AttributeError:
             # If the fit has not been done, return an empty plot
+            from matplotlib import pyplot as plt
             dummy_fig = plt.figure(figsize=(5.5,6))
             return dummy_fig
  
+    @property
+    def num_threads(self):
+        """
+        Number of threads used to calculate experiments in parallel.
+        """
+
+        return self._num_threads
+
+    @num_threads.setter
+    def num_threads(self,num_threads):
+        """
+        Set the number of threads (positive int or `"max"`).
+        """
+
+        if num_threads == "max":
+            num_threads = multiprocessing.cpu_count()
+
+        if type(num_threads) != int or num_threads < 1:
+            err = "num_threads must be 'max' or a positive integer\n"
+            raise ValueError(err)
+
+        self._num_threads = num_threads
+
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+        if self._num_threads > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._num_threads)
+
+    def __getstate__(self):
+        """
+        Drop the thread pool and lock when pickling (e.g. to fit a copy of 
+        this fit in another process).
+        """
+
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        state["_num_model_evals_lock"] = None
+
+        return state
+
+    def __setstate__(self,state):
+        """
+        Restore a pickled fit, recreating its thread pool and lock.
+        """
+
+        self.__dict__.update(state)
+        self.num_threads = self._num_threads
+        self._num_model_evals_lock = threading.Lock()
+
+    def _attach_fitter(self,fitter):
+        """
+        Attach a fitter that was run on a copy of this fit (e.g. in another 
+        process) and parse its results.  The fitter's model functions are 
+        pointed back at this fit.
+        """
+
+        self._update_prep()
+
+        fitter._model = self._y_calc_shared
+        fitter._model_batch = self._y_calc_batch
+        fitter._model_jac = None
+        if isinstance(fitter,fitters.MLFitter) and self._analytic_jacobian:
+            fitter._model_jac = self._y_calc_jac
+
+        self._fitter = fitter
+        self._parse_fit()
+        self._record_fit(False)
+
     # -------------------------------------------------------------------------
     # Properties describing fit results
 
@@ -649,29 +1596,36 @@ class GlobalFit:
         u = self._expt_dict[self._expt_list_stable_order[0]].units
         out.append("# Units: {}\n".format(u))
         
-        fit_stats_keys = list(self.fit_stats.keys())
+        # Read the results once rather than rebuilding them for every row
+        fit_stats = self.fit_stats
+        fit_param = self.fit_param
+        fit_stdev = self.fit_stdev
+        fit_ninetyfive = self.fit_ninetyfive
+        global_param = self.global_param
+
+        fit_stats_keys = list(fit_stats.keys())
         fit_stats_keys.sort()
         fit_stats_keys.remove("Fit type")  
  
-        out.append("# {}: {}\n".format("Fit type",self.fit_stats["Fit type"])) 
+        out.append("# {}: {}\n".format("Fit type",fit_stats["Fit type"])) 
         for k in fit_stats_keys:
-            out.append("# {}: {}\n".format(k,self.fit_stats[k]))
+            out.append("# {}: {}\n".format(k,fit_stats[k]))
 
         out.append("type,name,exp_file,value,stdev,bot95,top95,fixed,guess,lower_bound,upper_bound\n") 
-        for k in self.fit_param[0].keys():
+        for k in fit_param[0].keys():
 
             param_type = "global"
             dh_file = "NA"
 
-            fixed = self.global_param[k].fixed
+            fixed = global_param[k].fixed
 
             param_name = k
-            value = self.fit_param[0][k]
-            stdev = self.fit_stdev[0][k]
-            ninetyfive = self.fit_ninetyfive[0][k]
-            guess = self.global_param[k].guess
-            lower_bound = self.global_param[k].bounds[0]
-            upper_bound = self.global_param[k].bounds[1]
+            value = fit_param[0][k]
+            stdev = fit_stdev[0][k]
+            ninetyfive = fit_ninetyfive[0][k]
+            guess = global_param[k].guess
+            lower_bound = global_param[k].bounds[0]
+            upper_bound = global_param[k].bounds[1]
 
             out.append("{:},{:},{:},{:.5e},{:.5e},{:.5e},{:.5e},{:},{:.5e},{:.5e},{:.5e}\n".format(param_type,
                                                                                                    param_name,
@@ -685,14 +1639,14 @@ class GlobalFit:
                                                                                                    lower_bound,
                                                                                                    upper_bound))
 
-        for i in range(len(self.fit_param[1])):
+        for i in range(len(fit_param[1])):
 
             expt_name = self._expt_list_stable_order[i]
 
             param_type = "local"
             dh_file = self._expt_dict[expt_name].dh_file
 
-            for k in self.fit_param[1][i].keys():
+            for k in fit_param[1][i].keys():
 
                 try:
                     alias = self._expt_dict[expt_name].model.parameters[k].alias
@@ -704,9 +1658,9 @@ class GlobalFit:
                 fixed = self._expt_dict[expt_name].model.parameters[k].fixed
 
                 param_name = k 
-                value = self.fit_param[1][i][k]
-                stdev = self.fit_stdev[1][i][k]
-                ninetyfive = self.fit_ninetyfive[1][i][k]
+                value = fit_param[1][i][k]
+                stdev = fit_stdev[1][i][k]
+                ninetyfive = fit_ninetyfive[1][i][k]
                 guess = self._expt_dict[expt_name].model.parameters[k].guess
                 lower_bound = self._expt_dict[expt_name].model.parameters[k].bounds[0]
                 upper_bound = self._expt_dict[expt_name].model.parameters[k].bounds[1]
@@ -757,6 +1711,10 @@ class GlobalFit:
         dictionaries for each local fit.
         """
 
+        fit_result = self.fit_result
+        if fit_result is not None:
+            return fit_result.fit_param
+
         # Global parameters
         global_out_param = {}
         for g in self.global_param.keys():
@@ -777,6 +1735,10 @@ class GlobalFit:
         dictionaries for each local fit.
         """
 
+        fit_result = self.fit_result
+        if fit_result is not None:
+            return fit_result.fit_stdev
+
         # Global parameters
         global_out_stdev = {}
         for g in self.global_param.keys():
@@ -797,6 +1759,10 @@ class GlobalFit:
         dictionaries for each local fit.
         """
 
+        fit_result = self.fit_result
+        if fit_result is not None:
+            return fit_result.fit_ninetyfive
+
         # Global parameters
         global_out_ninetyfive = {}
         for g in self.global_param.keys():
@@ -825,6 +1791,8 @@ class GlobalFit:
         Return the number of observations used for the fit.
         """
 
+        self._update_prep()
+
         return len(self._y_obs)
 
 
@@ -834,6 +1802,8 @@ class GlobalFit:
         Return the number of parameters fit.
         """
 
+        self._update_prep()
+
         return len(self._flat_param)
 
 
@@ -844,69 +1814,30 @@ class GlobalFit:
         """
 
         # Only return something if the fit has already been done
-        try:
-            self._fitter
-        except AttributeError:
+        fit_result = self.fit_result
+        if fit_result is None:
             return {}
 
-        output = {}
-     
-        output["num_obs"] = self.fit_num_obs
-        output["num_param"] = self.fit_num_param
-        output["df"] = self.fit_num_obs - self.fit_num_param
- 
-        # Create a vector of calcluated and observed values.  
-        y_obs = [] 
-        y_estimate = []
-        for k in self._expt_dict:
-            y_obs.extend(self._expt_dict[k].heats)
-            y_estimate.extend(self._expt_dict[k].dQ)
-        y_estimate= np.array(y_estimate)
-        y_obs = np.array(y_obs)
-
-        P = self.fit_num_param
-        N = self.fit_num_obs
- 
-        sse = np.sum((y_obs -          y_estimate)**2)
-        sst = np.sum((y_obs -      np.mean(y_obs))**2)
-        ssm = np.sum((y_estimate - np.mean(y_obs))**2)
+        return fit_result.stats
 
-        output["Fit type"] = self._fitter.fit_type
-        
-        fit_info = self._fitter.fit_info
-        for x in fit_info.keys():
-            output["  {}: {}".format(self._fitter.fit_type,x)] = fit_info[x]
-
-        # Calcluate R**2 and adjusted R**2
-        if sst == 0.0:
-            output["Rsq"] = np.inf
-            output["Rsq_adjusted"] = np.inf
-        else:
-            Rsq = 1 - (sse/sst)
-            Rsq_adjusted = Rsq - (1 - Rsq)*P/(N - P - 1)
-
-            output["Rsq"] = Rsq
-            output["Rsq_adjusted"] = Rsq_adjusted
-        
-        # calculate F-statistic
-        msm = (1/P)*ssm
-        mse = 1/(N - P - 1)*sse
-        if mse == 0.0:
-            output["F"] = np.inf
-        else:
-            output["F"] = msm/mse
+    @property
+    def fit_result(self):
+        """
+        Snapshot of the current fit results (a FitResult instance), or None if
+        the fit has not been done.  The snapshot is made the first time it is
+        needed after each fit and reused until the fit or its parameter values 
+        change.
+        """
 
-        # Calcluate log-likelihood
-        lnL = self._fitter.ln_like(self._fitter.estimate) 
-        output["ln(L)"] = lnL
+        try:
+            self._fitter
+        except AttributeError:
+            return None
 
-        # AIC and BIC
-        P_all = P + 1 # add parameter to account for implicit residual
-        output["AIC"] = 2*P_all  - 2*lnL
-        output["BIC"] = P_all*np.log(N) - 2*lnL
-        output["AICc"] = output["AIC"] + 2*(P_all + 1)*(P_all + 2)/(N - P_all - 2)
+        if self._fit_snapshot is None:
+            self._fit_snapshot = FitResult(self)
 
-        return output
+        return self._fit_snapshot
 
     # -------------------------------------------------------------------------
     # Properties describing currently loaded parameters and experiments
@@ -1018,6 +1949,13 @@ class GlobalFit:
         else:
             self._expt_dict[expt.experiment_id].model.update_guesses({param_name:param_guess})
 
+        # A new guess takes precedence over the last estimate when warm starting
+        for key in list(self._last_estimates.keys()):
+            if key[1] != param_name:
+                continue
+            if expt is None or key[0] == expt.experiment_id:
+                self._last_estimates.pop(key)
+
         self.delete_current_fit()
 
     #--------------------------------------------------------------------------
@@ -1221,6 +2159,9 @@ class GlobalFit:
             for n, p in self._expt_dict[expt_name].model.parameters.items():
                 p.value = p.guess
 
+        self._expt_dQ_cache = {}
+        self._fit_snapshot = None
+
     def update_value(self,param_name,param_value,expt=None):
         """
         Update the one of the values for this fit.  If the experiment is None,
@@ -1246,3 +2187,6 @@ class GlobalFit:
         else:
             self._expt_dict[expt.experiment_id].model.update_values({param_name:param_value})
 
+        self._expt_dQ_cache = {}
+        self._fit_snapshot = None
+
@@ -8,12 +8,10 @@ referred to as auto-regulated protein assembly and related to the prozone effect
 __author__ = "Martin L. Rennie"
 __date__ = "2018-02-22"
 
-import inspect
+import inspect, warnings
 import numpy as np
-from scipy.optimize import root as solve_mass_balance
-from scipy.optimize import OptimizeResult
 
-from pytc.indiv_models.base import ITCModel
+from pytc.indiv_models.base import ITCModel, param_cached
 
 class AssemblyAutoInhibition(ITCModel):
     """
@@ -69,95 +67,342 @@ class AssemblyAutoInhibition(ITCModel):
         self._is_reverse = is_reverse
         
         # set initial bounds of certain parameters
-        self._params["m"]._bounds = (2.,100.)
-        self._params["n_lig"]._bounds = (0.1,100.)
-        self._params["n_prot"]._bounds = (0.1,100.)
-        
-        
+        self.update_bounds({"m":(2.,100.),
+                            "n_lig":(0.1,100.),
+                            "n_prot":(0.1,100.)})
+
+        # Free concentrations from the last mass balance solution, used as
+        # initial guesses when the parameters have only moved a little.
+        self._mb_cache = None
+        self._mb_cache_tol = 0.1
+        self._mb_stats = {"calls":0,"hits":0,"warm_iter":0,"cold_iter":0,
+                          "unconverged":0}
+
 
     @property
+    @param_cached
     def dQ(self):
         """
         Calculate the heats that would be observed across shots for a given set
         of enthalpies and binding constants for each reaction.  
         """
 
+        return self._calc_heats(self.param_vector,warm_start=True)
+
+    def evaluate(self,param_vector):
+        """
+        Return the heats for param_vector without changing the model (see
+        ITCModel.evaluate).  The mass balance is solved from a cold start and
+        the warm-start cache and solver statistics are left alone.
+        """
+
+        return self._calc_heats(np.asarray(param_vector,dtype=float),warm_start=False)
+
+    def _calc_heats(self,param_vector,warm_start):
+        """
+        Calculate the heats for param_vector (ordered like self.param_names).
+        If warm_start, start the mass balance solver from the cached solution
+        when it is close enough, then cache the new solution and record solver
+        statistics.
+        """
+
+        param = dict(zip(self._param_names,param_vector))
+        Klig1 = param["Klig1"]
+        Klig2 = param["Klig2"]
+        Kolig = param["Kolig"]
+        dHlig1 = param["dHlig1"]
+        dHlig2 = param["dHlig2"]
+        dHolig = param["dHolig"]
+        m = param["m"]
+        n_lig = param["n_lig"]
+        n_prot = param["n_prot"]
+
         # if reverse titration setup swap the corrections for competent stationary and competent titrant
         if(self._is_reverse):
-            S_conc_corr = self._S_conc*self.param_values["fx_lig_competent"]
-            T_conc_corr = self._T_conc*self.param_values["fx_prot_competent"]
+            S_conc_corr = self._S_conc*param["fx_lig_competent"]
+            T_conc_corr = self._T_conc*param["fx_prot_competent"]
         else:
-            S_conc_corr = self._S_conc*self.param_values["fx_prot_competent"]
-            T_conc_corr = self._T_conc*self.param_values["fx_lig_competent"]
+            S_conc_corr = self._S_conc*param["fx_prot_competent"]
+            T_conc_corr = self._T_conc*param["fx_lig_competent"]
         
         num_shots = len(S_conc_corr)
         
-        heat_array = np.zeros((num_shots-1),dtype=float)
-        prot_free = np.zeros((num_shots),dtype=float)
-        lig_free = np.zeros((num_shots),dtype=float)
-        
-        # call function to compute the free species by numerical solution of the mass balance equations        
-        (prot_free, lig_free) = solve_mb(self._is_reverse, num_shots, 
-            self.param_values["Klig1"], self.param_values["Klig2"], self.param_values["Kolig"], 
-            self.param_values["m"], self.param_values["n_lig"], self.param_values["n_prot"], S_conc_corr, 
-            T_conc_corr)
-        
+        # compute the free species by numerical solution of the mass balance
+        # equations, starting from the cached solution if it is close enough
+        mb_param = np.array([Klig1,Klig2,Kolig,m,n_lig,n_prot,
+                             S_conc_corr[-1],T_conc_corr[-1]],dtype=float)
+        if warm_start:
+            p_guess, l_guess = self._mb_guess(mb_param)
+        else:
+            p_guess, l_guess = None, None
+
+        (prot_free, lig_free, num_iter, num_unconverged) = _solve_mb_newton(self._is_reverse,
+            num_shots, Klig1, Klig2, Kolig, m, n_lig, n_prot, S_conc_corr,
+            T_conc_corr, p_guess, l_guess)
+
+        if warm_start:
+            self._mb_stats["calls"] += 1
+            self._mb_stats["unconverged"] += num_unconverged
+            if p_guess is None:
+                self._mb_stats["cold_iter"] += num_iter
+            else:
+                self._mb_stats["hits"] += 1
+                self._mb_stats["warm_iter"] += num_iter
+            self._mb_cache = (mb_param,prot_free,lig_free)
+
+        # concentrations of each complex across the titration
+        lig1 = Klig1*prot_free*lig_free
+        lig_all = Klig1*Klig2**(m-1)*prot_free*lig_free**m
+        olig = Kolig**(n_lig + n_prot - 1)*prot_free**n_prot*lig_free**n_lig
+
         # compute the heat of each injection
+        dilution = 1. - self._shot_volumes/self._cell_volume
         heat_array = self._cell_volume * \
-                (self.param_values["dHlig1"] * (self.param_values["Klig1"] * prot_free[1:] * lig_free[1:] -   \
-                            self.param_values["Klig1"] * prot_free[:-1] * lig_free[:-1] * (1. - self._shot_volumes/self._cell_volume)) +   \
-                (self.param_values["dHlig1"] + self.param_values["dHlig2"]) * (self.param_values["Klig1"] * self.param_values["Klig2"]**(self.param_values["m"]-1) * prot_free[1:] * lig_free[1:]**self.param_values["m"] -   \
-                            self.param_values["Klig1"] * self.param_values["Klig2"]**(self.param_values["m"]-1) * prot_free[:-1] * lig_free[:-1]**self.param_values["m"] * (1. - self._shot_volumes/self._cell_volume)) +   \
-                self.param_values["dHolig"] * (self.param_values["Kolig"]**(self.param_values["n_lig"] + self.param_values["n_prot"] - 1) * prot_free[1:]**self.param_values["n_prot"] * lig_free[1:]**self.param_values["n_lig"] -   \
-                            self.param_values["Kolig"]**(self.param_values["n_lig"] + self.param_values["n_prot"] - 1) * prot_free[:-1]**self.param_values["n_prot"] * lig_free[:-1]**self.param_values["n_lig"] * (1. - self._shot_volumes/self._cell_volume)))
+                (dHlig1*(lig1[1:] - lig1[:-1]*dilution) + \
+                 (dHlig1 + dHlig2)*(lig_all[1:] - lig_all[:-1]*dilution) + \
+                 dHolig*(olig[1:] - olig[:-1]*dilution))
         
         # correct for the heats of dilution        
-        return heat_array + self.dilution_heats
+        return heat_array + self.dilution_heats_batch(param_vector)[0]
+
+    def _mb_guess(self,mb_param):
+        """
+        Return cached free protein and ligand profiles to use as initial
+        guesses if no parameter in mb_param (the parameters entering the mass
+        balance) has changed by more than _mb_cache_tol (relative) since they
+        were solved.  Otherwise return (None,None).
+        """
 
+        if self._mb_cache is None:
+            return None, None
 
-def solve_mb(reverse, N_points, K1, K2, K3, m, n_oligL, n_oligP, Pt, Lt):
+        old_param, p, l = self._mb_cache
+        change = np.abs(mb_param - old_param)/np.maximum(np.abs(old_param),1e-300)
+        if np.all(change <= self._mb_cache_tol):
+            return p, l
+
+        return None, None
+
+    @property
+    def solver_stats(self):
+        """
+        Statistics on the mass balance solver and its warm-start cache: the
+        number of solves, the fraction started from the cached solution, the
+        mean Newton iterations for warm and cold starts, the estimated
+        number of iterations saved by warm starts and the number of shots 
+        that did not converge.
+        """
+
+        stats = self._mb_stats
+        calls = stats["calls"]
+        hits = stats["hits"]
+        misses = calls - hits
+
+        output = {}
+        output["calls"] = calls
+        if calls > 0:
+            output["hit rate"] = hits/calls
+        else:
+            output["hit rate"] = 0.0
+
+        if hits > 0:
+            output["mean warm iterations"] = stats["warm_iter"]/hits
+        else:
+            output["mean warm iterations"] = np.nan
+
+        if misses > 0:
+            output["mean cold iterations"] = stats["cold_iter"]/misses
+            output["iterations saved"] = hits*stats["cold_iter"]/misses - stats["warm_iter"]
+        else:
+            output["mean cold iterations"] = np.nan
+            output["iterations saved"] = np.nan
+
+        output["unconverged shots"] = stats["unconverged"]
+
+        return output
+
+
+def solve_mb(reverse, N_points, K1, K2, K3, m, n_oligL, n_oligP, Pt, Lt,
+             p_guess=None, l_guess=None):
     """
     Solve mass balance equations for the Assembly AutoInhibition model.
     
     Returns a tuple of arrays for the free protein and free ligand concentrations.
+    See _solve_mb_newton for the method; p_guess and l_guess are optional 
+    starting free concentrations for each shot.
     """
-                
-    p = np.zeros(N_points)
-    l = np.zeros(N_points)
-    
+
+    p, l, num_iter, num_unconverged = _solve_mb_newton(reverse, N_points, K1, K2, K3,
+                                                       m, n_oligL, n_oligP, Pt, Lt,
+                                                       p_guess, l_guess)
+
+    return (p,l)
+
+def _solve_mb_newton(reverse, N_points, K1, K2, K3, m, n_oligL, n_oligP, Pt, Lt,
+                     p_guess=None, l_guess=None, tol=1e-12, max_iter=200):
+    """
+    Solve the mass balance equations for every shot at once.
+
+    In log concentrations (u = ln p, v = ln l) the two mass balance residuals
+    are the gradient of the convex potential
+
+        phi = p + l + K1*p*l + K1*K2**(m-1)*p*l**m 
+                + K3**(n_oligL+n_oligP-1)*p**n_oligP*l**n_oligL - Pt*u - Lt*v
+
+    whose Hessian (the Jacobian of the residuals) is a symmetric positive
+    definite 2x2 matrix.  Damped Newton steps with a backtracking line search
+    on phi therefore converge from any starting point.  All shots are solved
+    together, with each shot dropping out once it has converged.  Shots with
+    no protein or no ligand have trivial solutions and are not iterated.
+
+    Returns arrays of free protein and free ligand, the number of Newton
+    iterations taken and the number of shots that were still outside the
+    tolerance after max_iter iterations.  If any shots did not converge, a
+    RuntimeWarning is issued.
+    """
+
+    Pt = np.array(Pt[:N_points],dtype=float)
+    Lt = np.array(Lt[:N_points],dtype=float)
+
     # if reverse titration setup swap titrant and stationary    
     if(reverse):
-        tmp = Pt
-        Pt = Lt
-        Lt = tmp
-    
-    p[0] = Pt[0]
-    l[0] = Lt[0]
-    
-    for i in range(N_points-1):
-        
-        # mass balance equations
-        def equations(x):
-            p,l = x
-            return [p + K1*p*l + K1*K2**(m-1.)*p*l**m + n_oligP*(K3**(n_oligL+n_oligP-1))*p**n_oligP*l**n_oligL - Pt[i+1], \
-                    l + K1*p*l + m*K1*K2**(m-1.)*p*l**m + n_oligL*(K3**(n_oligL+n_oligP-1))*p**n_oligP*l**n_oligL - Lt[i+1]]
-    
-        sol = OptimizeResult(success=False)
-        ptmp = -1
-        ltmp = -1
-        j = 1.
-        # try to solve using previous free concentrations as initial guesses. Maximum number of iterations is large as gradient may be very shallow
-        sol = solve_mass_balance(equations,(p[i],l[i]),method='lm',options={'maxiter':2000})
-        ptmp,ltmp = sol.x
-        # if no solution try to solve with different initial conditions and solver options
-        if(not sol.success):
-            sol = solve_mass_balance(equations,(Pt[i],Lt[i]),method='lm',options={'factor':1,'maxiter':8000})
-            ptmp,ltmp = sol.x
-            # if still no solution...bugger
-            if(not sol.success):
-                print("ERROR: Could not find solution...")
-    
-        l[i+1] = ltmp
-        p[i+1] = ptmp
-        
-    return (p,l)
+        Pt, Lt = Lt, Pt
+
+    p = np.where(Lt > 0,0.0,np.maximum(Pt,0.0))
+    l = np.where(Pt > 0,0.0,np.maximum(Lt,0.0))
+
+    # Only shots with both species present need to be solved
+    to_solve = np.logical_and(Pt > 0,Lt > 0)
+    if not np.any(to_solve):
+        return p, l, 0, 0
+
+    P = Pt[to_solve]
+    L = Lt[to_solve]
+
+    # Start from the guesses (where usable) or the total concentrations
+    u = np.log(P)
+    v = np.log(L)
+    if p_guess is not None and l_guess is not None:
+        pg = np.asarray(p_guess,dtype=float)[:N_points][to_solve]
+        lg = np.asarray(l_guess,dtype=float)[:N_points][to_solve]
+        usable = np.logical_and(pg > 0,lg > 0)
+        u[usable] = np.log(pg[usable])
+        v[usable] = np.log(lg[usable])
+
+    # Log stability constants of the complexes
+    ln_K1 = np.log(K1)
+    ln_A = ln_K1 + (m - 1)*np.log(K2)
+    ln_B = (n_oligL + n_oligP - 1)*np.log(K3)
+
+    # Lower the starting concentrations until no complex exceeds the smaller
+    # total, so the first Newton step does not start from an overflow.
+    ln_min = np.log(np.minimum(P,L))
+    for ln_K, a, b in ((ln_K1,1,1),(ln_A,1,m),(ln_B,n_oligP,n_oligL)):
+        excess = np.maximum(ln_K + a*u + b*v - ln_min,0.0)
+        u = u - excess/(a + b)
+        v = v - excess/(a + b)
+
+    def terms(u,v):
+        return (np.exp(u),
+                np.exp(v),
+                np.exp(ln_K1 + u + v),
+                np.exp(ln_A + u + m*v),
+                np.exp(ln_B + n_oligP*u + n_oligL*v))
+
+    def potential(t,u,v,P,L):
+        return t[0] + t[1] + t[2] + t[3] + t[4] - P*u - L*v
+
+    def gradient(t,P,L):
+        return (t[0] + t[2] + t[3] + n_oligP*t[4] - P,
+                t[1] + t[2] + m*t[3] + n_oligL*t[4] - L)
+
+    active = np.arange(len(P))
+    num_iter = 0
+    num_unconverged = 0
+    with np.errstate(over="ignore",invalid="ignore"):
+
+        for num_iter in range(1,max_iter + 1):
+
+            ua = u[active]
+            va = v[active]
+            Pa = P[active]
+            La = L[active]
+
+            t = terms(ua,va)
+            gP, gL = gradient(t,Pa,La)
+
+            # Drop shots whose relative residuals are below tolerance
+            done = np.logical_and(np.abs(gP) <= tol*Pa,np.abs(gL) <= tol*La)
+            if np.all(done):
+                break
+
+            keep = np.logical_not(done)
+            active = active[keep]
+            ua, va, Pa, La = ua[keep], va[keep], Pa[keep], La[keep]
+            t = tuple(x[keep] for x in t)
+            gP, gL = gP[keep], gL[keep]
+
+            # Analytic Jacobian in log space (symmetric positive definite)
+            Hpp = t[0] + t[2] + t[3] + n_oligP**2*t[4]
+            Hll = t[1] + t[2] + m**2*t[3] + n_oligL**2*t[4]
+            Hpl = t[2] + m*t[3] + n_oligP*n_oligL*t[4]
+
+            det = Hpp*Hll - Hpl**2
+            du = -(Hll*gP - Hpl*gL)/det
+            dv = -(Hpp*gL - Hpl*gP)/det
+
+            # Backtracking line search: accept steps that decrease the 
+            # potential enough or, near the solution where the potential is
+            # flat to rounding error, decrease the residual.
+            phi0 = potential(t,ua,va,Pa,La)
+            slope = gP*du + gL*dv
+            res0 = np.maximum(np.abs(gP)/Pa,np.abs(gL)/La)
+
+            alpha = np.ones(len(active),dtype=float)
+            searching = np.ones(len(active),dtype=bool)
+            for j in range(60):
+
+                un = ua[searching] + alpha[searching]*du[searching]
+                vn = va[searching] + alpha[searching]*dv[searching]
+                tn = terms(un,vn)
+                phi = potential(tn,un,vn,Pa[searching],La[searching])
+                gPn, gLn = gradient(tn,Pa[searching],La[searching])
+                res = np.maximum(np.abs(gPn)/Pa[searching],np.abs(gLn)/La[searching])
+
+                ok = np.logical_or(phi <= phi0[searching] + 1e-4*alpha[searching]*slope[searching],
+                                   res < res0[searching])
+                ok = np.logical_and(ok,np.isfinite(phi))
+
+                idx = np.arange(len(active))[searching]
+                searching[idx[ok]] = False
+                if not np.any(searching):
+                    break
+                alpha[searching] = alpha[searching]/2
+
+            # Shots where no step helps are as converged as they can get
+            stuck = searching
+            alpha[stuck] = 0.0
+
+            u[active] = ua + alpha*du
+            v[active] = va + alpha*dv
+
+            active = active[np.logical_not(stuck)]
+            if len(active) == 0:
+                break
+
+        else:
+
+            # Ran out of iterations: count the shots still outside tolerance
+            t = terms(u[active],v[active])
+            gP, gL = gradient(t,P[active],L[active])
+            done = np.logical_and(np.abs(gP) <= tol*P[active],np.abs(gL) <= tol*L[active])
+            num_unconverged = int(np.sum(np.logical_not(done)))
+
+    if num_unconverged > 0:
+        warnings.warn("mass balance did not converge for {} of {} shots in {} iterations".format(
+                      num_unconverged,N_points,max_iter),RuntimeWarning)
+
+    p[to_solve] = np.exp(u)
+    l[to_solve] = np.exp(v)
+
+    return p, l, num_iter, num_unconverged
@@ -7,15 +7,80 @@ Base class for other itc model description.
 __author__ = "Michael J. Harms"
 __date__ = "2016-06-22"
 
-import inspect
+import inspect, functools, copy
 import numpy as np
 from .. import fit_param
 
+@functools.lru_cache(maxsize=1024)
+def _titration_profile(cell_volume,shot_volumes,cell_conc,syringe_conc):
+    """
+    Concentration of a species in the cell across a titration.  shot_volumes
+    is a tuple so the profile can be cached; the returned array is read-only
+    because it is shared by every model with the same titration.
+
+    Does two independent calculations and adds them.  First, it calculates
+    the concentration change due to injection (injected).  It then treats
+    the dilution of the stuff initially in hte cell (diluted).  The sum of
+    these two groups is the total concentration of whatever was titrated.
+    The shot_ratio_product method is described on p. 134 of Freire et al.
+    (2009) Meth Enzymology 455:127-155
+    """
+
+    shot_ratio = 1 - np.array(shot_volumes,dtype=float)/cell_volume
+
+    shot_ratio_prod = np.ones(len(shot_volumes)+1)
+    np.cumprod(shot_ratio,out=shot_ratio_prod[1:])
+
+    injected = syringe_conc*(1 - shot_ratio_prod)
+    diluted = cell_conc*shot_ratio_prod
+
+    out_conc = injected + diluted
+    out_conc.flags.writeable = False
+
+    return out_conc
+
+def param_cached(fcn):
+    """
+    Decorator for model calculations that depend only on the parameter values
+    (dQ, dilution_heats).  The result is cached against the version of the
+    model's parameter store and recalculated only after a parameter value
+    changes.  The cached array is returned read-only because every caller 
+    shares it.  Put it under @property.
+    """
+
+    name = fcn.__name__
+
+    @functools.wraps(fcn)
+    def wrapper(self):
+
+        version = self._param_store.version
+        try:
+            cache_version, value = self._calc_cache[name]
+            if cache_version == version:
+                return value
+        except KeyError:
+            pass
+
+        value = fcn(self)
+        value.flags.writeable = False
+        self._calc_cache[name] = (version,value)
+
+        return value
+
+    return wrapper
+
 class ITCModel:
     """
     Base class from which all ITC models should be sub-classed.
     """
 
+    # True if dQ_jacobian calculates derivatives analytically
+    analytic_jacobian = False
+
+    # Parameter schemas shared by instances, keyed by class and added
+    # parameters (see _initialize_param)
+    _param_schemas = {}
+
     def __init__(self,
                  S_cell=100e-6,S_syringe=0.0,
                  T_cell=0.0,   T_syringe=1000e-6,
@@ -53,38 +118,110 @@ class ITCModel:
     def dQ(self):
         return np.array(())
 
-    # --------------------------------------------------------------------------
+    def write_dQ(self,out,shot_start=0):
+        """
+        Write the heats calculated by the model, starting at shot_start, into
+        out (a preallocated array, usually a view into a larger buffer).
+        Models that can calculate heats in place should redefine this.
+        """
 
-    def _titrate_species(self,cell_conc,syringe_conc):
+        out[:] = self.dQ[shot_start:]
+
+    def _cached_value(self,name):
         """
-        Determine the concentrations of stationary and titrant species in the
-        cell given a set of titration shots and initial concentrations of both
-        the stationary and titrant species.
+        Return the value of a param_cached calculation if it is current for
+        the parameter values, otherwise None.
+        """
+
+        try:
+            cache_version, value = self._calc_cache[name]
+        except KeyError:
+            return None
+
+        if cache_version != self._param_store.version:
+            return None
+
+        return value
 
-        Does two independent calculations and adds them.  First, it calculates
-        the concentration change due to injection (injected).  It then treats
-        the dilution of the stuff initially in hte cell (diluted).  The sum of
-        these two groups is the total concentration of whatever was titrated.
-        The shot_ratio_product method is described on p. 134 of Freire et al.
-        (2009) Meth Enzymology 455:127-155
+    def evaluate(self,param_vector):
         """
+        Return the heats calculated for param_vector (parameter values ordered
+        like self.param_names) without changing the model, so several threads
+        can evaluate one model at once.  dQ is the stateful equivalent, using
+        the values held by the model.  
 
-        volume = np.zeros(len(self._shot_volumes)+1)
-        out_conc = np.zeros(len(self._shot_volumes)+1)
+        This default calculates dQ on a shallow copy of the model that has its
+        own parameter values.  Models that keep other state while calculating
+        (work arrays, warm starts) should redefine it.
+        """
+
+        store = self._param_store.copy()
+        store.values[:] = param_vector
+
+        model = copy.copy(self)
+        model._view_param_store(store,list(self._params.keys()))
+        model._calc_cache = {}
+
+        return model.dQ
+
+    def dQ_batch(self,param_array):
+        """
+        Calculate heats for a batch of parameter sets.
 
-        volume[0] = self._cell_volume
-        out_conc[0] = cell_conc
+        param_array is a (num_sets,num_param) array whose columns are ordered
+        like self.param_names.  Returns a (num_sets,num_shots-1) array.  This
+        default sets each parameter set in turn and calls dQ, then restores
+        the original parameter values.  Models that can calculate heats for
+        many parameter sets at once should redefine it.
+        """
+
+        param_array = np.atleast_2d(param_array)
+        all_params = np.arange(len(self._param_names))
+        current = np.copy(self.param_vector)
+
+        out = []
+        try:
+            for i in range(param_array.shape[0]):
+                self.update_values_by_index(all_params,param_array[i])
+                out.append(self.dQ)
+        finally:
+            self.update_values_by_index(all_params,current)
+
+        return np.array(out,dtype=float)
+
+    def dQ_jacobian(self):
+        """
+        Return a tuple of heats and their derivatives with respect to each 
+        parameter.  The derivatives are a (num_shots-1,num_param) array whose
+        columns are ordered like self.param_names.  Models that can calculate
+        the derivatives analytically redefine this and set analytic_jacobian.
+        """
+
+        err = "{} does not calculate derivatives of dQ.\n".format(type(self).__name__)
+        raise NotImplementedError(err)
+
+    def _param_column(self,param_array,param_name):
+        """
+        Return the column of param_array holding param_name as a 
+        (num_sets,1) array that broadcasts against arrays over shots.
+        """
 
-        shot_ratio = (1 - self._shot_volumes/self._cell_volume)
-        for i in range(len(self._shot_volumes)):
+        return param_array[:,self._param_index[param_name],np.newaxis]
 
-            shot_ratio_prod = np.prod(shot_ratio[:(i+1)])
-            injected = syringe_conc*(1 - shot_ratio_prod)
-            diluted = cell_conc*shot_ratio_prod
+    # --------------------------------------------------------------------------
 
-            out_conc[i+1] = injected + diluted
+    def _titrate_species(self,cell_conc,syringe_conc):
+        """
+        Determine the concentrations of stationary and titrant species in the
+        cell given a set of titration shots and initial concentrations of both
+        the stationary and titrant species.  Models titrated with the same
+        schedule and concentrations share one read-only profile (see
+        _titration_profile).
+        """
 
-        return out_conc
+        return _titration_profile(float(self._cell_volume),
+                                  tuple(self._shot_volumes.astype(float)),
+                                  float(cell_conc),float(syringe_conc))
 
     @property
     def mole_ratio(self):
@@ -99,39 +236,104 @@ class ITCModel:
             return np.array([],dtype=float)
 
     @property
+    @param_cached
     def dilution_heats(self):
         """
         Return the heat of dilution.
         """
 
-        return self._T_conc[1:]*self.param_values["dilution_heat"] + self.param_values["dilution_intercept"]
+        values = self._param_store.values
+
+        return self._T_conc[1:]*values[self._param_index["dilution_heat"]] + \
+               values[self._param_index["dilution_intercept"]]
+
+    def dilution_heats_batch(self,param_array):
+        """
+        Return the heat of dilution for a batch of parameter sets (see
+        dQ_batch) as a (num_sets,num_shots-1) array.
+        """
+
+        param_array = np.atleast_2d(param_array)
+
+        return self._T_conc[1:]*self._param_column(param_array,"dilution_heat") + \
+               self._param_column(param_array,"dilution_intercept")
 
     def _initialize_param(self,param_names=None,param_guesses=None):
         """
-        Initialize the parameters.  
+        Initialize the parameters.  param_names and param_guesses describe
+        parameters to add to those defined by self.param_definition (for
+        example, the sites of a binding polynomial).  The parameter schema is
+        built once for each class and set of added parameters (see 
+        _build_param_schema); each instance copies the schema's parameter
+        store and makes FitParameter views into its copy.
         """
 
-        self._params = {}
+        # Results of param_cached calculations, keyed by name
+        self._calc_cache = {}
 
         if param_names == None:
             param_names = []
         if param_guesses == None:
             param_guesses = []
 
-        # Grab parameter names and guesses from the self.param_definition function
-        a = inspect.getargspec(self.param_definition)
+        key = (type(self),tuple(param_names),tuple(param_guesses))
+        try:
+            schema = ITCModel._param_schemas[key]
+        except KeyError:
+            schema = self._build_param_schema(param_names,param_guesses)
+            ITCModel._param_schemas[key] = schema
+
+        param_order, sorted_names, param_index, store = schema
+
+        self._param_names = sorted_names[:]
+        self._param_index = dict(param_index)
+
+        self._view_param_store(store.copy(),param_order)
+
+    def _view_param_store(self,store,param_order):
+        """
+        Use store for the parameter data.  Parameter data live in contiguous
+        arrays ordered like param_names; each FitParameter (created in 
+        param_order) is a view into one row of store.
+        """
+
+        self._param_store = store
+        self._params = {}
+        for p in param_order:
+            self._params[p] = fit_param.FitParameter.from_store(p,self._param_store,
+                                                                self._param_index[p])
+
+        self._param_list = [self._params[p] for p in self._param_names]
+
+        # Read-only view of the values, so param_vector does not allocate
+        self._param_vector = self._param_store.values.view()
+        self._param_vector.flags.writeable = False
 
-        if type(a.args) != None:
+    def _build_param_schema(self,param_names,param_guesses):
+        """
+        Build the parameter schema for this class: the parameter names in
+        definition order, the sorted names, a dictionary mapping names to 
+        positions in the sorted names and a ParameterStore holding the initial
+        guesses, ranges, bounds, etc. of every parameter.  Parameters come 
+        from param_names/param_guesses, then the arguments of
+        self.param_definition, then the dilution parameters.
+        """
 
-            args = list(a.args)
-            try:
-                args.remove("self")
-            except ValueError:
-                pass
+        param_names = list(param_names)
+        param_guesses = list(param_guesses)
+
+        # Grab parameter names and guesses from the self.param_definition function
+        a = inspect.getfullargspec(type(self).param_definition)
+
+        args = list(a.args)
+        try:
+            args.remove("self")
+        except ValueError:
+            pass
 
         if len(args) != 0:
                 
-            if len(args) != len(a.defaults):
+            if a.defaults is None or len(args) != len(a.defaults):
                 err = "all parameters in self.param_definition must have a default value.\n"
                 raise ValueError(err)
 
@@ -142,12 +344,37 @@ class ITCModel:
         param_names.extend(["dilution_heat","dilution_intercept"])
         param_guesses.extend([0.0,0.0])
 
+        sorted_names = param_names[:]
+        sorted_names.sort()
+        param_index = dict([(p,i) for i, p in enumerate(sorted_names)])
+
+        store = fit_param.ParameterStore(len(sorted_names))
         for i, p in enumerate(param_names):
-            self._params[p] = fit_param.FitParameter(p,guess=param_guesses[i])
+            fit_param.FitParameter(p,guess=param_guesses[i],store=store,
+                                   index=param_index[p])
 
-        self._param_names = param_names[:]
-        self._param_names.sort()
+        return param_names, sorted_names, param_index, store
 
+    def __getstate__(self):
+        """
+        Drop the read-only view of the parameter values when pickling or 
+        copying; a copied view would no longer track the copied values.
+        """
+
+        state = self.__dict__.copy()
+        state.pop("_param_vector",None)
+
+        return state
+
+    def __setstate__(self,state):
+        """
+        Restore the model, recreating the view of the parameter values.
+        """
+
+        self.__dict__.update(state)
+
+        self._param_vector = self._param_store.values.view()
+        self._param_vector.flags.writeable = False
 
     # -------------------------------------------------------------------------
     # parameter names
@@ -180,7 +407,17 @@ class ITCModel:
         Values for each parameter in the model.
         """
 
-        return dict([(p,self._params[p].value) for p in self._param_names])  
+        return dict(zip(self._param_names,self._param_store.values.tolist()))
+
+    @property
+    def param_vector(self):
+        """
+        Values for each parameter in the model as an array ordered like
+        self.param_names.  This is a read-only view of the values held by the
+        model (it changes when the values change), so copy it to keep it.
+        """
+
+        return self._param_vector
  
 
     def update_values(self,param_values):
@@ -192,6 +429,16 @@ class ITCModel:
         for p in param_values.keys():
             self._params[p].value = param_values[p]
 
+    def update_values_by_index(self,param_indices,param_values):
+        """
+        Update parameter values for fit using positions in self.param_names
+        rather than a dictionary.  Used by GlobalFit to apply its compiled
+        parameter scatter plan.
+        """
+
+        self._param_store.values[param_indices] = param_values
+        self._param_store.version += 1
+
     # -------------------------------------------------------------------------
     # parameter stdev
 
@@ -201,7 +448,7 @@ class ITCModel:
         Standard deviation for each parameter in the model.
         """
 
-        return dict([(p,self._params[p].stdev) for p in self._param_names])  
+        return dict(zip(self._param_names,self._param_store.stdevs.tolist()))
  
 
     def update_stdevs(self,param_stdevs):
@@ -222,7 +469,7 @@ class ITCModel:
         95% confidence intervals for each parameter in the model.
         """
 
-        return dict([(p,self._params[p].ninetyfive) for p in self._param_names])  
+        return dict(zip(self._param_names,self._param_store.ninetyfives.tolist()))
  
 
     def update_ninetyfives(self,param_ninetyfives):
@@ -243,7 +490,7 @@ class ITCModel:
         Guesses for each parameter in the model.
         """
 
-        return dict([(p,self._params[p].guess) for p in self._param_names])  
+        return dict(zip(self._param_names,self._param_store.guesses.tolist()))
 
     def update_guesses(self,param_guesses):
         """
@@ -284,7 +531,7 @@ class ITCModel:
         Return the fixed parameters.
         """
 
-        return dict([(p,self._params[p].fixed) for p in self._param_names])  
+        return dict(zip(self._param_names,self._param_store.fixed.tolist()))
 
     def update_fixed(self,fixed_param):
         """
@@ -311,7 +558,8 @@ class ITCModel:
         Return parameter bounds.
         """
 
-        return dict([(p,self._params[p].bounds) for p in self._param_names])  
+        return dict([(p,tuple(b)) for p, b in zip(self._param_names,
+                                                  self._param_store.bounds.tolist())])
 
     def update_bounds(self,bounds):
         """
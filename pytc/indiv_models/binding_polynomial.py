@@ -7,10 +7,8 @@ Models subclassed from ITCModel used to model (and fit) ITC data.
 __author__ = "Michael J. Harms"
 __date__ = "2016-06-22"
 
-import inspect
 import numpy as np
-import scipy.optimize
-from .base import ITCModel
+from .base import ITCModel, param_cached
 
 from . import bp_ext
 
@@ -19,6 +17,8 @@ class BindingPolynomial(ITCModel):
     Base class for a binding polynomial fit.
     """
 
+    analytic_jacobian = True
+
     def param_definition(fx_competent=1.0): 
         """
         Define fraction competent.  The binding polynomial parameters are built
@@ -67,10 +67,21 @@ class BindingPolynomial(ITCModel):
         self._fit_dH_array   = np.zeros(self._num_sites,dtype=float)
         self._fit_beta_list  = ["beta{}".format(i+1) for i in range(self._num_sites)]
         self._fit_dH_list    = ["dH{}".format(i+1) for i in range(self._num_sites)]
+        self._fit_beta_index = np.array([self._param_index[p] for p in self._fit_beta_list],dtype=int)
+        self._fit_dH_index   = np.array([self._param_index[p] for p in self._fit_dH_list],dtype=int)
 
+        # Free titrant from the last calculation; bp_ext uses it as the
+        # starting guess for the next one.
         self._T_conc_free = np.zeros(len(self._S_conc),dtype=float)
+        self._dQ_work = np.zeros(len(self._S_conc) - 1,dtype=float)
+
+        # Free titrant for each parameter set in the last dQ_batch call
+        self._T_conc_free_batch = np.zeros((0,len(self._S_conc)),dtype=float)
+
+        self._bp_stats = {"calls":0,"iterations":0,"fallbacks":0}
 
     @property
+    @param_cached
     def dQ(self):
         """
         Calculate the heats that would be observed across shots for a given set
@@ -78,19 +89,171 @@ class BindingPolynomial(ITCModel):
         for an arbitrary-order binding polynomial.
         """
 
+        final_array = np.zeros(len(self._S_conc) - 1,dtype=float)
+        self._calc_dQ(final_array)
+
+        return final_array
+
+    def evaluate(self,param_vector):
+        """
+        Return the heats for param_vector without changing the model (see
+        ITCModel.evaluate).  bp_ext works in private arrays, so the free
+        titrant is found starting from the previous shot rather than from the
+        last calculation, and solver statistics are not recorded.
+        """
+
+        values = np.asarray(param_vector,dtype=float)
+        fit_beta_array = np.ascontiguousarray(values[self._fit_beta_index])
+        fit_dH_array = np.ascontiguousarray(values[self._fit_dH_index])
+        dilution_heats = np.ascontiguousarray(self.dilution_heats_batch(values)[0])
+
+        S_conc_corr = self._S_conc*values[self._param_index["fx_competent"]]
+        num_shots = len(S_conc_corr)
+
+        T_conc_free = np.zeros(num_shots,dtype=float)
+        final_array = np.zeros(num_shots - 1,dtype=float)
+
+        bp_ext.dQ(self._cell_volume, num_shots, self._T_conc.size,
+            self._num_sites, dilution_heats, fit_beta_array, fit_dH_array,
+            S_conc_corr, self._T_conc, T_conc_free, final_array)
+
+        return final_array
+
+    def write_dQ(self,out,shot_start=0):
+        """
+        Write the heats calculated by the model, starting at shot_start, into
+        out.  Heats already calculated for these parameter values are copied;
+        otherwise bp_ext is run on the shots from shot_start onward and writes
+        directly into out (or, if out is not contiguous, into a work array
+        held by the model).
+        """
+
+        dQ = self._cached_value("dQ")
+        if dQ is not None:
+            out[:] = dQ[shot_start:]
+        elif out.flags.c_contiguous:
+            self._calc_dQ(out,shot_start)
+        else:
+            work = self._dQ_work[shot_start:]
+            self._calc_dQ(work,shot_start)
+            out[:] = work
+
+    def _calc_dQ(self,final_array,shot_start=0):
+        """
+        Have bp_ext write heats for every shot from shot_start onward into
+        final_array (a contiguous float array of length num_shots - 1 -
+        shot_start).  Heat i depends only on shots i and i + 1, so shots 
+        before shot_start are not solved.
+        """
+
         # Populate fitting parameter arrays
-        for i in range(self._num_sites):
-            self._fit_beta_array[i] = self.param_values[self._fit_beta_list[i]]
-            self._fit_dH_array[i] = self.param_values[self._fit_dH_list[i]]
+        values = self.param_vector
+        np.take(values,self._fit_beta_index,out=self._fit_beta_array)
+        np.take(values,self._fit_dH_index,out=self._fit_dH_array)
 
-        S_conc_corr = self._S_conc*self.param_values["fx_competent"]
+        S_conc_corr = self._S_conc[shot_start:]*values[self._param_index["fx_competent"]]
         num_shots = len(S_conc_corr)
-        size_T = self._T_conc.size
+        size_T = self._T_conc.size - shot_start
+
+        # bp_ext does not check the length of the array it writes into
+        if final_array.shape != (num_shots - 1,):
+            err = "final_array must hold the {} heats from shot_start onward\n".format(num_shots - 1)
+            raise ValueError(err)
 
-        final_array = np.zeros((num_shots-1),dtype=float)
+        num_iter, num_fallback = bp_ext.dQ(self._cell_volume, num_shots, size_T, 
+            self._num_sites, self.dilution_heats[shot_start:], self._fit_beta_array,
+            self._fit_dH_array, S_conc_corr, self._T_conc[shot_start:],
+            self._T_conc_free[shot_start:], final_array)
 
-        bp_ext.dQ(self._cell_volume, num_shots, size_T, self._num_sites, self.dilution_heats, 
-            self._fit_beta_array, self._fit_dH_array, S_conc_corr, self._T_conc, self._T_conc_free, 
-            final_array)
+        self._bp_stats["calls"] += 1
+        self._bp_stats["iterations"] += num_iter
+        self._bp_stats["fallbacks"] += num_fallback
+
+    def dQ_batch(self,param_array):
+        """
+        Calculate heats for a batch of parameter sets in a single bp_ext call
+        (see ITCModel.dQ_batch).  The parameter sets are calculated without
+        the GIL and, if bp_ext was compiled with OpenMP, in parallel.  Free
+        titrant for each set is kept between calls as the starting guess for
+        the set in the same row of the next batch.
+        """
+
+        param_array = np.atleast_2d(np.asarray(param_array,dtype=float))
+        num_sets = param_array.shape[0]
+
+        fit_beta = np.ascontiguousarray(param_array[:,self._fit_beta_index])
+        fit_dH = np.ascontiguousarray(param_array[:,self._fit_dH_index])
+        fx_competent = np.ascontiguousarray(param_array[:,self._param_index["fx_competent"]])
+        dilution_heats = np.ascontiguousarray(self.dilution_heats_batch(param_array))
+
+        # (Re)build the free titrant workspace if the number of sets changed,
+        # starting each set from the last single calculation
+        if self._T_conc_free_batch.shape[0] != num_sets:
+            self._T_conc_free_batch = np.tile(self._T_conc_free,(num_sets,1))
+
+        final_array = np.zeros((num_sets,len(self._S_conc) - 1),dtype=float)
+
+        num_iter, num_fallback = bp_ext.dQ_batch(self._cell_volume, self._num_sites,
+            dilution_heats, fit_beta, fit_dH, fx_competent, self._S_conc, self._T_conc,
+            self._T_conc_free_batch, final_array)
+
+        self._bp_stats["calls"] += num_sets
+        self._bp_stats["iterations"] += num_iter
+        self._bp_stats["fallbacks"] += num_fallback
 
         return final_array
+
+    def dQ_jacobian(self):
+        """
+        Return a tuple of heats and their derivatives with respect to each
+        parameter (see ITCModel.dQ_jacobian).  bp_ext calculates derivatives
+        with respect to the betas, enthalpies and fx_competent by implicit
+        differentiation of the free titrant; the dilution terms are linear.
+        """
+
+        values = self.param_vector
+        np.take(values,self._fit_beta_index,out=self._fit_beta_array)
+        np.take(values,self._fit_dH_index,out=self._fit_dH_array)
+
+        num_shots = len(self._S_conc)
+        final_array = np.zeros(num_shots - 1,dtype=float)
+        bp_jac = np.zeros((num_shots - 1,2*self._num_sites + 1),dtype=float)
+
+        num_iter, num_fallback = bp_ext.dQ_jac(self._cell_volume, self._num_sites,
+            self.dilution_heats, self._fit_beta_array, self._fit_dH_array,
+            values[self._param_index["fx_competent"]], self._S_conc, self._T_conc,
+            self._T_conc_free, final_array, bp_jac)
+
+        self._bp_stats["calls"] += 1
+        self._bp_stats["iterations"] += num_iter
+        self._bp_stats["fallbacks"] += num_fallback
+
+        jac = np.zeros((num_shots - 1,len(self._param_names)),dtype=float)
+        jac[:,self._fit_beta_index] = bp_jac[:,:self._num_sites]
+        jac[:,self._fit_dH_index] = bp_jac[:,self._num_sites:2*self._num_sites]
+        jac[:,self._param_index["fx_competent"]] = bp_jac[:,-1]
+        jac[:,self._param_index["dilution_heat"]] = self._T_conc[1:]
+        jac[:,self._param_index["dilution_intercept"]] = 1.0
+
+        return final_array, jac
+
+    @property
+    def solver_stats(self):
+        """
+        Statistics on the free titrant root finding in bp_ext: the number of
+        calculations, the mean root-finding iterations per shot and the number
+        of shots that fell back to Brent's method.
+        """
+
+        stats = self._bp_stats
+        num_solves = stats["calls"]*len(self._S_conc)
+
+        output = {}
+        output["calls"] = stats["calls"]
+        if num_solves > 0:
+            output["mean iterations per shot"] = stats["iterations"]/num_solves
+        else:
+            output["mean iterations per shot"] = np.nan
+        output["fallbacks"] = stats["fallbacks"]
+
+        return output
@@ -9,7 +9,7 @@ __author__ = "Michael J. Harms"
 __date__ = "2016-06-22"
 
 import numpy as np
-from .base import ITCModel
+from .base import ITCModel, param_cached
 
 class Blank(ITCModel):
     """
@@ -22,6 +22,7 @@ class Blank(ITCModel):
         pass
     
     @property
+    @param_cached
     def dQ(self):
         """
         Calculate heat of dilution as a function of titrant concentration in
@@ -31,3 +32,18 @@ class Blank(ITCModel):
         to_return = self.dilution_heats
 
         return to_return
+
+    def evaluate(self,param_vector):
+        """
+        Return the heat of dilution for param_vector without changing the
+        model (see ITCModel.evaluate).
+        """
+
+        return self.dilution_heats_batch(param_vector)[0]
+
+    def dQ_batch(self,param_array):
+        """
+        Calculate heat of dilution for a batch of parameter sets.
+        """
+
+        return self.dilution_heats_batch(param_array)
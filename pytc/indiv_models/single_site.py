@@ -9,7 +9,7 @@ __date__ = "2016-06-22"
 
 import numpy as np
 
-from .base import ITCModel
+from .base import ITCModel, param_cached
 
 class SingleSite(ITCModel):
     """
@@ -20,22 +20,45 @@ class SingleSite(ITCModel):
         pass
 
     @property
+    @param_cached
     def dQ(self):
         """
         Calculate the heats that would be observed across shots for a given set
         of enthalpies and binding constants for each reaction.
         """
 
+        return self.evaluate(self.param_vector)
+
+    def evaluate(self,param_vector):
+        """
+        Return the heats for param_vector without changing the model (see
+        ITCModel.evaluate).
+        """
+
+        return self.dQ_batch(param_vector)[0]
+
+    def dQ_batch(self,param_array):
+        """
+        Calculate the heats for a batch of parameter sets (rows of
+        param_array, columns ordered like self.param_names).
+        """
+
+        param_array = np.atleast_2d(param_array)
+
+        K = self._param_column(param_array,"K")
+        dH = self._param_column(param_array,"dH")
+        fx_competent = self._param_column(param_array,"fx_competent")
+
         # ----- Determine mole fractions -----
-        S_conc_corr = self._S_conc*self.param_values["fx_competent"]
-        b = S_conc_corr + self._T_conc + 1/self.param_values["K"]
+        S_conc_corr = self._S_conc*fx_competent
+        b = S_conc_corr + self._T_conc + 1/K
         ST = (b - np.sqrt((b)**2 - 4*S_conc_corr*self._T_conc))/2
 
         mol_fx_st = ST/S_conc_corr
 
         # ---- Relate mole fractions to heat -----
-        X = self.param_values["dH"]*(mol_fx_st[1:] - mol_fx_st[:-1])
+        X = dH*(mol_fx_st[:,1:] - mol_fx_st[:,:-1])
    
-        to_return = self._cell_volume*S_conc_corr[1:]*X + self.dilution_heats
+        to_return = self._cell_volume*S_conc_corr[:,1:]*X + self.dilution_heats_batch(param_array)
 
         return to_return
@@ -8,7 +8,7 @@ __author__ = "Michael J. Harms"
 __date__ = "2016-06-22"
 
 import numpy as np
-from .base import ITCModel
+from .base import ITCModel, param_cached
 
 class SingleSiteCompetitor(ITCModel):
     """
@@ -53,17 +53,42 @@ class SingleSiteCompetitor(ITCModel):
 
 
     @property
+    @param_cached
     def dQ(self):
         """
         Calculate the heats that would be observed across shots for a given set
         of enthalpies and binding constants for each reaction.
         """
 
+        return self.evaluate(self.param_vector)
+
+    def evaluate(self,param_vector):
+        """
+        Return the heats for param_vector without changing the model (see
+        ITCModel.evaluate).
+        """
+
+        return self.dQ_batch(param_vector)[0]
+
+    def dQ_batch(self,param_array):
+        """
+        Calculate the heats for a batch of parameter sets (rows of
+        param_array, columns ordered like self.param_names).
+        """
+
+        param_array = np.atleast_2d(param_array)
+
+        K = self._param_column(param_array,"K")
+        Kcompetitor = self._param_column(param_array,"Kcompetitor")
+        dH = self._param_column(param_array,"dH")
+        dHcompetitor = self._param_column(param_array,"dHcompetitor")
+        fx_competent = self._param_column(param_array,"fx_competent")
+
         # ----- Determine mole fractions -----
-        S_conc_corr = self._S_conc*self.param_values["fx_competent"]
+        S_conc_corr = self._S_conc*fx_competent
 
-        c_a = self.param_values["K"]*S_conc_corr
-        c_b = self.param_values["Kcompetitor"]*S_conc_corr
+        c_a = K*S_conc_corr
+        c_b = Kcompetitor*S_conc_corr
         r_a = self._T_conc/S_conc_corr
         r_b = self._C_conc/S_conc_corr
 
@@ -77,9 +102,9 @@ class SingleSiteCompetitor(ITCModel):
         mol_fx_sc = r_b*mol_fx_s/(1/c_b + mol_fx_s)
 
         # ---- Relate mole fractions to heat -----
-        X = self.param_values["dH"]*(mol_fx_st[1:] - mol_fx_st[:-1])
-        Y = self.param_values["dHcompetitor"]*(mol_fx_sc[1:] - mol_fx_sc[:-1])
+        X = dH*(mol_fx_st[:,1:] - mol_fx_st[:,:-1])
+        Y = dHcompetitor*(mol_fx_sc[:,1:] - mol_fx_sc[:,:-1])
 
-        to_return = self._cell_volume*S_conc_corr[1:]*(X + Y) + self.dilution_heats
+        to_return = self._cell_volume*S_conc_corr[:,1:]*(X + Y) + self.dilution_heats_batch(param_array)
 
         return to_return
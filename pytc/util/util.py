@@ -7,6 +7,8 @@ __date__ = "2017-01-28"
 
 import numpy as np
 
+import time, concurrent.futures
+
 def weight_stat(test_stats):
     """
     Return weights for test statistics. 
@@ -24,42 +26,113 @@ def weight_stat(test_stats):
 
     return best_index, weights
 
-def compare_models(*models):
+def _fit_in_process(model):
+    """
+    Fit a GlobalFit in a worker process.  Returns the fitter (with its model
+    functions removed so it can be sent back to the parent process) and the
+    time taken to do the fit.
+    """
+
+    start = time.time()
+    model.fit()
+    fit_time = time.time() - start
+
+    fitter = model._fitter
+    fitter._model = None
+    fitter._model_batch = None
+    fitter._model_jac = None
+
+    return fitter, fit_time
+
+def _fit_models(models,num_processes=1):
+    """
+    Fit every model that has not already been fit successfully.  Models that
+    have been fit are left alone, so their cached fit statistics are reused.
+
+    Parameters:
+        models : list of GlobalFit instances
+        num_processes : number of processes used to fit models concurrently.
+                        If 1, fit models one at a time in this process.
+
+    Returns an array of fit times (nan for models that were not fit).
+    """
+
+    fit_times = np.nan*np.ones(len(models))
+
+    to_fit = [i for i, m in enumerate(models) if not m.fit_success]
+
+    if num_processes > 1 and len(to_fit) > 1:
+
+        # Fit copies of the models in other processes, then attach the
+        # fitters to the original models
+        with concurrent.futures.ProcessPoolExecutor(num_processes) as executor:
+            results = list(executor.map(_fit_in_process,[models[i] for i in to_fit]))
+
+        for i, (fitter, fit_time) in zip(to_fit,results):
+            models[i]._attach_fitter(fitter)
+            fit_times[i] = fit_time
+
+    else:
+        for i in to_fit:
+            print("Fitting model {}".format(i))
+
+            start = time.time()
+            models[i].fit()
+            fit_times[i] = time.time() - start
+
+    return fit_times
+
+def _check_num_obs(models):
+    """
+    Make sure all models fit the same number of observations.
+    """
+
+    num_obs = None
+    for m in models:
+
+        if num_obs is None:
+            num_obs = m.fit_num_obs 
+
+        if num_obs != m.fit_num_obs:
+            err = "All fits must have same observations to do tests!\n"
+            raise ValueError(err)
+
+def compare_models(*models,num_processes=1,plot=True):
     """
     Weight GlobalFits relative to each other using their AIC, AICc, and BIC
     values.
 
     Parameters:
         *models : one more more GlobalFit instances
+        num_processes : number of processes used to fit unfit models 
+                        concurrently.  If 1 (default), models are fit one at
+                        a time.
+        plot : whether or not to plot each model.  If False, the returned
+               list of plots is empty.
 
     **NOTE**: This comparison is only valid if the models all fit the  same
     set of observations.  The models do not need to be nested.
     """
+
+    _check_num_obs(models)
+    _fit_models(models,num_processes)
+
     aic = []
     aic_c = []
     bic = []
 
     plots = []
 
-    num_obs = None
     for i, m in enumerate(models):
 
-        if num_obs is None:
-            num_obs = m.fit_num_obs 
+        fit_stats = m.fit_stats
 
-        if num_obs != m.fit_num_obs:
-            err = "All fits must have same observations to do tests!\n"
-            raise ValueError(err)
+        aic.append(fit_stats["AIC"])       
+        aic_c.append(fit_stats["AICc"])       
+        bic.append(fit_stats["BIC"])
 
-        if not m.fit_success:
-            print("Fitting model {}".format(i))
-            m.fit()
-        
-        aic.append(m.fit_stats["AIC"])       
-        aic_c.append(m.fit_stats["AICc"])       
-        bic.append(m.fit_stats["BIC"])
-
-        plots.append([m.plot(), i])       
+        if plot:
+            plots.append([m.plot(), i])       
 
     out = {}
     
@@ -69,4 +142,54 @@ def compare_models(*models):
    
     return out, plots
 
+def compare_models_table(*models,num_processes=1):
+    """
+    Fit (if necessary) and compare GlobalFits, returning a table.  Models are
+    fit concurrently if num_processes > 1 and are not plotted.
+
+    Parameters:
+        *models : one more more GlobalFit instances
+        num_processes : number of processes used to fit unfit models 
+                        concurrently.  If 1 (default), models are fit one at
+                        a time.
+
+    Returns a numpy structured array with one row per model and the fields
+    model, num_param, AIC, AIC_weight, AICc, AICc_weight, BIC, BIC_weight, 
+    fit_time (seconds; nan if the model had already been fit) and 
+    fit_success.
+
+    **NOTE**: This comparison is only valid if the models all fit the  same
+    set of observations.  The models do not need to be nested.
+    """
+
+    _check_num_obs(models)
+    fit_times = _fit_models(models,num_processes)
+
+    table = np.zeros(len(models),dtype=[("model",int),
+                                        ("num_param",int),
+                                        ("AIC",float),
+                                        ("AIC_weight",float),
+                                        ("AICc",float),
+                                        ("AICc_weight",float),
+                                        ("BIC",float),
+                                        ("BIC_weight",float),
+                                        ("fit_time",float),
+                                        ("fit_success",bool)])
+
+    for i, m in enumerate(models):
+
+        fit_stats = m.fit_stats
+
+        table["model"][i] = i
+        table["num_param"][i] = fit_stats["num_param"]
+        table["AIC"][i] = fit_stats["AIC"]
+        table["AICc"][i] = fit_stats["AICc"]
+        table["BIC"][i] = fit_stats["BIC"]
+        table["fit_success"][i] = m.fit_success
+
+    for stat in ["AIC","AICc","BIC"]:
+        table["{}_weight".format(stat)] = weight_stat(table[stat])[1]
+
+    table["fit_time"] = fit_times
 
+    return table
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import numpy
 
@@ -10,8 +11,15 @@ if sys.version_info[0] < 3:
 from setuptools import setup, find_packages
 from setuptools.extension import Extension
 
-# set up binding polynomial C extension
-ext = Extension('pytc.indiv_models.bp_ext',['src/_bp_ext.c'], include_dirs=[numpy.get_include()])
+# set up binding polynomial C extension.  Set PYTC_OPENMP=1 to compile it with
+# OpenMP, which splits batched calculations across threads.
+if os.environ.get("PYTC_OPENMP","0") == "1":
+    omp_args = ["-fopenmp"]
+else:
+    omp_args = []
+
+ext = Extension('pytc.indiv_models.bp_ext',['src/_bp_ext.c'], include_dirs=[numpy.get_include()],
+                extra_compile_args=omp_args,extra_link_args=omp_args)
 
 # Need to add all dependencies to setup as we go!
 setup(name='pytc-fitter',
@@ -24,7 +32,7 @@ setup(name='pytc-fitter',
       url='https://github.com/harmslab/pytc',
       download_url='https://github.com/harmslab/pytc/tarball/1.1.5',
       zip_safe=False,
-      install_requires=["matplotlib","scipy","numpy","emcee","corner"],
+      install_requires=["matplotlib","scipy","numpy","emcee>=3","corner"],
       package_data={"":["*.h","src/*.h"]},
       classifiers=['Programming Language :: Python'],
       ext_modules=[ext])
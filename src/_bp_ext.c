@@ -18,8 +18,110 @@ typedef struct {
 
 } dqdt_args;
 
+typedef struct {
+
+    long iterations;
+    long fallbacks;
+
+} solver_stats;
+
+typedef struct {
+
+    // sums over i = 1..num_beta of w_i = beta_i*T**i (times exp(-shift)):
+    // D = exp(-shift) + sum(w_i), N = sum(i*w_i), Q = sum(i**2*w_i), 
+    // R = sum(i**3*w_i), H = sum(dH_i*w_i), HJ = sum(i*dH_i*w_i)
+    double D, N, Q, R, H, HJ;
+    double T, shift, log_T;
+    int log_space;
+
+} bp_sums;
+
 typedef double (*callback_type)(double,dqdt_args *);
 
+// Above this, sums of binding polynomial terms are recalculated in log space
+#define BP_SUM_MAX 1e250
+
+void bp_calc_sums(double T_free, double *beta, double *dH, int num_beta, bp_sums *s){
+    /*
+    Sum the terms of the binding polynomial (and their moments) needed by
+    dQdT, its derivatives and the average enthalpy.  Only ratios of these 
+    sums are ever used, so all of them can share a common scale factor.
+
+    Powers of T_free are built up by running multiplication rather than a
+    pow call per term.  If a term overflows (large betas or many sites), the
+    sums are recalculated from the logs of the terms, scaled by the largest
+    one.  dH can be NULL if H and HJ are not needed.
+    */
+
+    int i;
+    double pw, w, n, log_w, max_log_w;
+
+    s->D = 1; s->N = 0; s->Q = 0; s->R = 0; s->H = 0; s->HJ = 0;
+    s->T = T_free;
+    s->shift = 0;
+    s->log_space = 0;
+    s->log_T = T_free > 0 ? log(T_free) : -INFINITY;
+
+    pw = 1;
+    for (i = 0; i < num_beta; i++){
+        pw *= T_free;
+        w = beta[i]*pw;
+        n = (double)(i+1);
+        s->D += w;
+        s->N += n*w;
+        s->Q += n*n*w;
+        s->R += n*n*n*w;
+        if (dH != NULL){
+            s->H += dH[i]*w;
+            s->HJ += n*dH[i]*w;
+        }
+    }
+
+    if (fabs(s->R) < BP_SUM_MAX && fabs(s->HJ) < BP_SUM_MAX && isfinite(s->R) && isfinite(s->HJ)){
+        return;
+    }
+
+    // Log space: scale every term by exp(-max log term)
+    max_log_w = 0;
+    for (i = 0; i < num_beta; i++){
+        if (beta[i] == 0) { continue; }
+        log_w = log(fabs(beta[i])) + (i+1)*s->log_T;
+        if (log_w > max_log_w) { max_log_w = log_w; }
+    }
+
+    s->shift = max_log_w;
+    s->log_space = 1;
+    s->D = exp(-max_log_w); s->N = 0; s->Q = 0; s->R = 0; s->H = 0; s->HJ = 0;
+
+    for (i = 0; i < num_beta; i++){
+        w = beta[i]*exp((i+1)*s->log_T - max_log_w);
+        n = (double)(i+1);
+        s->D += w;
+        s->N += n*w;
+        s->Q += n*n*w;
+        s->R += n*n*n*w;
+        if (dH != NULL){
+            s->H += dH[i]*w;
+            s->HJ += n*dH[i]*w;
+        }
+    }
+}
+
+double bp_power(bp_sums *s, int i, double *pw){
+    /*
+    T_free**i, scaled like the sums in s.  Call for i = 1, 2, ... in order;
+    pw holds the running power and should start at 1.
+    */
+
+    if (s->log_space){
+        return exp(i*s->log_T - s->shift);
+    }
+
+    *pw *= s->T;
+
+    return *pw;
+}
+
 double dQdT(double T_free, dqdt_args *args){
     /*
     T_total = T_free + S_total*(dln(P)/dln(T_free)), so:
@@ -31,21 +133,12 @@ double dQdT(double T_free, dqdt_args *args){
 
         P = (beta1*T_free**1) *  b2*T**2 
     */
-    int i;
-    double numerator, denominator, bt, P;
-
-    numerator = 0;
-    denominator = 1;
 
-    for (i = 0; i < args->num_beta; i++){
-        bt = args->fit_beta_array[i]*pow(T_free,(i+1)); 
-        numerator   += (i+1)*bt;
-        denominator +=       bt;
-    }
+    bp_sums s;
 
-    P = numerator/denominator;
+    bp_calc_sums(T_free, args->fit_beta_array, NULL, args->num_beta, &s);
 
-    return T_free + args->S_total*P - args->T_total;
+    return T_free + args->S_total*s.N/s.D - args->T_total;
 
 }
 
@@ -141,15 +234,199 @@ double brent_func(callback_type f, double xa, double xb, dqdt_args *args) {
     return xcur;
 }
 
-void *dQ(double *fit_beta_obj, double *fit_dH_obj, double *S_conc_corr, double *T_conc, 
-            double *T_conc_free, double cell_volume, double *dilution_heats, int num_sites, 
-            int num_shots, int size_T_conc, double *final_array){
+void dQdT_derivs(double T_free, dqdt_args *args, double *f, double *df, double *d2f){
+    /*
+    Residual of dQdT and its first two derivatives with respect to T_free.
+
+    With beta_i*T**i weights, the mean number of bound titrant (mu), its
+    variance (var) and third central moment (k3) are the derivatives of
+    ln(P) with respect to ln(T_free), so:
+
+        f   = T_free + S_total*mu - T_total
+        f'  = 1 + S_total*var/T_free
+        f'' = S_total*(k3 - var)/T_free**2
+
+    f' >= 1, so f has exactly one root in [0,T_total].
+    */
+
+    double mu, var, k3;
+    bp_sums s;
+
+    bp_calc_sums(T_free, args->fit_beta_array, NULL, args->num_beta, &s);
+
+    mu = s.N/s.D;
+    var = s.Q/s.D - mu*mu;
+    if (var < 0) { var = 0; }
+    k3 = s.R/s.D - 3*mu*s.Q/s.D + 2*mu*mu*mu;
+
+    *f = T_free + args->S_total*mu - args->T_total;
+
+    if (T_free > 0){
+        *df = 1 + args->S_total*var/T_free;
+        *d2f = args->S_total*(k3 - var)/(T_free*T_free);
+    } else {
+        // limit as T_free -> 0
+        *df = 1 + args->S_total*(args->num_beta > 0 ? args->fit_beta_array[0] : 0.0);
+        *d2f = 0;
+    }
+}
+
+double solve_T_free(double guess, dqdt_args *args, solver_stats *stats){
+    /*
+    Find free titrant with safeguarded Halley iterations starting from guess.
+    f(0) < 0 <= f(T_total), so [0,T_total] brackets the root; the bracket is
+    narrowed at every iteration.  A step leaving the bracket, or a Halley step
+    crawling up toward a steep root from far below, is replaced by a
+    Newton step in ln(T_free), which stays positive and reaches roots many
+    orders of magnitude below T_total (strong, high-order binding); if that
+    also leaves the bracket, the bracket is bisected (geometrically once it
+    has a nonzero lower bound).  If the iterations do not converge, fall back
+    to Brent's method on the remaining bracket.
+    */
+
+    double lo = 0.0, hi = args->T_total;
+    double x, x_new, f, df, d2f, denom, step;
+    // 4*finfo(float).eps
+    double rtol = 8.8817841970012523e-16;
+    int i, max_iter = 50;
+
+    x = guess;
+    if (!(x > lo && x <= hi)){
+        x = hi;
+    }
+
+    for (i = 0; i < max_iter; i++){
+
+        stats->iterations++;
+
+        dQdT_derivs(x,args,&f,&df,&d2f);
+
+        // converged to rounding error in the residual
+        if (fabs(f) <= rtol*(args->T_total + fabs(x) + fabs(f - x + args->T_total))){
+            return x;
+        }
+
+        if (f < 0) {
+            lo = x;
+        } else {
+            hi = x;
+        }
+
+        // Halley step, or Newton step if the Halley correction is unusable
+        denom = 2*df*df - f*d2f;
+        if (denom > 0 && isfinite(denom)){
+            step = -2*f*df/denom;
+        } else {
+            step = -f/df;
+        }
+
+        /* A Halley correction that more than halves the Newton step means
+        x is far below a steep (high-order) root, where Halley steps only
+        creep up by a factor of about 1 + 2/(num_sites - 1) */
+        x_new = x + step;
+        if (!(x_new > lo && x_new < hi) || !isfinite(x_new) || denom > 4*df*df){
+            // Newton step in ln(T_free), limited to 50 log units
+            step = -f/(x*df);
+            if (step > 50) { step = 50; }
+            if (step < -50 || isnan(step)) { step = -50; }
+            x_new = x*exp(step);
+        }
+        if (!(x_new > lo && x_new < hi) || !isfinite(x_new)){
+            x_new = lo > 0 ? sqrt(lo*hi) : (lo + hi)/2;
+        }
+
+        if (fabs(x_new - x) <= rtol*fabs(x_new)){
+            return x_new;
+        }
+
+        x = x_new;
+    }
+
+    stats->fallbacks++;
+
+    return brent_func(dQdT, lo, hi, args);
+}
+
+void dQ_jac_shot(double *fit_beta_obj, double *fit_dH_obj, double S_conc, double fx_competent,
+                 bp_sums *sums, int solved, double cell_volume, int num_sites, double avg_dH,
+                 double avg_dH_prev, double *jac_prev, double *jac_this){
+    /*
+    Derivatives of the heat of one shot with respect to beta_1..beta_n,
+    dH_1..dH_n and fx_competent (in that order).
+
+    The average enthalpy h = sum(dH_j*w_j)/D, with w_j = beta_j*T**j, depends
+    on the parameters directly and through the free titrant T.  Implicit
+    differentiation of the mass balance f(T) = 0 gives dT/dp = -(df/dp)/f',
+    with df/dbeta_j = S*T**j*(j - mu)/D, df/dfx = S_conc*mu and
+    f' = 1 + S*var/T (see dQdT_derivs).  dh/dT = cov(dH,j)/T.
+
+    sums are the binding polynomial sums at this shot (see bp_calc_sums).
+    jac_prev holds dh/dp at the previous shot on input and receives the
+    derivatives of this shot's heat; jac_this receives dh/dp at this shot.
+    Either can be NULL (first and last shots).
+    */
+
+    int j, n = num_sites;
+    double S = S_conc*fx_competent;
+    double T = sums->T, D = sums->D;
+    double pw, T_pow, mu, var, cov, fprime, dh_dT, dT, d;
+
+    mu = sums->N/D;
+    var = sums->Q/D - mu*mu;
+    if (var < 0) { var = 0; }
+    cov = sums->HJ/D - avg_dH*mu;
+
+    // Only shots whose free titrant came from the root finder move with it
+    if (solved && T > 0){
+        fprime = 1 + S*var/T;
+        dh_dT = cov/T;
+    } else {
+        fprime = 1;
+        dh_dT = 0;
+    }
+
+    // derivatives with respect to beta_j (T**j/D) and dH_j (w_j/D)
+    pw = 1;
+    for (j = 0; j < n; j++){
+
+        T_pow = bp_power(sums,j+1,&pw)/D;
+
+        dT = -S*T_pow*((j+1) - mu)/fprime;
+        d = T_pow*(fit_dH_obj[j] - avg_dH) + dh_dT*dT;
+        if (jac_prev != NULL){ jac_prev[j] = cell_volume*S*(d - jac_prev[j]); }
+        if (jac_this != NULL){ jac_this[j] = d; }
+
+        d = fit_beta_obj[j]*T_pow;
+        if (jac_prev != NULL){ jac_prev[n+j] = cell_volume*S*(d - jac_prev[n+j]); }
+        if (jac_this != NULL){ jac_this[n+j] = d; }
+    }
+
+    // derivative with respect to fx_competent (through S and T)
+    dT = -S_conc*mu/fprime;
+    d = dh_dT*dT;
+    if (jac_prev != NULL){
+        jac_prev[2*n] = cell_volume*S*(d - jac_prev[2*n]) + cell_volume*S_conc*(avg_dH - avg_dH_prev);
+    }
+    if (jac_this != NULL){ jac_this[2*n] = d; }
+}
+
+void dQ(double *fit_beta_obj, double *fit_dH_obj, double *S_conc, double fx_competent,
+        double *T_conc, double *T_conc_free, double cell_volume, double *dilution_heats,
+        int num_sites, int num_shots, double *final_array, double *jac, solver_stats *stats){
+    /*
+    Calculate heats for one parameter set.  The stationary concentration is
+    S_conc*fx_competent.  T_conc_free holds starting guesses on input and the
+    free titrant on output.  If jac is not NULL, derivatives of the heats are
+    written into it as a (num_shots-1,2*num_sites+1) array (see dQ_jac_shot).
+    Does not allocate or touch Python objects, so it can run without the GIL.
+    */
 
-    double min_value, max_value, bt, T;
-    int i, j, lastT;
-    int num_shots_reduced = num_shots - 1;
+    double min_value, max_value, T, T_prev, guess, S_corr;
+    double avg_dH, avg_dH_prev = 0.0;
+    int i, solved;
+    bp_sums sums;
+    int num_jac = 2*num_sites + 1;
     float DELTA = 0.0, TOLERANCE = 1e-12;
-    double *numerator, *denominator, *avg_dH, *subset_first_dH, *subset_last_dH, *X, *subset_s_conc;
 
     dqdt_args args;
     args.S_total = 0.0;
@@ -157,137 +434,119 @@ void *dQ(double *fit_beta_obj, double *fit_dH_obj, double *S_conc_corr, double *
     args.fit_beta_array = fit_beta_obj;
     args.num_beta = num_sites;
 
-    // num and denom arrays
-    numerator = (double *)malloc(num_shots*sizeof(double));
-    if (numerator== NULL){
-        return NULL;
-    }
+    T_prev = 0.0;
     for (i = 0; i < num_shots; i++){
-        numerator[i] = 0.0;
-    }
-    denominator = (double *)malloc(num_shots*sizeof(double));
-    if (denominator == NULL){
-        return NULL;
-    }
 
-    for (i = 0; i < num_shots; i++){
-        denominator[i] = 1.0;
-    }
-    
-    for (i = 0; i < num_shots; i++){
+        S_corr = S_conc[i]*fx_competent;
+
+        // free titrant from the previous call (if any) for this shot
+        guess = T_conc_free[i];
+        solved = 0;
 
         if (fabs(T_conc[i] - DELTA) < TOLERANCE){
             T_conc_free[i] = 0.0;
-            continue;
-        }
-        args.S_total = S_conc_corr[i];
-        args.T_total = T_conc[i];
-
-        min_value = dQdT(0.0,&args);
-        max_value = dQdT(T_conc[i],&args);
-            
-        // Uh oh, they have same sign (root optimizer will choke)
-        if (min_value*max_value > 0){
-
-            if (max_value < 0){
-                // root is closest to min --> set to that
-                if (max_value < min_value) {
-                    T_conc_free[i] = 0.0;
-                // root is closest to max --> set to that
+        } else {
+
+            args.S_total = S_corr;
+            args.T_total = T_conc[i];
+
+            min_value = dQdT(0.0,&args);
+            max_value = dQdT(T_conc[i],&args);
+
+            // Uh oh, they have same sign (root optimizer will choke)
+            if (min_value*max_value > 0){
+
+                if (max_value < 0){
+                    // root is closest to min --> set to that
+                    if (max_value < min_value) {
+                        T_conc_free[i] = 0.0;
+                    // root is closest to max --> set to that
+                    } else {
+                        T_conc_free[i] = T_conc[i];
+                    }
                 } else {
-                    T_conc_free[i] = T_conc[i];
+                    // root is closest to max --> set to that
+                    if (max_value < min_value){
+                        T_conc_free[i] = T_conc[i];
+
+                    // root is closest to min --> set to that
+                    } else {
+                        T_conc_free[i] = 0.0;
+                    }
                 }
+
             } else {
-                // root is closest to max --> set to that
-                if (max_value < min_value){
-                    T_conc_free[i] = T_conc[i];
 
-                // root is closest to min --> set to that
-                } else {
-                    T_conc_free[i] = 0.0;
+                // Start from the previous call's solution; otherwise from the
+                // previous shot's solution
+                if (!(guess > 0 && guess <= T_conc[i])){
+                    guess = MIN(T_prev,T_conc[i]);
                 }
+                T = solve_T_free(guess, &args, stats);
+
+                // numerical problems sometimes make T slightly bigger than the total
+                // concentration, so bring down to the correct value
+                if (T > T_conc[i]) { T = T_conc[i]; }
+                T_conc_free[i] = T;
+                T_prev = T;
+                solved = 1;
             }
-            continue;
         }
 
-        //double args[2] = {S_conc_corr[i], T_conc[i]};
-        lastT = size_T_conc - 1;
-        T = brent_func(dQdT, 0 , T_conc[lastT], &args);
+        // average enthalpy change at this shot
+        bp_calc_sums(T_conc_free[i], fit_beta_obj, fit_dH_obj, num_sites, &sums);
+        avg_dH = sums.H/sums.D;
 
-        // numerical problems sometimes make T slightly bigger than the total
-        // concentration, so bring down to the correct value
-        if (T > T_conc[i]) { T = T_conc[i]; }
-        T_conc_free[i] = T;
-    }
+        // heat of shot i: cell_volume*S_conc_corr[i]*(avg_dH[i] - avg_dH[i-1])
+        if (i > 0){
+            final_array[i-1] = cell_volume*S_corr*(avg_dH - avg_dH_prev) + dilution_heats[i-1];
+        }
 
-    // calculate the average enthalpy change
-    for (i = 0; i < num_sites; i++){
-        for(j = 0; j < num_shots; j++){
-            bt = fit_beta_obj[i]*pow(T_conc_free[j],(i+1));
-            numerator[j] += fit_dH_obj[i]*bt;
-            denominator[j] += bt;
+        if (jac != NULL){
+            dQ_jac_shot(fit_beta_obj, fit_dH_obj, S_conc[i], fx_competent, &sums,
+                        solved, cell_volume, num_sites, avg_dH, avg_dH_prev,
+                        i > 0 ? jac + (long)(i-1)*num_jac : NULL,
+                        i < num_shots - 1 ? jac + (long)i*num_jac : NULL);
         }
-    }
 
-    avg_dH = (double *)malloc(num_shots*sizeof(double));
-    if (avg_dH == NULL){
-        return NULL;
+        avg_dH_prev = avg_dH;
     }
+}
 
-    for (i = 0; i < num_shots; i++){
-        avg_dH[i] = numerator[i]/denominator[i];
-    }
-    // avg_dh[1:]
-    subset_first_dH = (double *)malloc(num_shots_reduced*sizeof(double));
-    if (subset_first_dH == NULL){
-        return NULL;
-    }
-    for(i = 0; i < num_shots_reduced; i++){
-        subset_first_dH[i] = avg_dH[i+1];
-    }
+void dQ_batch(double *fit_beta, double *fit_dH, double *fx_competent, double *S_conc,
+              double *T_conc, double *T_conc_free, double cell_volume, double *dilution_heats,
+              int num_sites, int num_shots, int num_sets, double *final_array,
+              solver_stats *stats){
+    /*
+    Calculate heats for num_sets parameter sets.  fit_beta and fit_dH are
+    (num_sets,num_sites), T_conc_free is (num_sets,num_shots), and
+    dilution_heats and final_array are (num_sets,num_shots-1), all C ordered.
+    Parameter sets are split over threads if compiled with OpenMP.
+    */
 
-    // avg_dh[:-1]
-    subset_last_dH = (double *)malloc(num_shots_reduced*sizeof(double));
-    if (subset_last_dH == NULL){
-        return NULL;
-    }
-    for(i = 0; i < num_shots_reduced; i++){
-        subset_last_dH[i] = avg_dH[i];
-    }
+    int k;
+    long iterations = 0, fallbacks = 0;
 
-    // avg_dh[1:]-avg_dh[:-1];
-    X = (double *)malloc(num_shots_reduced*sizeof(double));
-    if (X == NULL){
-        return NULL;
-    }
-    for (i = 0; i < num_shots_reduced; i++){
-        X[i] = subset_first_dH[i] - subset_last_dH[i];
-    }
+#ifdef _OPENMP
+    #pragma omp parallel for schedule(dynamic) reduction(+:iterations,fallbacks)
+#endif
+    for (k = 0; k < num_sets; k++){
 
-    // S_conc_corr[1:]
-    subset_s_conc = (double *)malloc(num_shots_reduced*sizeof(double));
-    if (subset_s_conc == NULL){
-        return NULL;
-    }
-    for(i = 0; i < num_shots_reduced; i++){
-        subset_s_conc[i] = S_conc_corr[i+1];
-    }
+        solver_stats set_stats;
+        set_stats.iterations = 0;
+        set_stats.fallbacks = 0;
 
-    for(i = 0; i < num_shots_reduced; i++){
-        final_array[i] = cell_volume*subset_s_conc[i]*X[i] + dilution_heats[i];
-    }
+        dQ(fit_beta + (long)k*num_sites, fit_dH + (long)k*num_sites, S_conc, fx_competent[k],
+           T_conc, T_conc_free + (long)k*num_shots, cell_volume,
+           dilution_heats + (long)k*(num_shots - 1), num_sites, num_shots,
+           final_array + (long)k*(num_shots - 1), NULL, &set_stats);
 
-    // clean up
-    // free memory
-    free(avg_dH);
-    free(subset_first_dH);
-    free(subset_last_dH);
-    free(X);
-    free(subset_s_conc);
-    free(numerator);
-    free(denominator);
+        iterations += set_stats.iterations;
+        fallbacks += set_stats.fallbacks;
+    }
 
-    return NULL;
+    stats->iterations += iterations;
+    stats->fallbacks += fallbacks;
 }
 
 /*-----------------------------------------------------------------------------
@@ -299,13 +558,23 @@ static char module_docstring[] =
     "calculate binding polynomial fit";
 
 static char dQ_docstring[] = 
-    "Calculate the heats that would be observed across shots for a given set of enthalpies and binding constants for each reaction. This will work for an arbitrary-order binding polynomial.";
+    "Calculate the heats that would be observed across shots for a given set of enthalpies and binding constants for each reaction. This will work for an arbitrary-order binding polynomial. Heats are written into final_array and free titrant into T_conc_free, which also holds the starting guesses. Returns a tuple of the number of root-finding iterations and the number of shots that fell back to Brent's method.";
+
+static char dQ_batch_docstring[] = 
+    "Calculate heats for many parameter sets at once. fit_beta and fit_dH are (num_sets,num_sites) arrays, fx_competent is (num_sets,), dilution_heats and final_array are (num_sets,num_shots-1) and T_conc_free is a (num_sets,num_shots) workspace of starting guesses and free titrant. Runs without the GIL (and over OpenMP threads if compiled with OpenMP). Returns a tuple of the number of root-finding iterations and the number of shots that fell back to Brent's method.";
+
+static char dQ_jac_docstring[] = 
+    "Calculate heats and their derivatives with respect to beta_1..beta_n, dH_1..dH_n and fx_competent for one parameter set. The derivatives are written into jac, a (num_shots-1,2*num_sites+1) array; heats into final_array. Free titrant is handled as in dQ. Returns a tuple of the number of root-finding iterations and the number of shots that fell back to Brent's method.";
 
 static PyObject *bp_ext_dQ(PyObject *self, PyObject *args);
+static PyObject *bp_ext_dQ_batch(PyObject *self, PyObject *args);
+static PyObject *bp_ext_dQ_jac(PyObject *self, PyObject *args);
 
 // methods
 static PyMethodDef module_methods[] = {
     {"dQ", bp_ext_dQ, METH_VARARGS, dQ_docstring},
+    {"dQ_batch", bp_ext_dQ_batch, METH_VARARGS, dQ_batch_docstring},
+    {"dQ_jac", bp_ext_dQ_jac, METH_VARARGS, dQ_jac_docstring},
     {NULL, NULL}
 };
 
@@ -346,14 +615,14 @@ static PyObject *bp_ext_dQ(PyObject *self, PyObject *args)
         return NULL;
     }
 
-    // PyObjects to numpy arrays
-    PyObject *fit_beta_array = PyArray_FROM_OTF(fit_beta_obj, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *fit_dH_array = PyArray_FROM_OTF(fit_dH_obj, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *T_conc_array = PyArray_FROM_OTF(T_conc, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *T_conc_free_array = PyArray_FROM_OTF(T_conc_free, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *S_conc_corr_array = PyArray_FROM_OTF(S_conc_corr, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *dilution_heats_array = PyArray_FROM_OTF(dilution_heats, NPY_DOUBLE, NPY_IN_ARRAY);
-    PyObject *final_array_obj = PyArray_FROM_OTF(final_array, NPY_DOUBLE, NPY_IN_ARRAY);
+    // PyObjects to numpy arrays.  T_conc_free and final_array are written to.
+    PyArrayObject *fit_beta_array = (PyArrayObject*)PyArray_FROM_OTF(fit_beta_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *fit_dH_array = (PyArrayObject*)PyArray_FROM_OTF(fit_dH_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_free_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc_free, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+    PyArrayObject *S_conc_corr_array = (PyArrayObject*)PyArray_FROM_OTF(S_conc_corr, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *dilution_heats_array = (PyArrayObject*)PyArray_FROM_OTF(dilution_heats, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *final_array_obj = (PyArrayObject*)PyArray_FROM_OTF(final_array, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
 
     // throw exception if cast failed
     if (fit_beta_array == NULL || fit_dH_array == NULL || T_conc_array == NULL || T_conc_free_array == NULL || 
@@ -361,10 +630,16 @@ static PyObject *bp_ext_dQ(PyObject *self, PyObject *args)
         Py_XDECREF(fit_beta_array);
         Py_XDECREF(fit_dH_array);
         Py_XDECREF(T_conc_array);
-        Py_XDECREF(T_conc_free_array);
+        if (T_conc_free_array != NULL){
+            PyArray_DiscardWritebackIfCopy(T_conc_free_array);
+            Py_DECREF(T_conc_free_array);
+        }
         Py_XDECREF(S_conc_corr_array);
         Py_XDECREF(dilution_heats_array);
-        Py_XDECREF(final_array_obj);
+        if (final_array_obj != NULL){
+            PyArray_DiscardWritebackIfCopy(final_array_obj);
+            Py_DECREF(final_array_obj);
+        }
         return NULL;
     }
 
@@ -377,25 +652,219 @@ static PyObject *bp_ext_dQ(PyObject *self, PyObject *args)
     double *dilution_heats_p = (double*)PyArray_DATA(dilution_heats_array);
     double *final_array_p = (double*)PyArray_DATA(final_array_obj);
 
+    solver_stats stats;
+    stats.iterations = 0;
+    stats.fallbacks = 0;
+
     // call function 
-    dQ(fit_beta, fit_dH, S_conc_corr_p, T_conc_p, T_conc_free_p, cell_volume, dilution_heats_p, 
-        num_sites, num_shots, size_T_conc, final_array_p);
+    Py_BEGIN_ALLOW_THREADS
+    dQ(fit_beta, fit_dH, S_conc_corr_p, 1.0, T_conc_p, T_conc_free_p, cell_volume, 
+        dilution_heats_p, num_sites, num_shots, final_array_p, NULL, &stats);
+    Py_END_ALLOW_THREADS
 
-    // clean up 
+    // clean up (copying output back if the inputs were not usable in place)
     Py_DECREF(fit_beta_array);
     Py_DECREF(fit_dH_array);
     Py_DECREF(T_conc_array);
+    PyArray_ResolveWritebackIfCopy(T_conc_free_array);
     Py_DECREF(T_conc_free_array);
     Py_DECREF(S_conc_corr_array);
     Py_DECREF(dilution_heats_array);
+    PyArray_ResolveWritebackIfCopy(final_array_obj);
+    Py_DECREF(final_array_obj);
 
-    // check errors
-    /*if (value == NULL){
-        PyErr_SetString(PyExc_RuntimeError, "object return null");
+    // build output and return
+    return Py_BuildValue("ll", stats.iterations, stats.fallbacks);
+}
+
+static PyObject *bp_ext_dQ_batch(PyObject *self, PyObject *args)
+{
+    int num_sites, num_shots, num_sets;
+    double cell_volume;
+    PyObject *dilution_heats, *fit_beta_obj, *fit_dH_obj, *fx_competent, *S_conc, *T_conc, 
+             *T_conc_free, *final_array;
 
+    if (!PyArg_ParseTuple(args, "diOOOOOOOO:dQ_batch", &cell_volume, &num_sites, 
+                                        &dilution_heats, &fit_beta_obj, &fit_dH_obj, &fx_competent, 
+                                        &S_conc, &T_conc, &T_conc_free, &final_array)){
         return NULL;
-    }*/
+    }
 
-    // build output and return
-    return Py_BuildValue("O", final_array_obj);
+    // PyObjects to numpy arrays.  T_conc_free and final_array are written to.
+    PyArrayObject *fit_beta_array = (PyArrayObject*)PyArray_FROM_OTF(fit_beta_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *fit_dH_array = (PyArrayObject*)PyArray_FROM_OTF(fit_dH_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *fx_competent_array = (PyArrayObject*)PyArray_FROM_OTF(fx_competent, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *S_conc_array = (PyArrayObject*)PyArray_FROM_OTF(S_conc, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *dilution_heats_array = (PyArrayObject*)PyArray_FROM_OTF(dilution_heats, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_free_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc_free, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+    PyArrayObject *final_array_obj = (PyArrayObject*)PyArray_FROM_OTF(final_array, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+
+    if (fit_beta_array == NULL || fit_dH_array == NULL || fx_competent_array == NULL || 
+        S_conc_array == NULL || T_conc_array == NULL || dilution_heats_array == NULL || 
+        T_conc_free_array == NULL || final_array_obj == NULL) {
+        goto fail;
+    }
+
+    // check shapes
+    num_shots = (int)PyArray_SIZE(S_conc_array);
+    num_sets = (int)PyArray_SIZE(fx_competent_array);
+    if (num_shots < 1 || (int)PyArray_SIZE(T_conc_array) != num_shots ||
+        (long)PyArray_SIZE(fit_beta_array) != (long)num_sets*num_sites ||
+        (long)PyArray_SIZE(fit_dH_array) != (long)num_sets*num_sites ||
+        (long)PyArray_SIZE(T_conc_free_array) != (long)num_sets*num_shots ||
+        (long)PyArray_SIZE(dilution_heats_array) != (long)num_sets*(num_shots - 1) ||
+        (long)PyArray_SIZE(final_array_obj) != (long)num_sets*(num_shots - 1)){
+        PyErr_SetString(PyExc_ValueError, "array sizes do not match the number of parameter sets, sites and shots");
+        goto fail;
+    }
+
+    // pointers 
+    double *fit_beta = (double*)PyArray_DATA(fit_beta_array);
+    double *fit_dH = (double*)PyArray_DATA(fit_dH_array);
+    double *fx_competent_p = (double*)PyArray_DATA(fx_competent_array);
+    double *S_conc_p = (double*)PyArray_DATA(S_conc_array);
+    double *T_conc_p = (double*)PyArray_DATA(T_conc_array);
+    double *dilution_heats_p = (double*)PyArray_DATA(dilution_heats_array);
+    double *T_conc_free_p = (double*)PyArray_DATA(T_conc_free_array);
+    double *final_array_p = (double*)PyArray_DATA(final_array_obj);
+
+    solver_stats stats;
+    stats.iterations = 0;
+    stats.fallbacks = 0;
+
+    // call function 
+    Py_BEGIN_ALLOW_THREADS
+    dQ_batch(fit_beta, fit_dH, fx_competent_p, S_conc_p, T_conc_p, T_conc_free_p, cell_volume,
+             dilution_heats_p, num_sites, num_shots, num_sets, final_array_p, &stats);
+    Py_END_ALLOW_THREADS
+
+    // clean up (copying output back if the inputs were not usable in place)
+    Py_DECREF(fit_beta_array);
+    Py_DECREF(fit_dH_array);
+    Py_DECREF(fx_competent_array);
+    Py_DECREF(S_conc_array);
+    Py_DECREF(T_conc_array);
+    Py_DECREF(dilution_heats_array);
+    PyArray_ResolveWritebackIfCopy(T_conc_free_array);
+    Py_DECREF(T_conc_free_array);
+    PyArray_ResolveWritebackIfCopy(final_array_obj);
+    Py_DECREF(final_array_obj);
+
+    return Py_BuildValue("ll", stats.iterations, stats.fallbacks);
+
+fail:
+    Py_XDECREF(fit_beta_array);
+    Py_XDECREF(fit_dH_array);
+    Py_XDECREF(fx_competent_array);
+    Py_XDECREF(S_conc_array);
+    Py_XDECREF(T_conc_array);
+    Py_XDECREF(dilution_heats_array);
+    if (T_conc_free_array != NULL){
+        PyArray_DiscardWritebackIfCopy(T_conc_free_array);
+        Py_DECREF(T_conc_free_array);
+    }
+    if (final_array_obj != NULL){
+        PyArray_DiscardWritebackIfCopy(final_array_obj);
+        Py_DECREF(final_array_obj);
+    }
+    return NULL;
+}
+
+static PyObject *bp_ext_dQ_jac(PyObject *self, PyObject *args)
+{
+    int num_sites, num_shots;
+    double cell_volume, fx_competent;
+    PyObject *dilution_heats, *fit_beta_obj, *fit_dH_obj, *S_conc, *T_conc, *T_conc_free, 
+             *final_array, *jac;
+
+    if (!PyArg_ParseTuple(args, "diOOOdOOOOO:dQ_jac", &cell_volume, &num_sites, 
+                                        &dilution_heats, &fit_beta_obj, &fit_dH_obj, &fx_competent, 
+                                        &S_conc, &T_conc, &T_conc_free, &final_array, &jac)){
+        return NULL;
+    }
+
+    // PyObjects to numpy arrays.  T_conc_free, final_array and jac are written to.
+    PyArrayObject *fit_beta_array = (PyArrayObject*)PyArray_FROM_OTF(fit_beta_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *fit_dH_array = (PyArrayObject*)PyArray_FROM_OTF(fit_dH_obj, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *S_conc_array = (PyArrayObject*)PyArray_FROM_OTF(S_conc, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *dilution_heats_array = (PyArrayObject*)PyArray_FROM_OTF(dilution_heats, NPY_DOUBLE, NPY_ARRAY_IN_ARRAY);
+    PyArrayObject *T_conc_free_array = (PyArrayObject*)PyArray_FROM_OTF(T_conc_free, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+    PyArrayObject *final_array_obj = (PyArrayObject*)PyArray_FROM_OTF(final_array, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+    PyArrayObject *jac_array = (PyArrayObject*)PyArray_FROM_OTF(jac, NPY_DOUBLE, NPY_ARRAY_INOUT_ARRAY2);
+
+    if (fit_beta_array == NULL || fit_dH_array == NULL || S_conc_array == NULL || 
+        T_conc_array == NULL || dilution_heats_array == NULL || T_conc_free_array == NULL || 
+        final_array_obj == NULL || jac_array == NULL) {
+        goto fail;
+    }
+
+    // check shapes
+    num_shots = (int)PyArray_SIZE(S_conc_array);
+    if (num_shots < 1 || (int)PyArray_SIZE(T_conc_array) != num_shots ||
+        (int)PyArray_SIZE(fit_beta_array) != num_sites ||
+        (int)PyArray_SIZE(fit_dH_array) != num_sites ||
+        (int)PyArray_SIZE(T_conc_free_array) != num_shots ||
+        (int)PyArray_SIZE(dilution_heats_array) != num_shots - 1 ||
+        (int)PyArray_SIZE(final_array_obj) != num_shots - 1 ||
+        (long)PyArray_SIZE(jac_array) != (long)(num_shots - 1)*(2*num_sites + 1)){
+        PyErr_SetString(PyExc_ValueError, "array sizes do not match the number of sites and shots");
+        goto fail;
+    }
+
+    // pointers 
+    double *fit_beta = (double*)PyArray_DATA(fit_beta_array);
+    double *fit_dH = (double*)PyArray_DATA(fit_dH_array);
+    double *S_conc_p = (double*)PyArray_DATA(S_conc_array);
+    double *T_conc_p = (double*)PyArray_DATA(T_conc_array);
+    double *dilution_heats_p = (double*)PyArray_DATA(dilution_heats_array);
+    double *T_conc_free_p = (double*)PyArray_DATA(T_conc_free_array);
+    double *final_array_p = (double*)PyArray_DATA(final_array_obj);
+    double *jac_p = (double*)PyArray_DATA(jac_array);
+
+    solver_stats stats;
+    stats.iterations = 0;
+    stats.fallbacks = 0;
+
+    // call function 
+    Py_BEGIN_ALLOW_THREADS
+    dQ(fit_beta, fit_dH, S_conc_p, fx_competent, T_conc_p, T_conc_free_p, cell_volume, 
+        dilution_heats_p, num_sites, num_shots, final_array_p, jac_p, &stats);
+    Py_END_ALLOW_THREADS
+
+    // clean up (copying output back if the inputs were not usable in place)
+    Py_DECREF(fit_beta_array);
+    Py_DECREF(fit_dH_array);
+    Py_DECREF(S_conc_array);
+    Py_DECREF(T_conc_array);
+    Py_DECREF(dilution_heats_array);
+    PyArray_ResolveWritebackIfCopy(T_conc_free_array);
+    Py_DECREF(T_conc_free_array);
+    PyArray_ResolveWritebackIfCopy(final_array_obj);
+    Py_DECREF(final_array_obj);
+    PyArray_ResolveWritebackIfCopy(jac_array);
+    Py_DECREF(jac_array);
+
+    return Py_BuildValue("ll", stats.iterations, stats.fallbacks);
+
+fail:
+    Py_XDECREF(fit_beta_array);
+    Py_XDECREF(fit_dH_array);
+    Py_XDECREF(S_conc_array);
+    Py_XDECREF(T_conc_array);
+    Py_XDECREF(dilution_heats_array);
+    if (T_conc_free_array != NULL){
+        PyArray_DiscardWritebackIfCopy(T_conc_free_array);
+        Py_DECREF(T_conc_free_array);
+    }
+    if (final_array_obj != NULL){
+        PyArray_DiscardWritebackIfCopy(final_array_obj);
+        Py_DECREF(final_array_obj);
+    }
+    if (jac_array != NULL){
+        PyArray_DiscardWritebackIfCopy(jac_array);
+        Py_DECREF(jac_array);
+    }
+    return NULL;
 }
@@ -0,0 +1,89 @@
+__description__ = \
+"""
+Shared fixtures for the pytc tests.  Experiments are simulated with the
+models themselves and written out as Origin .DH files, so the tests do not
+depend on any data shipped with the package.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import pytest
+
+# Plots are drawn without a display
+import matplotlib
+matplotlib.use("Agg")
+
+import pytc
+
+def write_dh_file(dh_file,model,values,temperature=25.0,cell_conc=0.05,
+                  syringe_conc=0.7,cell_volume=1.4,shots=None,noise=0.0,
+                  seed=0,**model_kwargs):
+    """
+    Simulate an experiment with model and write it as an Origin .DH file.
+
+    Parameters
+    ----------
+
+    dh_file : str
+        file to write
+    model : ITCModel subclass
+        model used to calculate the heats
+    values : dict
+        parameter values used for the simulation
+    temperature : float
+        temperature (C)
+    cell_conc, syringe_conc : float
+        stationary (cell) and titrant (syringe) concentrations (mM)
+    cell_volume : float
+        cell volume (mL)
+    shots : list of float or None
+        shot volumes (uL).  If None, a 2 uL shot followed by 24 8 uL shots.
+    noise : float
+        standard deviation of gaussian noise added to the heats
+    seed : int
+        seed for the noise
+    """
+
+    if shots is None:
+        shots = [2.0] + [8.0 for i in range(24)]
+
+    m = model(S_cell=cell_conc*1e-3,T_syringe=syringe_conc*1e-3,
+              cell_volume=cell_volume*1e3,shot_volumes=shots,**model_kwargs)
+    m.update_values(values)
+
+    heats = np.array(m.dQ)
+    heats = heats + np.random.RandomState(seed).normal(0.0,noise,len(heats))
+
+    with open(dh_file,"w") as f:
+        f.write("header\nheader\n")
+        f.write("{},{},{},{}\n".format(temperature,cell_conc,syringe_conc,cell_volume))
+        f.write("x\nx\n")
+        for s, h in zip(shots,heats):
+            f.write("{},{}\n".format(s,h))
+
+@pytest.fixture
+def make_experiment(tmp_path):
+    """
+    Factory that simulates an experiment (see write_dh_file) and loads it
+    back as an ITCExperiment.  Keyword arguments not used by write_dh_file
+    are passed to the model both times.
+    """
+
+    counter = [0]
+
+    def make(model,values,shot_start=1,uncertainty=0.1,**kwargs):
+
+        dh_file = str(tmp_path / "expt{}.DH".format(counter[0]))
+        counter[0] += 1
+
+        write_dh_file(dh_file,model,values,**kwargs)
+
+        model_kwargs = dict([(k,v) for k, v in kwargs.items()
+                             if k not in ("temperature","cell_conc","syringe_conc",
+                                          "cell_volume","shots","noise","seed")])
+
+        return pytc.ITCExperiment(dh_file,model,shot_start=shot_start,
+                                  uncertainty=uncertainty,**model_kwargs)
+
+    return make
@@ -0,0 +1,146 @@
+__description__ = \
+"""
+Tests of the AssemblyAutoInhibition mass balance solver and its warm-start
+cache.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import pytest
+
+from pytc.indiv_models import AssemblyAutoInhibition
+from pytc.indiv_models.assembly_auto_inhibition import _solve_mb_newton, solve_mb
+
+# (Klig1, Klig2, Kolig, m, n_lig, n_prot)
+MB_PARAMS = [(1e7,1e5,1e6,2.0,5.0,4.0),
+             (1e5,1e7,1e4,3.0,2.0,2.0),
+             (1e9,1e3,1e8,2.5,8.0,6.0)]
+
+def mass_balance_residuals(p,l,K1,K2,K3,m,n_lig,n_prot,Pt,Lt):
+    """
+    Relative residuals of the protein and ligand mass balance equations.
+    """
+
+    lig1 = K1*p*l
+    lig_all = K1*K2**(m - 1)*p*l**m
+    olig = K3**(n_lig + n_prot - 1)*p**n_prot*l**n_lig
+
+    res_p = (p + lig1 + lig_all + n_prot*olig - Pt)/Pt
+    res_l = (l + lig1 + m*lig_all + n_lig*olig - Lt)/Lt
+
+    return res_p, res_l
+
+def make_model(is_reverse=False):
+
+    model = AssemblyAutoInhibition(S_cell=20e-6,T_syringe=500e-6,
+                                   is_reverse=is_reverse,cell_volume=1400.0,
+                                   shot_volumes=[2.0] + [8.0 for i in range(24)])
+
+    return model
+
+@pytest.mark.parametrize("K1,K2,K3,m,n_lig,n_prot",MB_PARAMS)
+@pytest.mark.parametrize("reverse",[False,True])
+def test_solver_satisfies_mass_balance(reverse,K1,K2,K3,m,n_lig,n_prot):
+
+    model = make_model()
+    Pt = model._S_conc
+    Lt = model._T_conc
+    N = len(Pt)
+
+    p, l, num_iter, num_unconverged = _solve_mb_newton(reverse,N,K1,K2,K3,m,n_lig,
+                                                       n_prot,Pt,Lt)
+    assert num_unconverged == 0
+
+    if reverse:
+        Pt, Lt = Lt, Pt
+
+    # the first shot has no titrant, so the free species are the totals
+    assert p[0] == Pt[0] and l[0] == Lt[0]
+
+    solved = np.logical_and(Pt > 0,Lt > 0)
+    res_p, res_l = mass_balance_residuals(p[solved],l[solved],K1,K2,K3,m,n_lig,
+                                          n_prot,Pt[solved],Lt[solved])
+    assert np.max(np.abs(res_p)) < 1e-10
+    assert np.max(np.abs(res_l)) < 1e-10
+    assert np.all(p >= 0) and np.all(l >= 0)
+
+    # the public wrapper returns the same solution
+    p2, l2 = solve_mb(reverse,N,K1,K2,K3,m,n_lig,n_prot,model._S_conc,model._T_conc)
+    assert np.array_equal(p,p2) and np.array_equal(l,l2)
+
+def test_solver_from_guess_matches_cold_start():
+
+    model = make_model()
+    Pt = model._S_conc
+    Lt = model._T_conc
+    N = len(Pt)
+
+    K1, K2, K3, m, n_lig, n_prot = MB_PARAMS[0]
+    p, l, cold_iter, num_unconverged = _solve_mb_newton(False,N,K1,K2,K3,m,n_lig,
+                                                        n_prot,Pt,Lt)
+
+    # start from the solution for slightly different constants
+    p2, l2, warm_iter, num_unconverged = _solve_mb_newton(False,N,K1*1.05,K2,K3,m,
+                                                          n_lig,n_prot,Pt,Lt,p,l)
+    p3, l3, num_iter, num_unconverged = _solve_mb_newton(False,N,K1*1.05,K2,K3,m,
+                                                         n_lig,n_prot,Pt,Lt)
+
+    assert warm_iter < cold_iter
+    assert np.allclose(p2,p3,rtol=1e-10,atol=0)
+    assert np.allclose(l2,l3,rtol=1e-10,atol=0)
+
+def test_solver_reports_unconverged_shots():
+
+    model = make_model()
+    Pt = model._S_conc
+    Lt = model._T_conc
+
+    K1, K2, K3, m, n_lig, n_prot = MB_PARAMS[0]
+    with pytest.warns(RuntimeWarning,match="did not converge"):
+        p, l, num_iter, num_unconverged = _solve_mb_newton(False,len(Pt),K1,K2,K3,m,
+                                                           n_lig,n_prot,Pt,Lt,
+                                                           max_iter=1)
+    assert num_iter == 1
+    assert num_unconverged > 0
+
+@pytest.mark.parametrize("is_reverse",[False,True])
+def test_warm_start_cache(is_reverse):
+
+    model = make_model(is_reverse)
+
+    dQ = np.array(model.dQ)
+    stats = model.solver_stats
+    assert stats["calls"] == 1
+    assert stats["hit rate"] == 0.0
+    assert stats["unconverged shots"] == 0
+
+    # a small change starts from the cached solution and matches a cold
+    # start
+    model.update_values({"Klig1":1.05e7})
+    warm = np.array(model.dQ)
+    cold = model.evaluate(model.param_vector)
+    assert np.max(np.abs(warm - cold)) < 1e-9*np.max(np.abs(cold))
+
+    stats = model.solver_stats
+    assert stats["calls"] == 2
+    assert stats["hit rate"] == 0.5
+    assert stats["mean warm iterations"] < stats["mean cold iterations"]
+    assert stats["iterations saved"] > 0
+
+    # a large change solves from scratch
+    model.update_values({"Klig1":1e9})
+    model.dQ
+    assert model.solver_stats["calls"] == 3
+    assert model.solver_stats["hit rate"] == pytest.approx(1/3)
+
+    # evaluate leaves the cache and the statistics alone
+    cache = model._mb_cache
+    model.evaluate(model.param_vector*1.01)
+    assert model._mb_cache is cache
+    assert model.solver_stats["calls"] == 3
+
+    # unchanged values reuse the cached heats without solving
+    model.dQ
+    assert model.solver_stats["calls"] == 3
+    assert not np.array_equal(dQ,model.dQ)
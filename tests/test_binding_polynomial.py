@@ -0,0 +1,179 @@
+__description__ = \
+"""
+Tests of the bp_ext kernel behind BindingPolynomial against a pure Python
+reference, and of its analytic derivatives against finite differences.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import pytest
+
+from pytc.indiv_models import BindingPolynomial
+
+# (stepwise log10 binding constants, enthalpies) for each test polynomial
+POLYNOMIALS = [([6.0],[-5000.0]),
+               ([7.0,5.0],[-6000.0,2000.0]),
+               ([5.0,6.5,4.0],[-3000.0,-1000.0,4000.0]),
+               ([8.0,4.0,7.0,5.0],[-4000.0,1500.0,-2500.0,800.0])]
+
+# many sites and very tight binding; the largest betas are ~1e90 and ~1e300
+HIGH_ORDER = [([9.0 for i in range(10)],[-3000.0 + 300*i for i in range(10)]),
+              ([25.0 for i in range(12)],[-4000.0 + 500*i for i in range(12)])]
+
+def make_model(log_K,dH,shot_volumes=None):
+    """
+    BindingPolynomial with overall betas built from stepwise constants.
+    """
+
+    if shot_volumes is None:
+        shot_volumes = [2.5 for i in range(30)]
+
+    num_sites = len(log_K)
+    model = BindingPolynomial(num_sites=num_sites,S_cell=25e-6,T_syringe=800e-6,
+                              shot_volumes=shot_volumes)
+
+    values = {"fx_competent":0.9,"dilution_heat":20.0,"dilution_intercept":0.5}
+    for i in range(num_sites):
+        values["beta{}".format(i+1)] = 10**np.sum(log_K[:i+1])
+        values["dH{}".format(i+1)] = dH[i]
+    model.update_values(values)
+
+    return model
+
+def reference_dQ(model):
+    """
+    Heats for a BindingPolynomial, solving the titrant mass balance for each
+    shot with scipy's brentq.  The binding polynomial terms are computed from
+    their logs and scaled by the largest one so very large betas do not
+    overflow.
+    """
+
+    import scipy.optimize
+
+    values = model.param_values
+    num_sites = len([p for p in values if p.startswith("beta")])
+    log_beta = np.log([values["beta{}".format(i+1)] for i in range(num_sites)])
+    dH = np.array([values["dH{}".format(i+1)] for i in range(num_sites)])
+    n = np.arange(1,num_sites + 1)
+
+    S_conc = model._S_conc*values["fx_competent"]
+    T_conc = model._T_conc
+
+    def weights(ln_T_free):
+        log_w = log_beta + n*ln_T_free
+        scale = max(0.0,np.max(log_w))
+        return np.exp(-scale), np.exp(log_w - scale)
+
+    avg_dH = np.zeros(len(S_conc))
+    for i in range(len(S_conc)):
+
+        if T_conc[i] == 0:
+            continue
+
+        def mass_balance(ln_T_free):
+            w0, w = weights(ln_T_free)
+            return np.exp(ln_T_free) + S_conc[i]*np.sum(n*w)/(w0 + np.sum(w)) - T_conc[i]
+
+        ln_T_free = scipy.optimize.brentq(mass_balance,np.log(T_conc[i]) - 700,
+                                          np.log(T_conc[i]),xtol=1e-14,rtol=1e-15)
+
+        w0, w = weights(ln_T_free)
+        avg_dH[i] = np.sum(dH*w)/(w0 + np.sum(w))
+
+    heats = model._cell_volume*S_conc[1:]*(avg_dH[1:] - avg_dH[:-1])
+
+    return heats + model.dilution_heats
+
+@pytest.mark.parametrize("log_K,dH",POLYNOMIALS)
+def test_dQ_matches_reference(log_K,dH):
+
+    model = make_model(log_K,dH)
+
+    dQ = model.dQ
+    ref = reference_dQ(model)
+
+    assert np.max(np.abs(dQ - ref)) < 1e-8*np.max(np.abs(ref))
+
+@pytest.mark.parametrize("log_K,dH",HIGH_ORDER)
+def test_high_order_dQ_matches_reference(log_K,dH):
+
+    model = make_model(log_K,dH)
+
+    dQ = model.dQ
+    ref = reference_dQ(model)
+
+    assert np.all(np.isfinite(dQ))
+    assert np.max(np.abs(dQ - ref)) < 1e-8*np.max(np.abs(ref))
+
+    dQ, jac = model.dQ_jacobian()
+    assert np.all(np.isfinite(jac))
+
+@pytest.mark.parametrize("log_K,dH",POLYNOMIALS)
+def test_dQ_batch_matches_dQ(log_K,dH):
+
+    model = make_model(log_K,dH)
+    dQ = np.array(model.dQ)
+    scale = np.max(np.abs(dQ))
+
+    batch = model.dQ_batch(np.array([model.param_vector,model.param_vector]))
+    assert batch.shape == (2,len(dQ))
+    assert np.max(np.abs(batch - dQ)) < 1e-10*scale
+    assert np.max(np.abs(model.evaluate(model.param_vector) - dQ)) < 1e-10*scale
+
+    # each row is evaluated at its own parameters
+    param = np.array(model.param_vector)
+    param[model.param_names.index("dH1")] *= 2
+    batch = model.dQ_batch(np.array([model.param_vector,param]))
+    assert np.max(np.abs(batch[0] - dQ)) < 1e-10*scale
+    assert not np.allclose(batch[1],dQ)
+    assert np.array_equal(model.dQ,dQ)
+
+@pytest.mark.parametrize("shot_start",[0,1,3,29,30])
+def test_write_dQ_shot_start(shot_start):
+
+    log_K, dH = POLYNOMIALS[2]
+    ref = np.array(make_model(log_K,dH).dQ)
+
+    # contiguous output is written in place
+    out = np.zeros(len(ref) - shot_start)
+    make_model(log_K,dH).write_dQ(out,shot_start)
+    assert np.max(np.abs(out - ref[shot_start:]),initial=0) < 1e-10*np.max(np.abs(ref))
+
+    # strided output goes through the work array
+    out = np.zeros(2*(len(ref) - shot_start))[::2]
+    make_model(log_K,dH).write_dQ(out,shot_start)
+    assert np.max(np.abs(out - ref[shot_start:]),initial=0) < 1e-10*np.max(np.abs(ref))
+
+def test_write_dQ_rejects_wrong_length():
+
+    log_K, dH = POLYNOMIALS[1]
+    model = make_model(log_K,dH)
+
+    with pytest.raises(ValueError):
+        model.write_dQ(np.zeros(5),1)
+
+@pytest.mark.parametrize("log_K,dH",POLYNOMIALS)
+def test_dQ_jacobian_matches_finite_differences(log_K,dH):
+
+    model = make_model(log_K,dH)
+
+    dQ, jac = model.dQ_jacobian()
+    assert jac.shape == (len(dQ),len(model.param_names))
+    assert np.max(np.abs(dQ - model.dQ)) < 1e-12*np.max(np.abs(dQ))
+
+    base = np.array(model.param_vector)
+    idx = np.arange(len(base))
+    fd = np.zeros_like(jac)
+    for j in range(len(base)):
+        h = 1e-6*max(abs(base[j]),1e-3)
+        for sign in (1,-1):
+            param = base.copy()
+            param[j] += sign*h
+            model.update_values_by_index(idx,param)
+            fd[:,j] += sign*np.array(model.dQ)/(2*h)
+    model.update_values_by_index(idx,base)
+
+    # Compare the change in heat for a relative change in each parameter
+    scale = np.max(np.abs(dQ))/np.maximum(np.abs(base),1e-3)
+    assert np.max(np.abs(jac - fd)/scale) < 1e-5
@@ -0,0 +1,128 @@
+__description__ = \
+"""
+Tests of FitParameter and the ParameterStore arrays behind model parameters.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import copy, pickle
+
+import numpy as np
+import pytest
+
+from pytc.fit_param import FitParameter, ParameterStore
+from pytc.indiv_models import SingleSite
+
+def test_standalone_parameter():
+
+    p = FitParameter("K_test")
+    assert p.guess == 1e6
+    assert p.value == 1e6
+    assert p.guess_range == [1.0,1e8]
+    assert p.bounds == (-np.inf,np.inf)
+    assert p.stdev == np.inf
+    assert p.fixed is False
+
+    # values come back as Python floats, not numpy scalars
+    for v in (p.value,p.guess,p.stdev,p.bounds[0],p.guess_range[0],p.ninetyfive[0]):
+        assert type(v) == float
+
+    p.bounds = (0,1e9)
+    assert p.bounds == (0.0,1e9)
+    for bad in ((0,1,2),5):
+        with pytest.raises(ValueError):
+            p.bounds = bad
+
+    with pytest.raises(ValueError):
+        p.guess_range = [1.0]
+
+def test_parameters_are_views_of_the_store():
+
+    m = SingleSite()
+    store = m._param_store
+    i = m.param_names.index("K")
+
+    # writes through a parameter land in the store and the parameter vector
+    m.parameters["K"].value = 2e6
+    assert store.values[i] == 2e6
+    assert m.param_vector[i] == 2e6
+
+    m.parameters["K"].guess = 3e6
+    m.parameters["K"].bounds = (1,1e9)
+    m.parameters["K"].fixed = True
+    assert store.guesses[i] == 3e6
+    assert tuple(store.bounds[i]) == (1,1e9)
+    assert store.fixed[i]
+
+    # writes to the store are seen by the parameters and model dictionaries
+    values = np.array(m.param_vector)
+    values[i] = 4e6
+    m.update_values_by_index(np.arange(len(values)),values)
+    assert m.parameters["K"].value == 4e6
+    assert m.param_values["K"] == 4e6
+    assert type(m.param_values["K"]) == float
+
+    # the parameter vector cannot be written
+    with pytest.raises(ValueError):
+        m.param_vector[i] = 1.0
+
+    # each model has its own store
+    other = SingleSite()
+    assert other._param_store is not store
+    assert other.parameters["K"].value == 1e6
+
+def test_version_counts_value_changes():
+
+    m = SingleSite()
+    store = m._param_store
+
+    version = store.version
+    m.update_values({"K":2e6})
+    assert store.version == version + 1
+
+    m.update_values_by_index([0,1],[1.0,2.0])
+    assert store.version == version + 2
+
+    m.parameters["dH"].value = -1000.0
+    assert store.version == version + 3
+
+    # changing results does not change values
+    m.update_stdevs({"K":10.0})
+    m.update_ninetyfives({"K":(1.0,2.0)})
+    assert store.version == version + 3
+
+def test_copied_parameter_is_independent():
+
+    m = SingleSite()
+    p = m.parameters["K"]
+    p.bounds = (1,1e9)
+    p.alias = "K_global"
+    p.value = 5e6
+
+    q = copy.copy(p)
+    assert q._store is not p._store
+    assert (q.name,q.value,q.guess,q.bounds,q.alias) == (p.name,p.value,p.guess,p.bounds,p.alias)
+
+    q.value = 7e6
+    assert p.value == 5e6
+    assert m.param_values["K"] == 5e6
+
+def test_store_copy_and_pickling():
+
+    store = ParameterStore(3)
+    store.values[:] = [1.0,2.0,3.0]
+    store.version = 10
+
+    new = store.copy()
+    new.values[0] = 5.0
+    assert store.values[0] == 1.0
+    assert new.version == 0
+
+    m = SingleSite()
+    m.update_values({"K":2e6})
+    loaded = pickle.loads(pickle.dumps(m))
+
+    # the loaded parameters and vector view the loaded store
+    loaded.parameters["K"].value = 3e6
+    assert loaded.param_vector[loaded.param_names.index("K")] == 3e6
+    assert m.parameters["K"].value == 2e6
@@ -0,0 +1,195 @@
+__description__ = \
+"""
+Tests of the fitters on small problems with known answers.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import scipy.sparse
+import pytest
+
+import pytc
+from pytc.indiv_models import SingleSite
+
+X = np.linspace(0,1,50)
+
+def decay(param):
+    return param[0]*np.exp(-param[1]*X) + param[2]
+
+def block_decays(param):
+    """
+    Three decays that share a rate (param[0]) but each have their own
+    amplitude and offset.
+    """
+
+    out = []
+    for i in range(3):
+        out.append(param[1 + 2*i]*np.exp(-param[0]*X) + param[2 + 2*i])
+
+    return np.concatenate(out)
+
+def block_sparsity():
+
+    s = np.zeros((3*len(X),7),dtype=int)
+    s[:,0] = 1
+    for i in range(3):
+        s[i*len(X):(i+1)*len(X),1 + 2*i:3 + 2*i] = 1
+
+    return s
+
+BLOCK_PARAM = np.array([2.0,3.0,0.5,-1.0,0.2,5.0,-0.3])
+BLOCK_BOUNDS = [[-10 for i in range(7)],[10 for i in range(7)]]
+
+def test_grouped_jacobian_matches_dense():
+
+    f = pytc.fitters.MLFitter()
+    f._jac_sparsity = block_sparsity()
+
+    # the shared rate and one amplitude/offset per block: 3 evaluations
+    # instead of 7
+    s = scipy.sparse.csc_matrix(block_sparsity())
+    assert np.max(f._group_columns(s)) + 1 == 3
+
+    # the residuals at a point are reused as the base of the Jacobian
+    calls = [0]
+    def counted(param):
+        calls[0] += 1
+        return block_decays(param)
+
+    fn, kwargs = f._least_squares_kwargs(counted,BLOCK_BOUNDS)
+    fn(BLOCK_PARAM)
+    calls[0] = 0
+    jac = kwargs["jac"](BLOCK_PARAM)
+    assert calls[0] == 3
+
+    dense = np.zeros_like(jac)
+    for j in range(len(BLOCK_PARAM)):
+        h = 1e-7
+        p = BLOCK_PARAM.copy()
+        p[j] += h
+        dense[:,j] = (block_decays(p) - block_decays(BLOCK_PARAM))/h
+
+    assert np.allclose(jac,dense,atol=1e-5)
+
+def test_ml_fit_with_sparsity_matches_dense():
+
+    rng = np.random.RandomState(0)
+    y_obs = block_decays(BLOCK_PARAM) + rng.normal(0,0.01,3*len(X))
+    y_err = 0.01*np.ones(len(y_obs))
+    guess = np.array([1.0,1.0,0.0,1.0,0.0,1.0,0.0])
+
+    dense = pytc.fitters.MLFitter()
+    dense.fit(block_decays,guess,BLOCK_BOUNDS,y_obs,y_err)
+
+    for sparse_solver in (False,True):
+        sparse = pytc.fitters.MLFitter(sparse_solver=sparse_solver)
+        sparse.fit(block_decays,guess,BLOCK_BOUNDS,y_obs,y_err,
+                   jac_sparsity=block_sparsity())
+
+        assert sparse.success
+        assert np.allclose(sparse.estimate,dense.estimate,rtol=1e-5)
+        assert np.allclose(sparse.stdev,dense.stdev,rtol=1e-3)
+
+def test_ln_like_batch_matches_ln_like():
+
+    rng = np.random.RandomState(0)
+    y_obs = block_decays(BLOCK_PARAM) + rng.normal(0,0.01,3*len(X))
+    y_err = 0.01*np.ones(len(y_obs))
+
+    param_array = BLOCK_PARAM*(1 + 0.01*rng.normal(size=(5,len(BLOCK_PARAM))))
+    batch = lambda p: np.array([block_decays(x) for x in np.atleast_2d(p)])
+
+    f = pytc.fitters.MLFitter()
+    f.fit(block_decays,BLOCK_PARAM,BLOCK_BOUNDS,y_obs,y_err,model_batch=batch)
+
+    expected = [f.ln_like(p) for p in param_array]
+    assert np.allclose(f.ln_like_batch(param_array),expected,rtol=1e-12)
+
+def test_bayesian_fit_with_batched_model():
+
+    rng = np.random.RandomState(0)
+    y_obs = decay([3.0,2.0,0.5]) + rng.normal(0,0.01,len(X))
+    y_err = 0.01*np.ones(len(X))
+    batch = lambda p: np.array([decay(x) for x in np.atleast_2d(p)])
+
+    np.random.seed(0)
+    f = pytc.fitters.BayesianFitter(num_walkers=20,num_steps=50)
+    f.fit(decay,[3.0,2.0,0.5],[[-10]*3,[10]*3],y_obs,y_err,model_batch=batch)
+
+    assert f.success
+    assert f.samples.shape == (20*45,3)
+    assert np.allclose(f.estimate,[3.0,2.0,0.5],rtol=0.05)
+
+def test_bayesian_num_threads_not_implemented():
+
+    with pytest.raises(NotImplementedError):
+        pytc.fitters.BayesianFitter(num_threads=2)
+
+def test_schur_reports_stalled_step_search():
+
+    # |p - 1| has a kink at the start: every trial step raises the cost, so
+    # the damping grows until the step search gives up
+    model = lambda p: np.ones(3) + np.abs(p[0] - 1)
+
+    f = pytc.fitters.SchurFitter()
+    with pytest.warns(RuntimeWarning,match="step search failed"):
+        f.fit(model,[1.0],[[-10],[10]],np.zeros(3),np.ones(3))
+
+    assert not f.success
+    assert f.fit_result.status == 0
+    assert "step search failed" in f.fit_result.message
+
+@pytest.mark.parametrize("x_scale",[None,[1.0,1.0,1.0],[100.0,0.01,1.0]])
+def test_schur_converges(x_scale):
+
+    y_obs = decay([3.0,2.0,0.5])
+
+    f = pytc.fitters.SchurFitter()
+    f.fit(decay,[1.0,1.0,0.0],[[-10]*3,[10]*3],y_obs,0.01*np.ones(len(X)),
+          x_scale=x_scale)
+
+    assert f.success
+    assert np.allclose(f.estimate,[3.0,2.0,0.5],rtol=1e-6)
+
+def test_schur_rejects_bad_x_scale():
+
+    f = pytc.fitters.SchurFitter()
+    with pytest.raises(ValueError):
+        f.fit(decay,[1.0,1.0,0.0],[[-10]*3,[10]*3],decay([3.0,2.0,0.5]),
+              0.01*np.ones(len(X)),x_scale=[1.0,0.0,1.0])
+
+def test_schur_matches_ml_on_block_problem():
+
+    rng = np.random.RandomState(0)
+    y_obs = block_decays(BLOCK_PARAM) + rng.normal(0,0.01,3*len(X))
+    y_err = 0.01*np.ones(len(y_obs))
+    guess = np.array([1.0,1.0,0.0,1.0,0.0,1.0,0.0])
+
+    ml = pytc.fitters.MLFitter()
+    ml.fit(block_decays,guess,BLOCK_BOUNDS,y_obs,y_err,jac_sparsity=block_sparsity())
+
+    schur = pytc.fitters.SchurFitter()
+    schur.fit(block_decays,guess,BLOCK_BOUNDS,y_obs,y_err,jac_sparsity=block_sparsity())
+
+    assert schur.success
+    assert schur.fit_info["Num global params"] == 1
+    assert schur.fit_info["Num local blocks"] == 3
+    assert np.allclose(schur.estimate,ml.estimate,rtol=1e-5)
+    assert np.allclose(schur.stdev,ml.stdev,rtol=1e-3)
+
+def test_schur_fit_of_global_fit(make_experiment):
+
+    g = pytc.GlobalFit()
+    for i in range(3):
+        values = {"K":1e6,"dH":-5000.0,"fx_competent":0.95}
+        e = make_experiment(SingleSite,values,cell_conc=0.05 + 0.01*i,noise=0.1,seed=i)
+        g.link_to_global(e,"dH","dH_global")
+
+    g.fit(pytc.fitters.SchurFitter())
+    assert g.fit_success
+
+    estimates = g.fit_param
+    g.fit()
+
+    assert estimates[0]["dH_global"] == pytest.approx(g.fit_param[0]["dH_global"],rel=1e-3)
@@ -0,0 +1,671 @@
+__description__ = \
+"""
+Tests of GlobalFit: the parameter scatter plan, stateless evaluation, the
+analytic Jacobian, cache invalidation and decomposition into independent fits.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import pytest
+
+import pytc
+from pytc.indiv_models import SingleSite, BindingPolynomial
+
+def single_site_values(K=1e6,dH=-5000.0,fx_competent=0.95):
+
+    return {"K":K,"dH":dH,"fx_competent":fx_competent}
+
+def build_connector_fit(make_experiment):
+    """
+    Four SingleSite experiments at different temperatures linked through a
+    van't Hoff connector, plus two experiments that share a global
+    fx_competent and have a fixed dilution heat.
+    """
+
+    g = pytc.GlobalFit()
+    vh = pytc.global_connectors.VantHoff("vh")
+
+    for i in range(4):
+        e = make_experiment(SingleSite,single_site_values(K=1e6*(1 + 0.2*i)),
+                            temperature=20 + 5*i,cell_conc=0.05 + 0.005*i,
+                            noise=0.2,seed=i)
+        g.link_to_global(e,"dH",vh.dH)
+        g.link_to_global(e,"K",vh.K)
+
+    for i in range(2):
+        e = make_experiment(SingleSite,single_site_values(K=3e5,dH=-3000.0),
+                            cell_conc=0.05 + 0.01*i,noise=0.2,seed=10 + i)
+        g.link_to_global(e,"fx_competent","fx_global")
+        g.update_fixed("dilution_heat",0.5,e)
+
+    return g
+
+def build_independent_fit(make_experiment):
+    """
+    Two pairs of SingleSite experiments.  Each pair shares dH, but the pairs
+    share nothing, so the fit splits into two independent components.
+    """
+
+    g = pytc.GlobalFit()
+    for i in range(4):
+        pair = i//2
+        values = single_site_values(K=(5e5,2e6)[pair],dH=(-5000.0,-2500.0)[pair])
+        e = make_experiment(SingleSite,values,cell_conc=0.05 + 0.01*i,
+                            noise=0.1,seed=i)
+        g.link_to_global(e,"dH","dH_pair{}".format(pair))
+
+    return g
+
+def y_calc_by_parameter(g,param):
+    """
+    Heats for a flat parameter vector, pushing one parameter at a time into
+    the models (how _y_calc worked before the scatter plan).
+    """
+
+    for i in range(len(param)):
+
+        if g._flat_param_type[i] == 0:
+            expt, p = g._flat_param_mapping[i]
+            g._expt_dict[expt].model.update_values({p:param[i]})
+
+        elif g._flat_param_type[i] == 1:
+            for expt, p in g._global_param_mapping[g._flat_param_mapping[i][0]]:
+                g._expt_dict[expt].model.update_values({p:param[i]})
+
+        else:
+            connector = g._flat_param_mapping[i][0].__self__
+            connector.update_values({g._flat_param_mapping[i][1]:param[i]})
+
+    for k in g._global_param_keys:
+        if type(k) == str:
+            continue
+        for expt, p in g._global_param_mapping[k]:
+            e = g._expt_dict[expt]
+            e.model.update_values({p:k(e)})
+
+    return np.concatenate([g._expt_dict[k].dQ for k in g._expt_dict.keys()])
+
+def test_scatter_plan_matches_parameter_loop(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    # local, global and connector parameters are all in the fit
+    assert set(g._flat_param_type) == set([0,1,2])
+
+    base = np.array(g._flat_param,dtype=float)
+    rng = np.random.RandomState(0)
+    for i in range(3):
+        param = base*(1 + 0.05*rng.uniform(-1,1,len(base)))
+
+        y_calc = np.array(g._y_calc(param))
+        expected = y_calc_by_parameter(g,param)
+
+        assert np.max(np.abs(y_calc - expected)) <= 1e-12*np.max(np.abs(expected))
+
+    # fixed parameters are not in the plan and keep their values
+    for k in g._expt_dict.keys():
+        model = g._expt_dict[k].model
+        dest, src = g._scatter_plan[k]
+        for j in dest:
+            assert not model.fixed_param[model.param_names[j]]
+
+    fixed = [g._expt_dict[k].model.param_values["dilution_heat"]
+             for k in g._expt_dict.keys()
+             if g._expt_dict[k].model.fixed_param["dilution_heat"]]
+    assert fixed == [0.5,0.5]
+
+def count_heat_calculations(g):
+    """
+    Wrap write_dQ of each experiment in g so calls are counted (keyed by
+    experiment name).
+    """
+
+    counts = {}
+    for k, e in g._expt_dict.items():
+
+        counts[k] = 0
+        def write_dQ(out,e=e,k=k,write_dQ=e.write_dQ):
+            counts[k] += 1
+            write_dQ(out)
+
+        e.write_dQ = write_dQ
+
+    return counts
+
+def test_y_calc_recalculates_only_changed_experiments(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+    counts = count_heat_calculations(g)
+
+    param = np.array(g._flat_param,dtype=float)
+    g._y_calc(param)
+    assert list(counts.values()) == [1 for k in counts]
+
+    # nothing changed
+    g._y_calc(param)
+    assert list(counts.values()) == [1 for k in counts]
+
+    # a local parameter only changes its own experiment
+    i = g._flat_param_type.index(0)
+    expt = g._flat_param_mapping[i][0]
+    param[i] += 0.1
+    g._y_calc(param)
+    assert [counts[k] for k in counts] == [1 + (k == expt) for k in counts]
+
+    # a global parameter changes every experiment linked to it
+    i = g._flat_param_name.index("fx_global")
+    linked = [e for e, p in g._global_param_mapping["fx_global"]]
+    param[i] *= 0.9
+    before = dict(counts)
+    g._y_calc(param)
+    assert [counts[k] - before[k] for k in counts] == [int(k in linked) for k in counts]
+
+def test_y_calc_tracks_direct_model_edits(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    param = np.array(g._flat_param,dtype=float)
+    y_calc = np.array(g._y_calc(param))
+
+    # change a fixed parameter, which is not in the flat parameter vector,
+    # directly on the model
+    expt = [k for k in g._expt_dict if g._expt_dict[k].model.fixed_param["dilution_heat"]][0]
+    g._expt_dict[expt].model.update_fixed({"dilution_heat":2.0})
+
+    new_y_calc = np.array(g._y_calc(param))
+    rows = g._expt_obs_slices[expt]
+
+    assert not np.array_equal(new_y_calc[rows],y_calc[rows])
+    assert np.array_equal(new_y_calc[rows],g._expt_dict[expt].dQ)
+
+def test_jac_sparsity_covers_finite_difference_jacobian(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    param = np.array(g._flat_param,dtype=float)
+    y_calc = np.array(g._y_calc(param))
+
+    fd = np.zeros((len(y_calc),len(param)))
+    for j in range(len(param)):
+        p = param.copy()
+        p[j] += 1e-4*max(abs(p[j]),1.0)
+        fd[:,j] = np.array(g._y_calc(p)) - y_calc
+
+    pattern = g._jac_sparsity.toarray() != 0
+
+    # every derivative that is not zero is in the pattern ...
+    assert not np.any((fd != 0) & ~pattern)
+
+    # ... and each parameter only touches the experiments it belongs to
+    assert np.sum(pattern) < pattern.size/2
+    assert np.all(np.any(pattern,axis=0))
+
+def test_y_calc_results_are_not_overwritten(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    param = np.array(g._flat_param,dtype=float)
+    y_calc = g._y_calc(param)
+    kept = np.copy(y_calc)
+
+    g._y_calc(param*1.1)
+    assert np.array_equal(y_calc,kept)
+
+    # fitters get a read-only view of the shared buffer
+    shared = g._y_calc_shared(param)
+    assert np.array_equal(shared,kept)
+    assert not shared.flags.writeable
+    with pytest.raises(ValueError):
+        shared[0] = 0.0
+
+def test_y_calc_batch_matches_y_calc(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    base = np.array(g._flat_param,dtype=float)
+    param_array = np.array([base,base*1.01,base*0.99])
+
+    batch = g._y_calc_batch(param_array)
+    for i in range(len(param_array)):
+        y_calc = g._y_calc(param_array[i])
+        assert np.max(np.abs(batch[i] - y_calc)) <= 1e-12*np.max(np.abs(y_calc))
+
+    # the batch does not change the values held by the models
+    values = [np.copy(e.model.param_vector) for e in g._expt_dict.values()]
+    g._y_calc_batch(param_array*1.05)
+    for v, e in zip(values,g._expt_dict.values()):
+        assert np.array_equal(v,e.model.param_vector)
+
+def test_threaded_y_calc_and_fit_match_serial(make_experiment):
+
+    serial = build_connector_fit(make_experiment)
+    threaded = build_connector_fit(make_experiment)
+    threaded.num_threads = 4
+
+    serial._update_prep()
+    threaded._update_prep()
+
+    param = np.array(serial._flat_param,dtype=float)
+    assert np.array_equal(serial._y_calc(param),threaded._y_calc(param))
+
+    serial.fit()
+    threaded.fit()
+
+    serial_global, serial_local = serial.fit_param
+    threaded_global, threaded_local = threaded.fit_param
+    for k in serial_global:
+        assert threaded_global[k] == pytest.approx(serial_global[k],rel=1e-10)
+    for a, b in zip(serial_local,threaded_local):
+        for k in a:
+            assert b[k] == pytest.approx(a[k],rel=1e-10,abs=1e-12)
+
+def test_num_threads(make_experiment):
+
+    g = pytc.GlobalFit(num_threads="max")
+    assert g.num_threads >= 1
+
+    for bad in (0,-1,1.5,"many"):
+        with pytest.raises(ValueError):
+            pytc.GlobalFit(num_threads=bad)
+
+    # the thread pool is dropped when pickling and recreated on loading
+    import pickle
+    g = build_connector_fit(make_experiment)
+    g.num_threads = 2
+    g._update_prep()
+    copied = pickle.loads(pickle.dumps(g))
+    assert copied.num_threads == 2
+    assert copied._executor is not None and copied._executor is not g._executor
+
+    param = np.array(g._flat_param,dtype=float)
+    assert np.array_equal(copied._y_calc(param),g._y_calc(param))
+
+def test_decompose_matches_joint_fit(make_experiment):
+
+    joint = build_independent_fit(make_experiment)
+    joint.fit()
+
+    decomposed = build_independent_fit(make_experiment)
+    decomposed.num_threads = 2
+    decomposed.fit(decompose=True)
+
+    assert joint.fit_success
+    assert decomposed.fit_success
+    assert len(decomposed._fit_components()) == 2
+
+    joint_global, joint_local = joint.fit_param
+    decomposed_global, decomposed_local = decomposed.fit_param
+
+    assert decomposed_global.keys() == joint_global.keys()
+    for k in joint_global:
+        assert decomposed_global[k] == pytest.approx(joint_global[k],rel=1e-4)
+
+    for a, b in zip(joint_local,decomposed_local):
+        for k in a:
+            assert b[k] == pytest.approx(a[k],rel=1e-4,abs=1e-6)
+
+    assert decomposed.fit_stats["ln(L)"] == pytest.approx(joint.fit_stats["ln(L)"],rel=1e-6)
+
+def test_components(make_experiment):
+
+    g = build_independent_fit(make_experiment)
+    g._update_prep()
+
+    components = g._fit_components()
+    assert len(components) == 2
+
+    # every floating parameter is in exactly one component
+    param_idx = np.sort(np.concatenate([c[1] for c in components]))
+    assert np.array_equal(param_idx,np.arange(len(g._flat_param)))
+
+    # linking the pairs joins the components
+    g.link_to_global(g.experiments[0],"K","K_all")
+    g.link_to_global(g.experiments[3],"K","K_all")
+    g._update_prep()
+    assert len(g._fit_components()) == 1
+
+def build_shared_dH_fit(make_experiment,num_expt=4,first_seed=0):
+    """
+    SingleSite experiments that share dH.
+    """
+
+    g = pytc.GlobalFit()
+    for i in range(first_seed,first_seed + num_expt):
+        e = make_experiment(SingleSite,single_site_values(),cell_conc=0.05 + 0.01*i,
+                            noise=0.1,seed=i)
+        g.link_to_global(e,"dH","dH_global")
+
+    return g
+
+def test_warm_start_refit(make_experiment):
+
+    import scipy.sparse
+
+    g = build_shared_dH_fit(make_experiment)
+    g.fit()
+    cold = g.fit_param
+
+    # every residual and every column group of the finite difference
+    # Jacobian is a model evaluation
+    result = g._fitter.fit_result
+    groups = g._fitter._group_columns(scipy.sparse.csc_matrix(g._jac_sparsity))
+    cold_evals = result.nfev + result.njev*(np.max(groups) + 1)
+    assert g._cold_start[1] == cold_evals
+    assert "Warm start: model evaluations" not in g.fit_stats
+
+    # refitting the same fit from its estimates is cheaper and lands on the
+    # same answer
+    g.fit(warm_start=True)
+    warm_evals = g.fit_stats["Warm start: model evaluations"]
+    assert warm_evals < cold_evals
+    assert g.fit_stats["Warm start: model evaluations saved"] == cold_evals - warm_evals
+    assert g.fit_param[0]["dH_global"] == pytest.approx(cold[0]["dH_global"],rel=1e-4)
+
+    # after adding an experiment, the fit is a different problem: report
+    # the evaluations, but not a saving against the old cold start
+    e = make_experiment(SingleSite,single_site_values(),cell_conc=0.1,noise=0.1,seed=10)
+    g.link_to_global(e,"dH","dH_global")
+    g.fit(warm_start=True)
+    assert "Warm start: model evaluations" in g.fit_stats
+    assert "Warm start: model evaluations saved" not in g.fit_stats
+
+    warm = g.fit_param
+    g.fit()
+    assert warm[0]["dH_global"] == pytest.approx(g.fit_param[0]["dH_global"],rel=1e-4)
+
+def test_warm_start_uses_estimates_and_new_guesses(make_experiment):
+
+    g = build_shared_dH_fit(make_experiment)
+    g.fit()
+    estimate = g.fit_param[0]["dH_global"]
+
+    g.update_guess("fx_competent",0.8,g.experiments[0])
+    g._update_prep()
+    param, x_scale = g._warm_start_param()
+
+    # parameters from the last fit start from their estimates ...
+    i = g._flat_param_name.index("dH_global")
+    assert param[i] == estimate
+    assert x_scale is not None and np.all(x_scale > 0)
+
+    # ... unless their guess was changed since
+    i = g._flat_param_mapping.index((g.experiments[0].experiment_id,"fx_competent"))
+    assert param[i] == 0.8
+
+def test_global_fit_tracks_update_value_and_update_guess(make_experiment):
+
+    g = pytc.GlobalFit()
+    e = make_experiment(SingleSite,single_site_values(),noise=0.1)
+    g.add_experiment(e)
+    g.fit()
+
+    # update_value changes the reported values and the calculated heats
+    g.update_value("K",2.5e6,e)
+    assert g.fit_param[1][0]["K"] == 2.5e6
+    expected = e.model.evaluate(e.model.param_vector)[1:]
+    assert np.array_equal(e.dQ,expected)
+
+    # update_guess goes into the next flattened parameter vector
+    g.update_guess("dH",-1234.0,e)
+    g._update_prep()
+    assert g._flat_param[g._flat_param_name.index("dH")] == -1234.0
+
+    # so do guesses changed on the model directly
+    e.model.update_guesses({"dH":-4321.0})
+    g._update_prep()
+    assert g._flat_param[g._flat_param_name.index("dH")] == -4321.0
+
+def test_prep_is_lazy(make_experiment):
+
+    g = build_shared_dH_fit(make_experiment,num_expt=2)
+
+    calls = [0]
+    prep_fit = g._prep_fit
+    def counted_prep_fit():
+        calls[0] += 1
+        prep_fit()
+    g._prep_fit = counted_prep_fit
+
+    # building up the fit does not prep it ...
+    e = make_experiment(SingleSite,single_site_values(),cell_conc=0.1,seed=5)
+    g.link_to_global(e,"dH","dH_global")
+    g.update_guess("K",2e6,e)
+    g.update_bounds("K",(1,1e9),e)
+    assert calls[0] == 0
+
+    # ... until it is needed, and then only once
+    assert g.fit_num_param == 1 + 3*4
+    assert g.fit_num_obs == 3*24
+    assert calls[0] == 1
+
+    g._update_prep()
+    assert calls[0] == 1
+    assert g._flat_param[g._flat_param_mapping.index((e.experiment_id,"K"))] == 2e6
+
+    # linking a parameter is picked up on the next use
+    g.link_to_global(e,"K","K_global")
+    assert g.fit_num_param == 2 + 4*2 + 3
+    assert calls[0] == 2
+
+    # plot and fit reuse a current description ...
+    g.plot()
+    assert calls[0] == 2
+
+    # ... and rebuild one that was changed directly on a model
+    e.model.update_guesses({"fx_competent":0.9})
+    g.plot()
+    assert calls[0] == 3
+
+    e.model.update_guesses({"fx_competent":0.8})
+    g.fit()
+    assert calls[0] == 4
+    g.fit()
+    assert calls[0] == 4
+
+    from matplotlib import pyplot as plt
+    plt.close("all")
+
+def test_fit_result_snapshot(make_experiment):
+
+    g = build_shared_dH_fit(make_experiment,num_expt=2)
+    assert g.fit_result is None
+    assert g.fit_stats == {}
+
+    g.fit()
+
+    # the snapshot is reused until the fit or its values change
+    snapshot = g.fit_result
+    assert g.fit_result is snapshot
+    assert g.fit_param == snapshot.fit_param
+    assert not snapshot.estimate.flags.writeable
+    assert np.allclose(snapshot.residuals,snapshot.y_obs - snapshot.y_calc)
+
+    lines = [l for l in g.fit_as_csv.split("\n") if l.startswith("global") or l.startswith("local")]
+    assert len(lines) == g.fit_num_param
+
+    g.update_value("dH_global",-1000.0)
+    assert g.fit_result is not snapshot
+    assert g.fit_param[0]["dH_global"] == -1000.0
+
+def test_plot_band(make_experiment):
+
+    from matplotlib import pyplot as plt
+    from matplotlib.collections import PolyCollection
+
+    g = build_shared_dH_fit(make_experiment,num_expt=2)
+    np.random.seed(0)
+    g.fit(pytc.fitters.BayesianFitter(num_walkers=20,num_steps=20))
+
+    # one line per sample and experiment (plus the data)
+    fig, ax = g.plot(num_samples=10)
+    assert len(ax[0].lines) == 2*10 + 2
+    plt.close(fig)
+
+    # one shaded band and one line per experiment (plus the data)
+    fig, ax = g.plot(num_samples=10,band=True,subtract_dilution=True,
+                     correct_molar_ratio=True)
+    bands = [c for c in ax[0].collections if isinstance(c,PolyCollection)]
+    assert len(bands) == 2
+    assert len(ax[0].lines) == 2 + 2
+    plt.close(fig)
+
+    # the band spans the sampled curves at each shot
+    e = g.experiments[0]
+    fig, ax = g.plot(num_samples=50,band=True,quantiles=(0,50,100))
+    band = [c for c in ax[0].collections if isinstance(c,PolyCollection)][0]
+    envelope = band.get_paths()[0].vertices[:,1]
+    samples = g._fitter.samples
+    param = g._expt_param_batch(samples)[e.experiment_id]
+    calc = e.dQ_batch(param)
+    assert np.min(envelope) >= np.min(calc) - 1e-9*np.max(np.abs(calc))
+    assert np.max(envelope) <= np.max(calc) + 1e-9*np.max(np.abs(calc))
+    plt.close(fig)
+
+    with pytest.raises(ValueError):
+        g.plot(band=True,quantiles=(2.5,97.5))
+    plt.close("all")
+
+def build_compared_models(make_experiment):
+    """
+    The same two experiments fit with dH shared and with dH independent.
+    """
+
+    shared = pytc.GlobalFit()
+    independent = pytc.GlobalFit()
+    for i in range(2):
+        values = single_site_values(dH=-5000.0 - 500*i)
+        e = make_experiment(SingleSite,values,cell_conc=0.05 + 0.01*i,noise=0.1,seed=i)
+        shared.link_to_global(e,"dH","dH_global")
+
+        e = make_experiment(SingleSite,values,cell_conc=0.05 + 0.01*i,noise=0.1,seed=i)
+        independent.add_experiment(e)
+
+    return shared, independent
+
+def test_compare_models_in_processes_matches_serial(make_experiment):
+
+    serial = build_compared_models(make_experiment)
+    out, plots = pytc.util.compare_models(*serial,plot=False)
+    assert plots == []
+
+    parallel = build_compared_models(make_experiment)
+    table = pytc.util.compare_models_table(*parallel,num_processes=2)
+
+    assert list(table["model"]) == [0,1]
+    assert list(table["num_param"]) == [m.fit_num_param for m in serial]
+    assert np.all(table["fit_success"])
+    assert np.all(table["fit_time"] > 0)
+    for stat in ["AIC","AICc","BIC"]:
+        assert np.allclose(table["{}_weight".format(stat)],out[stat][1],rtol=1e-6)
+
+    for s, p in zip(serial,parallel):
+        assert p.fit_param[0] == pytest.approx(s.fit_param[0],rel=1e-8)
+
+    # models that were already fit are not fit again
+    table = pytc.util.compare_models_table(*parallel,num_processes=2)
+    assert np.all(np.isnan(table["fit_time"]))
+
+def test_attach_fitter(make_experiment):
+
+    from pytc.util.util import _fit_in_process
+    import pickle
+
+    g = pytc.GlobalFit()
+    for i in range(2):
+        values = {"beta1":1e6,"beta2":5e10,"dH1":-4000.0,"dH2":-2000.0}
+        e = make_experiment(BindingPolynomial,values,num_sites=2,
+                            cell_conc=0.05 + 0.01*i,noise=0.1,seed=i)
+        g.add_experiment(e)
+        g.update_guess("beta1",1e6,e)
+        g.update_guess("beta2",5e10,e)
+
+    # fit a copy, as compare_models does in another process
+    fitter, fit_time = _fit_in_process(pickle.loads(pickle.dumps(g)))
+    fitter = pickle.loads(pickle.dumps(fitter))
+    assert fitter._model is None and fitter._model_jac is None
+
+    g._attach_fitter(fitter)
+
+    # the model functions now point at this fit
+    assert fitter._model == g._y_calc_shared
+    assert fitter._model_batch == g._y_calc_batch
+    assert fitter._model_jac == g._y_calc_jac
+
+    assert g.fit_success
+    for k, e in g._expt_dict.items():
+        assert np.array_equal(e.dQ,np.array(g._y_calc(fitter.estimate))[g._expt_obs_slices[k]])
+
+def test_global_jacobian_matches_finite_differences(make_experiment):
+
+    g = pytc.GlobalFit()
+    for i in range(3):
+        values = {"beta1":1e6,"beta2":5e10,"dH1":-4000.0,"dH2":-2000.0}
+        e = make_experiment(BindingPolynomial,values,num_sites=2,
+                            cell_conc=0.05 + 0.01*i,noise=0.1,seed=i)
+        g.add_experiment(e)
+        g.update_guess("beta1",1e6,e)
+        g.update_guess("beta2",5e10,e)
+        g.link_to_global(e,"dH2","dH2_global")
+    g._update_prep()
+
+    param = np.array(g._flat_param,dtype=float)
+    y_calc = np.array(g._y_calc(param))
+    jac = g._y_calc_jac(param)
+
+    fd = np.zeros_like(jac)
+    for j in range(len(param)):
+        h = 1e-6*max(abs(param[j]),1e-3)
+        for sign in (1,-1):
+            p = param.copy()
+            p[j] += sign*h
+            fd[:,j] += sign*np.array(g._y_calc(p))/(2*h)
+
+    scale = np.max(np.abs(y_calc))/np.maximum(np.abs(param),1e-3)
+    assert np.max(np.abs(jac - fd)/scale) < 1e-5
+
+
+def test_evaluate_matches_y_calc(make_experiment):
+
+    g = build_connector_fit(make_experiment)
+    g._update_prep()
+
+    base = np.array(g._flat_param,dtype=float)
+    rng = np.random.RandomState(0)
+    for i in range(3):
+        param = base*(1 + 0.05*rng.uniform(-1,1,len(base)))
+
+        y_calc = np.array(g._y_calc(param))
+        y_eval = g.evaluate(param)
+
+        assert np.max(np.abs(y_eval - y_calc)) <= 1e-12*np.max(np.abs(y_calc))
+
+    # evaluate does not change the state used by _y_calc
+    y_calc = np.array(g._y_calc(base))
+    g.evaluate(base*1.1)
+    assert np.array_equal(g._y_calc(base),y_calc)
+
+def test_evaluate_requires_current_prep(make_experiment):
+
+    g = build_independent_fit(make_experiment)
+    with pytest.raises(ValueError):
+        g.evaluate(np.ones(10))
+
+    num_param = g.fit_num_param
+    param = np.array(g._flat_param,dtype=float)
+    assert len(g.evaluate(param)) == g.fit_num_obs
+
+    # a change made directly on a model is not picked up by evaluate
+    e = list(g._expt_dict.values())[0]
+    e.model.update_guesses({"K":2e6})
+    with pytest.raises(ValueError):
+        g.evaluate(param)
+
+    assert g.fit_num_param == num_param
+    g.evaluate(param)
@@ -0,0 +1,32 @@
+__description__ = \
+"""
+Tests that importing pytc leaves plotting, MCMC and scipy unloaded until they
+are used.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import subprocess, sys
+
+LAZY_MODULES = ["matplotlib","emcee","corner","scipy"]
+
+def loaded_after(code):
+    """
+    Run code in a fresh interpreter and return which of LAZY_MODULES it 
+    loaded.
+    """
+
+    code += "\nimport sys\nprint(' '.join([m for m in {} if m in sys.modules]))".format(LAZY_MODULES)
+    out = subprocess.run([sys.executable,"-c",code],capture_output=True,
+                         text=True,check=True)
+
+    return out.stdout.split()
+
+def test_import_is_lazy():
+
+    assert loaded_after("import pytc") == []
+
+def test_dependencies_load_on_first_use():
+
+    code = "import pytc\npytc.fitters.MLFitter().fit(lambda p: p,[1.0],[[0.0],[2.0]],[1.0],[1.0])"
+    assert "scipy" in loaded_after(code)
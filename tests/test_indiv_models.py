@@ -0,0 +1,178 @@
+__description__ = \
+"""
+Tests of the ITCModel machinery shared by the individual models.
+"""
+__author__ = "Michael J. Harms"
+__date__ = "2026-10-17"
+
+import numpy as np
+import pytest
+
+from pytc.indiv_models import ITCModel, SingleSite, BindingPolynomial
+from pytc.indiv_models.base import param_cached
+
+def loop_titration(cell_volume,shot_volumes,cell_conc,syringe_conc):
+    """
+    Titration profile calculated one shot at a time.
+    """
+
+    out_conc = np.zeros(len(shot_volumes)+1)
+    out_conc[0] = cell_conc
+
+    shot_ratio = (1 - np.array(shot_volumes)/cell_volume)
+    for i in range(len(shot_volumes)):
+
+        shot_ratio_prod = np.prod(shot_ratio[:(i+1)])
+        injected = syringe_conc*(1 - shot_ratio_prod)
+        diluted = cell_conc*shot_ratio_prod
+
+        out_conc[i+1] = injected + diluted
+
+    return out_conc
+
+@pytest.mark.parametrize("shot_volumes",[[2.5 for i in range(30)],
+                                         [2.0] + [8.0 for i in range(24)],
+                                         [0.5*(i+1) for i in range(20)],
+                                         [4.0]])
+def test_titration_matches_loop(shot_volumes):
+
+    m = SingleSite(S_cell=25e-6,T_syringe=800e-6,cell_volume=1400.0,
+                   shot_volumes=shot_volumes)
+
+    assert np.allclose(m._S_conc,loop_titration(1400.0,shot_volumes,25e-6,0.0),
+                       rtol=1e-13,atol=0)
+    assert np.allclose(m._T_conc,loop_titration(1400.0,shot_volumes,0.0,800e-6),
+                       rtol=1e-13,atol=0)
+
+def test_titration_profiles_are_shared():
+
+    kwargs = {"S_cell":25e-6,"T_syringe":800e-6,"shot_volumes":[2.5 for i in range(30)]}
+    a = SingleSite(**kwargs)
+    b = BindingPolynomial(num_sites=2,**kwargs)
+
+    # models with the same titration share one read-only profile
+    assert a._S_conc is b._S_conc
+    assert a._T_conc is b._T_conc
+    with pytest.raises(ValueError):
+        a._T_conc[1] = 0.0
+
+    c = SingleSite(S_cell=30e-6,T_syringe=800e-6,shot_volumes=kwargs["shot_volumes"])
+    assert c._S_conc is not a._S_conc
+    assert c._T_conc is a._T_conc
+
+def test_model_cache_invalidated_by_value_changes():
+
+    def fresh(K):
+        m = SingleSite(S_cell=50e-6,T_syringe=700e-6,shot_volumes=[8.0]*20)
+        m.update_values({"K":K,"dH":-5000.0})
+        return np.array(m.dQ)
+
+    m = SingleSite(S_cell=50e-6,T_syringe=700e-6,shot_volumes=[8.0]*20)
+    m.update_values({"K":1e6,"dH":-5000.0})
+    assert np.array_equal(m.dQ,fresh(1e6))
+
+    # unchanged values return the cached, read-only heats
+    dQ = m.dQ
+    assert m.dQ is dQ
+    with pytest.raises(ValueError):
+        dQ[0] = 0.0
+
+    # through update_values
+    m.update_values({"K":2e6})
+    assert np.array_equal(m.dQ,fresh(2e6))
+
+    # through the FitParameter
+    m.parameters["K"].value = 3e6
+    assert np.array_equal(m.dQ,fresh(3e6))
+
+    # through update_values_by_index
+    values = np.array(m.param_vector)
+    values[m.param_names.index("K")] = 4e6
+    m.update_values_by_index(np.arange(len(values)),values)
+    assert np.array_equal(m.dQ,fresh(4e6))
+
+    # dilution heats are cached the same way
+    heats = np.array(m.dilution_heats)
+    m.update_values({"dilution_heat":10.0})
+    assert not np.array_equal(m.dilution_heats,heats)
+
+def test_evaluate_does_not_change_model():
+
+    m = SingleSite(S_cell=50e-6,T_syringe=700e-6,shot_volumes=[8.0]*20)
+    m.update_values({"K":1e6,"dH":-5000.0})
+    dQ = np.array(m.dQ)
+    version = m._param_store.version
+
+    param = np.array(m.param_vector)
+    param[m.param_names.index("K")] = 2e6
+    y = m.evaluate(param)
+
+    m2 = SingleSite(S_cell=50e-6,T_syringe=700e-6,shot_volumes=[8.0]*20)
+    m2.update_values({"K":2e6,"dH":-5000.0})
+    assert np.array_equal(y,m2.dQ)
+
+    assert np.array_equal(m.dQ,dQ)
+    assert m.param_values["K"] == 1e6
+    assert m._param_store.version == version
+
+class ParameterViewModel(ITCModel):
+    """
+    Model whose heats are read through its FitParameters, relying on the
+    default (copying) evaluate.
+    """
+
+    def param_definition(a=1.0,b=2.0):
+        pass
+
+    @property
+    @param_cached
+    def dQ(self):
+
+        b = self._param_list[self._param_index["b"]].value
+
+        return self._T_conc[1:]*self.parameters["a"].value + b
+
+def test_default_evaluate_uses_copied_parameters():
+
+    m = ParameterViewModel(S_cell=25e-6,T_syringe=800e-6,shot_volumes=[2.5]*10)
+    dQ = np.array(m.dQ)
+
+    param = np.array(m.param_vector)
+    param[m._param_index["a"]] = 3.0
+    param[m._param_index["b"]] = 5.0
+    y = m.evaluate(param)
+
+    assert np.allclose(y,m._T_conc[1:]*3.0 + 5.0,rtol=1e-14,atol=0)
+    assert np.array_equal(m.dQ,dQ)
+    assert m.param_values["a"] == 1.0
+    assert m.parameters["b"].value == 2.0
+
+def test_param_schema_is_built_once_per_class():
+
+    a = BindingPolynomial(num_sites=3)
+    key = (BindingPolynomial,("beta1","beta2","beta3","dH1","dH2","dH3"),
+           (1e6,1e6,1e6,-4000.0,-4000.0,-4000.0))
+    num_schemas = len(ITCModel._param_schemas)
+    schema = ITCModel._param_schemas[key]
+
+    # a second instance reuses the schema, but gets its own store and params
+    b = BindingPolynomial(num_sites=3)
+    assert len(ITCModel._param_schemas) == num_schemas
+    assert ITCModel._param_schemas[key] is schema
+    assert b._param_store is not a._param_store
+    assert b._param_store is not schema[3]
+    assert b.param_names == a.param_names
+    assert b.param_names is not a.param_names
+
+    b.update_guesses({"beta1":1e7})
+    b.update_values({"dH1":-1000.0})
+    assert a.param_guesses["beta1"] == 1e6
+    assert a.param_values["dH1"] == -4000.0
+    assert schema[3].guesses[a._param_index["beta1"]] == 1e6
+
+    # other parameter sets get their own schema
+    BindingPolynomial(num_sites=2)
+    SingleSite()
+    assert (BindingPolynomial,("beta1","beta2","dH1","dH2"),
+            (1e6,1e6,-4000.0,-4000.0)) in ITCModel._param_schemas
+    assert (SingleSite,(),()) in ITCModel._param_schemas